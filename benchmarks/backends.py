@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""In memory replacements for the zookeeper and cassandra clients.
+
+Both fakes count the operations they receive and can add a fixed latency
+to each round trip so that the benchmarks reflect the number of calls made
+by a command rather than the speed of a local dictionary.
+"""
+from __future__ import unicode_literals
+import sys
+from collections import defaultdict, OrderedDict
+
+import gevent
+from gevent.event import AsyncResult
+from kazoo.exceptions import NoNodeError, NodeExistsError, NotEmptyError
+
+
+class Counters(defaultdict):
+
+    def __init__(self):
+        super(Counters, self).__init__(int)
+
+
+class FakeKazooClient(object):
+    """Minimal :py:class:`kazoo.client.KazooClient` backed by a dict.
+    """
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.nodes = {'/': b''}
+        self.children = defaultdict(set)
+        self.ops = Counters()
+        self.connected = True
+
+    def _rtt(self, op):
+        self.ops[op] += 1
+        if self.latency:
+            gevent.sleep(self.latency)
+
+    def _ensure_parents(self, path):
+        parent, _, name = path.rpartition('/')
+        parent = parent or '/'
+        if parent not in self.nodes:
+            self._ensure_parents(parent)
+            self.nodes[parent] = b''
+        self.children[parent].add(name)
+
+    def load(self, path, value=b''):
+        """Create a node without counting an operation.
+        """
+        self._ensure_parents(path)
+        self.nodes[path] = value
+
+    def start(self, timeout=None):
+        self.connected = True
+
+    def stop(self):
+        self.connected = False
+
+    def restart(self):
+        self.connected = True
+
+    def exists(self, path):
+        self._rtt('exists')
+        return path in self.nodes or None
+
+    def get(self, path):
+        self._rtt('get')
+        if path not in self.nodes:
+            raise NoNodeError(path)
+        return self.nodes[path], None
+
+    def get_async(self, path):
+        result = AsyncResult()
+
+        def _get():
+            try:
+                result.set(self.get(path))
+            except NoNodeError as e:
+                result.set_exception(e)
+        gevent.spawn(_get)
+        return result
+
+    def get_children(self, path):
+        self._rtt('get_children')
+        if path not in self.nodes:
+            raise NoNodeError(path)
+        return list(self.children[path])
+
+    def _create(self, path, value=b'', makepath=False):
+        if path in self.nodes:
+            raise NodeExistsError(path)
+        parent = path.rpartition('/')[0] or '/'
+        if parent not in self.nodes and not makepath:
+            raise NoNodeError(parent)
+        self._ensure_parents(path)
+        self.nodes[path] = value
+        return path
+
+    def create(self, path, value=b'', makepath=False, **kwargs):
+        self._rtt('create')
+        return self._create(path, value, makepath)
+
+    def _delete(self, path, recursive=False):
+        if path not in self.nodes:
+            raise NoNodeError(path)
+        if self.children.get(path):
+            if not recursive:
+                raise NotEmptyError(path)
+            for child in list(self.children[path]):
+                self._delete('%s/%s' % (path, child), recursive=True)
+        parent, _, name = path.rpartition('/')
+        self.children[parent or '/'].discard(name)
+        self.children.pop(path, None)
+        del self.nodes[path]
+
+    def delete(self, path, recursive=False, **kwargs):
+        self._rtt('delete')
+        self._delete(path, recursive)
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+
+class FakeTransaction(object):
+    """All or nothing multi-op like kazoo's ``TransactionRequest``.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.operations = []
+
+    def create(self, path, value=b'', **kwargs):
+        self.operations.append(('create', path, value))
+
+    def delete(self, path, **kwargs):
+        self.operations.append(('delete', path, None))
+
+    def check(self, path, version):
+        self.operations.append(('check', path, None))
+
+    def commit(self):
+        self.client._rtt('multi')
+        nodes = dict(self.client.nodes)
+        results = []
+        for op, path, value in self.operations:
+            if op == 'create':
+                exists = path in nodes
+                results.append(NodeExistsError() if exists else path)
+                nodes[path] = value
+            elif op == 'delete':
+                exists = path in nodes
+                results.append(True if exists else NoNodeError())
+                nodes.pop(path, None)
+            else:
+                results.append(True if path in nodes else NoNodeError())
+        if any(isinstance(r, Exception) for r in results):
+            return results
+        for op, path, value in self.operations:
+            if op == 'create':
+                self.client._create(path, value, makepath=True)
+            elif op == 'delete':
+                self.client._delete(path)
+        return results
+
+
+class FakeCassandra(object):
+    """Keyspaces -> column families -> ordered rows of columns.
+    """
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.tables = defaultdict(lambda: defaultdict(OrderedDict))
+        self.ops = Counters()
+
+    def _rtt(self, op):
+        self.ops[op] += 1
+        if self.latency:
+            gevent.sleep(self.latency)
+
+
+class FakeConnectionPool(object):
+    cassandra = None
+
+    def __init__(self, keyspace, server_list=None, **kwargs):
+        self.keyspace = keyspace
+
+
+class FakeColumnFamily(object):
+    """Subset of :py:class:`pycassa.ColumnFamily` used by the commands.
+    """
+    buffer_size = 1024
+
+    def __init__(self, pool, name, **kwargs):
+        self.db = pool.cassandra
+        self.rows = self.db.tables[(pool.keyspace, name)]
+
+    def get(self, key, columns=None, column_count=None, **kwargs):
+        from pycassa import NotFoundException
+        self.db._rtt('get')
+        if key not in self.rows or not self.rows[key]:
+            raise NotFoundException()
+        cols = self.rows[key]
+        if columns is not None:
+            return OrderedDict((c, cols[c]) for c in columns if c in cols)
+        return OrderedDict(list(cols.items())[:column_count])
+
+    def xget(self, key, buffer_size=None, **kwargs):
+        cols = list(self.rows.get(key, {}).items())
+        size = buffer_size or self.buffer_size
+        for i in range(0, max(len(cols), 1), size):
+            self.db._rtt('xget')
+            for col in cols[i:i + size]:
+                yield col
+
+    def get_count(self, key, **kwargs):
+        self.db._rtt('get_count')
+        return len(self.rows.get(key, {}))
+
+    def get_range(self, column_count=None, filter_empty=True, buffer_size=None, **kwargs):
+        keys = list(self.rows)
+        size = buffer_size or self.buffer_size
+        for i in range(0, max(len(keys), 1), size):
+            self.db._rtt('get_range')
+            for key in keys[i:i + size]:
+                cols = self.rows.get(key)
+                if not cols and filter_empty:
+                    continue
+                yield key, OrderedDict(list(cols.items())[:column_count])
+
+    def insert(self, key, columns, **kwargs):
+        self.db._rtt('insert')
+        self.rows[key].update(columns)
+
+    def remove(self, key, columns=None, **kwargs):
+        self.db._rtt('remove')
+        if columns is None:
+            self.rows.pop(key, None)
+        else:
+            for c in columns:
+                self.rows.get(key, {}).pop(c, None)
+
+
+def install_cassandra(cassandra):
+    """Replace pycassa pools and column families by the fakes in every
+    loaded module that imported them.
+    """
+    FakeConnectionPool.cassandra = cassandra
+    for module in list(sys.modules.values()):
+        if module is None or not getattr(module, '__name__', '').startswith(('pycassa',
+                                                                              'contrail_api_cli_extra')):
+            continue
+        if getattr(module, 'ConnectionPool', None) is not None:
+            module.ConnectionPool = FakeConnectionPool
+        if getattr(module, 'ColumnFamily', None) is not None:
+            module.ColumnFamily = FakeColumnFamily
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""Synthetic contrail deployments.
+
+:py:func:`build` fills the stub API store, the fake zookeeper and the fake
+cassandra with a consistent set of objects. ``size`` is the number of
+virtual networks, every other object count is derived from it. A fixed
+fraction of the objects is deliberately broken (missing locks, orphaned
+route targets, stale service instances, dangling references...) so that
+the fix/clean commands have work to do.
+"""
+from __future__ import unicode_literals
+import json
+import random
+from collections import namedtuple
+
+from netaddr import IPNetwork
+
+from stub import Store
+from backends import FakeKazooClient, FakeCassandra
+
+ASN = 64512
+RT_ID_BASE = 8000000
+PROJECT = ['default-domain', 'default-project']
+PUBLIC_VN = PROJECT + ['public']
+
+Dataset = namedtuple('Dataset', ['store', 'zk', 'cassandra', 'size', 'public_vn', 'vrouters'])
+
+
+def _vn_subnet(i):
+    return IPNetwork('10.%d.%d.0/24' % ((i >> 8) & 0xff, i & 0xff))
+
+
+def vrouter_ip(i):
+    return '192.168.%d.%d' % ((i >> 8) & 0xff, i & 0xff)
+
+
+def _ipam_refs(ipam_uuid, cidr):
+    return [('network-ipam', ipam_uuid, {
+        'ipam_subnets': [{
+            'subnet': {'ip_prefix': '%s' % cidr.network,
+                       'ip_prefix_len': cidr.prefixlen},
+            'default_gateway': '%s' % cidr[1],
+            'dns_server_address': '%s' % cidr[2],
+        }]
+    })]
+
+
+def _subnet_node(fq_name, cidr):
+    return '/api-server/subnets/%s:%s/%s' % (':'.join(fq_name), cidr.network, cidr.prefixlen)
+
+
+def build(size, iips_per_vn=4, fips=None, vrouters=None, error_rate=0.05, seed=42,
+          zk_latency=0, cassandra_latency=0):
+    """Generate a deployment with ``size`` virtual networks.
+
+    :rtype: Dataset
+    """
+    rand = random.Random(seed)
+    broken = lambda: rand.random() < error_rate  # noqa
+    store = Store()
+    zk = FakeKazooClient(latency=zk_latency)
+    cassandra = FakeCassandra(latency=cassandra_latency)
+    fips = size if fips is None else fips
+    vrouters = size if vrouters is None else vrouters
+
+    gsc = store.add('global-system-config', ['default-global-system-config'],
+                    autonomous_system=ASN)
+    domain = store.add('domain', PROJECT[:1])
+    project = store.add('project', PROJECT, parent_uuid=domain)
+    ipam = store.add('network-ipam', PROJECT + ['default-network-ipam'], parent_uuid=project)
+    store.add('virtual-machine', ['placeholder'])
+    store.add('service-template', ['default-domain', 'netns-snat-template'],
+              parent_uuid=domain)
+    for path in ('/id/virtual-networks', '/id/bgp/route-targets', '/api-server/subnets'):
+        zk.load(path)
+
+    rt_id = RT_ID_BASE
+    for i in range(size):
+        fq_name = PROJECT + ['vn-%d' % i]
+        cidr = _vn_subnet(i)
+        nid = i + 1
+        vn = store.add('virtual-network', fq_name, parent_uuid=project,
+                       refs=_ipam_refs(ipam, cidr),
+                       virtual_network_network_id=nid,
+                       virtual_network_properties={'network_id': nid})
+        # VN id locks: some missing, some pointing to another VN
+        if not broken():
+            value = ':'.join(fq_name) if not broken() else 'bad:lock'
+            zk.load('/id/virtual-networks/%010d' % (nid - 1), value.encode('utf-8'))
+        subnet_node = _subnet_node(fq_name, cidr)
+        zk.load(subnet_node)
+        for j in range(iips_per_vn):
+            ip = cidr[10 + j]
+            store.add('instance-ip', ['iip-%d-%d' % (i, j)],
+                      refs=[('virtual-network', vn, None)],
+                      instance_ip_address='%s' % ip)
+            if not broken():
+                zk.load('%s/%d' % (subnet_node, int(ip)), vn.encode('utf-8'))
+        if broken():
+            # abusive lock
+            zk.load('%s/%d' % (subnet_node, int(cidr[200])), vn.encode('utf-8'))
+        # routing instance with its route target
+        refs = []
+        if not broken():
+            rt_id += 1
+            rt = store.add('route-target', ['target:%d:%d' % (ASN, rt_id)])
+            zk.load('/id/bgp/route-targets/%010d' % rt_id,
+                    ('target:%d:%d' % (ASN, rt_id)).encode('utf-8'))
+            refs = [('route-target', rt, {'import_export': None})]
+        store.add('routing-instance', fq_name + [fq_name[-1]], parent_uuid=vn, refs=refs)
+        if broken():
+            # orphaned route target, with or without its lock
+            rt_id += 1
+            store.add('route-target', ['target:%d:%d' % (ASN, rt_id)])
+            if rand.random() < 0.5:
+                zk.load('/id/bgp/route-targets/%010d' % rt_id)
+        if broken():
+            # lock without route target
+            rt_id += 1
+            zk.load('/id/bgp/route-targets/%010d' % rt_id)
+        # service instances
+        if i % 10 == 0:
+            si = store.add('service-instance', PROJECT + ['si-%d' % i], parent_uuid=project,
+                           refs=[('service-template', store.fq_names[('service-template',
+                                                                     ('default-domain',
+                                                                      'netns-snat-template'))],
+                                  None)])
+            if not broken():
+                store.add('virtual-machine', ['vm-si-%d' % i],
+                          refs=[('service-instance', si, None)])
+
+    # public network with floating ips
+    public_cidr = IPNetwork('172.16.0.0/12')
+    public = store.add('virtual-network', PUBLIC_VN, parent_uuid=project,
+                       refs=_ipam_refs(ipam, public_cidr),
+                       virtual_network_network_id=size + 1,
+                       virtual_network_properties={'network_id': size + 1})
+    zk.load('/id/virtual-networks/%010d' % size, ':'.join(PUBLIC_VN).encode('utf-8'))
+    pool = store.add('floating-ip-pool', PUBLIC_VN + ['pool'], parent_uuid=public)
+    public_node = _subnet_node(PUBLIC_VN, public_cidr)
+    zk.load(public_node)
+    for i in range(fips):
+        ip = public_cidr[10 + i]
+        store.add('floating-ip', PUBLIC_VN + ['pool', 'fip-%d' % i], parent_uuid=pool,
+                  floating_ip_address='%s' % ip)
+        if not broken():
+            zk.load('%s/%d' % (public_node, int(ip)), public.encode('utf-8'))
+
+    for i in range(vrouters):
+        store.add('virtual-router', ['default-global-system-config', 'compute-%d' % i],
+                  parent_uuid=gsc, virtual_router_ip_address=vrouter_ip(i))
+
+    _fill_cassandra(store, cassandra, broken)
+    return Dataset(store, zk, cassandra, size, ':'.join(PUBLIC_VN), vrouters)
+
+
+def _fill_cassandra(store, cassandra, broken):
+    uuid_table = cassandra.tables[('config_db_uuid', 'obj_uuid_table')]
+    fqname_table = cassandra.tables[('config_db_uuid', 'obj_fq_name_table')]
+    for uuid, obj in store.objects.items():
+        type = store.types[uuid].replace('-', '_')
+        row = uuid_table[uuid]
+        row['fq_name'] = json.dumps(obj['fq_name'])
+        row['type'] = json.dumps(type)
+        if 'parent_uuid' in obj:
+            row['parent:%s:%s' % (obj['parent_type'].replace('-', '_'),
+                                  obj['parent_uuid'])] = json.dumps(None)
+        for key, refs in obj.items():
+            if key.endswith('_refs'):
+                for ref in refs:
+                    row['ref:%s:%s' % (key[:-5], ref['uuid'])] = json.dumps({'attr': ref['attr']})
+        if broken():
+            row['ref:virtual_network:00000000-0000-0000-0000-%012d' % len(row)] = \
+                json.dumps({'attr': None})
+        fqname_table[type]['%s:%s' % (':'.join(obj['fq_name']), uuid)] = json.dumps(None)
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""Compare the concurrency engines used to fan out API requests.
+
+Each engine fetches every virtual-network of a synthetic deployment
+served by the stub API server:
+
+* ``upstream``: ``contrail_api_cli.utils.parallel_map`` with the
+  default HTTP connection pool of the session (10 or 100 connections
+  depending on the keystoneauth version)
+* ``pool``: ``contrail_api_cli_extra.utils.parallel_map`` on a session
+  whose connection pool is resized to the number of workers
+
+For every engine and number of workers the wall time, the number of API
+requests, the number of TCP connections opened and the peak RSS of the
+process are reported.
+
+Usage::
+
+    python benchmarks/engines.py [--size 1000] [--workers 50,200] [engine ...]
+"""
+from __future__ import unicode_literals, print_function
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+from collections import OrderedDict
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import stub  # noqa
+import dataset  # noqa
+
+from contrail_api_cli.client import ContrailAPISession  # noqa
+from contrail_api_cli.context import Context  # noqa
+from contrail_api_cli.resource import Collection  # noqa
+from contrail_api_cli.schema import create_schema_from_version  # noqa
+
+
+def _upstream(session, workers):
+    from contrail_api_cli.utils import parallel_map
+    return parallel_map
+
+
+def _pool(session, workers):
+    from contrail_api_cli_extra.utils import parallel_map, resize_connection_pool
+    resize_connection_pool(session, workers)
+    return parallel_map
+
+
+ENGINES = OrderedDict([
+    ('upstream', _upstream),
+    ('pool', _pool),
+])
+
+
+def _max_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_engine(name, workers, options):
+    """Run one engine in the current process.
+
+    :rtype: dict
+    """
+    data = dataset.build(options.size)
+    pid, base_url = stub.serve(data.store, latency=options.latency)
+    try:
+        host, port = base_url.rsplit('/', 1)[-1].split(':')
+        session = ContrailAPISession(host=host, port=int(port))
+        Context().session = session
+        Context().schema = create_schema_from_version(options.schema_version)
+        vns = list(Collection('virtual-network', fetch=True))
+        parallel_map = ENGINES[name](session, workers)
+        requests.post('%s/_stats' % base_url)
+        start = time.time()
+        parallel_map(lambda r: r.fetch(), vns, workers=workers)
+        elapsed = time.time() - start
+        api = requests.get('%s/_stats' % base_url).json()
+    finally:
+        stub.stop(pid)
+    return OrderedDict([
+        ('engine', name),
+        ('workers', workers),
+        ('wall_time', round(elapsed, 3)),
+        ('api_requests', api.get('requests', 0)),
+        # connections opened during the run, the GET /_stats
+        # request opens its own connection
+        ('connections', api.get('connections', 1) - 1),
+        ('rss_kb', _max_rss()),
+    ])
+
+
+def run_isolated(name, workers, options):
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            result = run_engine(name, workers, options)
+        except Exception as e:
+            result = {'engine': name, 'workers': workers,
+                      'error': '%s: %s' % (e.__class__.__name__, e)}
+        with os.fdopen(write_fd, 'w') as f:
+            json.dump(result, f)
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        payload = f.read()
+    os.waitpid(pid, 0)
+    return json.loads(payload, object_pairs_hook=OrderedDict)
+
+
+def format_result(result):
+    if 'error' in result:
+        return '%(engine)-10s %(workers)8d  ERROR: %(error)s' % result
+    return ('%(engine)-10s %(workers)8d %(wall_time)9.2fs %(api_requests)9d '
+            '%(connections)12d %(rss_mb)8.1fM' %
+            dict(result, rss_mb=result['rss_kb'] / 1024.0))
+
+
+def workers_type(value):
+    return [int(v) for v in value.split(',')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('engines', nargs='*', metavar='engine',
+                        help='engines to run among %s (default: all)' % ', '.join(ENGINES))
+    parser.add_argument('--size', type=int, default=1000,
+                        help='number of virtual networks (default: %(default)s)')
+    parser.add_argument('--workers', type=workers_type, default=[50, 200],
+                        help='comma separated numbers of workers '
+                             '(default: 50,200)')
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='API latency in seconds (default: %(default)s)')
+    parser.add_argument('--schema-version', default='3.1',
+                        help='schema version used (default: %(default)s)')
+    parser.add_argument('--json', action='store_true',
+                        help='output one JSON document per result')
+    options = parser.parse_args(argv)
+    for name in options.engines:
+        if name not in ENGINES:
+            parser.error('unknown engine %s' % name)
+
+    if not options.json:
+        print('%-10s %8s %10s %9s %12s %9s' %
+              ('engine', 'workers', 'time', 'requests', 'connections', 'peak rss'))
+    for workers in options.workers:
+        for name in options.engines or ENGINES:
+            result = run_isolated(name, workers, options)
+            if options.json:
+                print(json.dumps(result))
+            else:
+                print(format_result(result))
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the check/fix/clean/provision commands against synthetic data.
+
+Each scenario runs in its own process: a synthetic deployment is generated,
+the stub API server is forked to serve it, the fake zookeeper and cassandra
+clients are installed and the command is run with ``parse_and_call`` like
+the shell does. For every scenario the wall time, the number of API
+requests, the zookeeper and cassandra operations and the peak RSS of the
+command process are reported.
+
+Usage::
+
+    python benchmarks/run.py [--size 1000,10000] [--latency 0.002] [scenario ...]
+
+The provision scenario converges the vrouters list, to provision 10k
+vrouters on a small deployment::
+
+    python benchmarks/run.py provision --size 100 --vrouters 10000
+
+The provision scenario loads the ``contrail_api_cli.provision`` namespace
+so the package must be installed (``pip install -e .``).
+"""
+from __future__ import unicode_literals, print_function
+import os
+import sys
+import json
+import time
+import atexit
+import argparse
+import resource
+import tempfile
+from collections import OrderedDict
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import stub  # noqa
+import dataset  # noqa
+import backends  # noqa
+
+from contrail_api_cli.client import ContrailAPISession  # noqa
+from contrail_api_cli.context import Context  # noqa
+from contrail_api_cli.schema import create_schema_from_version  # noqa
+
+
+def _fix_zk_ip(data):
+    from contrail_api_cli_extra.fix.fix_zk_ip import FixZkIP
+    return FixZkIP('fix-zk-ip'), ['--yes']
+
+
+def _clean_route_target(data):
+    from contrail_api_cli_extra.clean.rt import CleanRT
+    return CleanRT('clean-route-target'), []
+
+
+def _check_bad_refs(data):
+    from contrail_api_cli_extra.misc.check_bad_refs import CheckBadRefs
+    return CheckBadRefs('check-bad-refs'), ['--check']
+
+
+def _fix_ri(data):
+    from contrail_api_cli_extra.fix.ri import FixRI
+    return FixRI('fix-ri'), []
+
+
+def _fix_vn_id(data):
+    from contrail_api_cli_extra.fix.fix_vn_id import FixVnId
+    return FixVnId('fix-vn-id'), ['--yes']
+
+
+def _fix_fip_locks(data):
+    from contrail_api_cli_extra.fix.fix_fip_locks import FixFIPLocks
+    return FixFIPLocks('fix-fip-locks'), ['--public-fqname', data.public_vn]
+
+
+def _clean_stale_si(data):
+    from contrail_api_cli_extra.clean.si import CleanStaleSI
+    return CleanStaleSI('clean-stale-si'), []
+
+
+def _provision(data):
+    from contrail_api_cli.manager import CommandManager
+    from contrail_api_cli.exceptions import CommandNotFound
+    mgr = CommandManager()
+    mgr.load_namespace('contrail_api_cli.provision')
+    try:
+        cmd = mgr.get('provision')
+        mgr.get('add-vrouter')
+    except CommandNotFound:
+        raise RuntimeError('provision commands not found, is the package installed ?')
+    # keep 90% of the vrouters, change 5% and add 10% new ones
+    vrouters = []
+    for i in range(int(data.vrouters * 1.1)):
+        if i % 10 == 0 and i < data.vrouters:
+            continue
+        ip = dataset.vrouter_ip(i if i % 20 != 1 else i + 30000)
+        vrouters.append({'vrouter-name': 'compute-%d' % i, 'vrouter-ip': ip})
+    # sections ordered so that the provision section can be streamed
+    env = OrderedDict([('namespace', 'contrail_api_cli.provision'),
+                       ('defaults', {}),
+                       ('provision', {'vrouter': vrouters})])
+    fd, env_file = tempfile.mkstemp(suffix='.json')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(env, f)
+    return cmd, [env_file, '--force']
+
+
+SCENARIOS = OrderedDict([
+    ('fix-zk-ip', _fix_zk_ip),
+    ('clean-route-target', _clean_route_target),
+    ('check-bad-refs', _check_bad_refs),
+    ('fix-ri', _fix_ri),
+    ('fix-vn-id', _fix_vn_id),
+    ('fix-fip-locks', _fix_fip_locks),
+    ('clean-stale-si', _clean_stale_si),
+    ('provision', _provision),
+])
+
+
+def _max_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_scenario(name, options):
+    """Run one scenario in the current process.
+
+    :rtype: dict
+    """
+    data = dataset.build(options.size, vrouters=options.vrouters,
+                         zk_latency=options.zk_latency,
+                         cassandra_latency=options.cassandra_latency)
+    pid, base_url = stub.serve(data.store, latency=options.latency)
+    try:
+        host, port = base_url.rsplit('/', 1)[-1].split(':')
+        Context().session = ContrailAPISession(host=host, port=int(port))
+        Context().schema = create_schema_from_version(options.schema_version)
+        cmd, argv = SCENARIOS[name](data)
+        backends.install_cassandra(data.cassandra)
+        cmd.zk_client = data.zk
+        argv = argv + list(options.args)
+        requests.post('%s/_stats' % base_url)
+        rss_before = _max_rss()
+
+        # commands write their findings on stdout
+        stdout = os.dup(1)
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, 1)
+        start = time.time()
+        try:
+            cmd.parse_and_call(*argv)
+        finally:
+            elapsed = time.time() - start
+            sys.stdout.flush()
+            os.dup2(stdout, 1)
+            os.close(devnull)
+
+        api = requests.get('%s/_stats' % base_url).json()
+    finally:
+        stub.stop(pid)
+    return OrderedDict([
+        ('scenario', name),
+        ('size', options.size),
+        ('objects', len(data.store)),
+        ('wall_time', round(elapsed, 3)),
+        ('api_requests', api.get('requests', 0)),
+        ('api_lists', api.get('list', 0)),
+        ('api_writes', api.get('write', 0)),
+        ('zk_ops', dict(data.zk.ops)),
+        ('cassandra_ops', dict(data.cassandra.ops)),
+        ('rss_kb', _max_rss()),
+        ('rss_growth_kb', _max_rss() - rss_before),
+    ])
+
+
+def run_isolated(name, options):
+    """Run a scenario in a forked process so that each scenario starts
+    with a fresh interpreter state and its own peak RSS.
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            result = run_scenario(name, options)
+        except Exception as e:
+            result = {'scenario': name, 'size': options.size,
+                      'error': '%s: %s' % (e.__class__.__name__, e)}
+        with os.fdopen(write_fd, 'w') as f:
+            json.dump(result, f)
+        # let the commands report at exit (eg: --profile)
+        atexit._run_exitfuncs()
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        payload = f.read()
+    os.waitpid(pid, 0)
+    return json.loads(payload, object_pairs_hook=OrderedDict)
+
+
+def format_result(result):
+    if 'error' in result:
+        return '%(scenario)-20s %(size)8d  ERROR: %(error)s' % result
+    return ('%(scenario)-20s %(size)8d %(objects)9d %(wall_time)9.2fs %(api_requests)9d '
+            '%(api_writes)7d %(zk)8d %(cassandra)8d %(rss_mb)8.1fM' %
+            dict(result,
+                 zk=sum(result['zk_ops'].values()),
+                 cassandra=sum(result['cassandra_ops'].values()),
+                 rss_mb=result['rss_kb'] / 1024.0))
+
+
+def sizes_type(value):
+    return [int(v) for v in value.split(',')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help='scenarios to run among %s (default: all)' % ', '.join(SCENARIOS))
+    parser.add_argument('--size', type=sizes_type, default=[1000],
+                        help='comma separated numbers of virtual networks '
+                             '(default: 1000)')
+    parser.add_argument('--vrouters', type=int, default=None,
+                        help='number of virtual routers (default: size)')
+    parser.add_argument('--latency', type=float, default=0.001,
+                        help='API latency in seconds (default: %(default)s)')
+    parser.add_argument('--zk-latency', type=float, default=0.0005,
+                        help='zookeeper latency in seconds (default: %(default)s)')
+    parser.add_argument('--cassandra-latency', type=float, default=0.0005,
+                        help='cassandra latency in seconds (default: %(default)s)')
+    parser.add_argument('--schema-version', default='3.1',
+                        help='schema version used (default: %(default)s)')
+    parser.add_argument('--json', action='store_true',
+                        help='output one JSON document per result')
+    parser.add_argument('--args', nargs=argparse.REMAINDER, default=[],
+                        help='extra arguments given to every command '
+                             '(eg: --args --workers 100)')
+    options = parser.parse_args(argv)
+    for name in options.scenarios:
+        if name not in SCENARIOS:
+            parser.error('unknown scenario %s' % name)
+
+    if not options.json:
+        print('%-20s %8s %9s %10s %9s %7s %8s %8s %9s' %
+              ('scenario', 'size', 'objects', 'time', 'requests',
+               'writes', 'zk ops', 'cass ops', 'peak rss'))
+    for size in options.size:
+        scenario_options = argparse.Namespace(**dict(vars(options), size=size))
+        for name in options.scenarios or SCENARIOS:
+            result = run_isolated(name, scenario_options)
+            if options.json:
+                print(json.dumps(result))
+            else:
+                print(format_result(result))
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
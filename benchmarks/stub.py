@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+"""Stub of the contrail REST API.
+
+Only the parts of the API used by the commands are implemented:
+
+* collections listing with ``detail``, ``fields``, ``parent_id``,
+  ``back_ref_id``, ``filters`` and ``count`` parameters
+* resources GET (with back_refs and children), POST, PUT and DELETE
+* ``/fqname-to-id``, ``/id-to-fqname``, ``/ref-update`` and ``/useragent-kv``
+
+Every request is delayed by ``latency`` seconds and counted. Counters are
+available with ``GET /_stats``.
+"""
+from __future__ import unicode_literals
+import os
+import json
+import signal
+import socket
+import uuid as uuidlib
+from collections import defaultdict, OrderedDict
+from six.moves.urllib.parse import parse_qs
+
+import gevent
+from gevent.pywsgi import WSGIServer
+
+
+def _attr(type):
+    return type.replace('-', '_')
+
+
+class NotFound(Exception):
+    status = '404 Not Found'
+
+
+class Conflict(Exception):
+    status = '409 Conflict'
+
+
+class Store(object):
+    """In memory contrail objects database.
+    """
+
+    def __init__(self):
+        self.types = {}
+        self.objects = {}
+        self.fq_names = {}
+        self.by_type = defaultdict(OrderedDict)
+        self.back_refs = defaultdict(set)
+        self.children = defaultdict(set)
+        self.kv = {}
+
+    def __len__(self):
+        return len(self.objects)
+
+    def add(self, type, fq_name, parent_uuid=None, refs=None, uuid=None, **props):
+        """Add an object to the store.
+
+        :param refs: list of (ref_type, ref_uuid, attr)
+        """
+        fq_name = list(fq_name)
+        if (type, tuple(fq_name)) in self.fq_names:
+            raise Conflict('%s %s already exists' % (type, ':'.join(fq_name)))
+        uuid = uuid or text_uuid()
+        obj = dict(props)
+        obj['uuid'] = uuid
+        obj['fq_name'] = fq_name
+        obj['name'] = fq_name[-1]
+        if parent_uuid is not None:
+            obj['parent_uuid'] = parent_uuid
+            obj['parent_type'] = self.types[parent_uuid]
+            self.children[parent_uuid].add(uuid)
+        self.types[uuid] = type
+        self.objects[uuid] = obj
+        self.fq_names[(type, tuple(fq_name))] = uuid
+        self.by_type[type][uuid] = None
+        for ref_type, ref_uuid, attr in refs or []:
+            self.add_ref(uuid, ref_uuid, attr)
+        return uuid
+
+    def get(self, uuid, type=None):
+        if uuid not in self.objects or \
+                (type is not None and self.types[uuid] != type):
+            raise NotFound('%s not found' % uuid)
+        return self.objects[uuid]
+
+    def update(self, uuid, data):
+        obj = self.get(uuid)
+        for key, value in data.items():
+            if key in ('uuid', 'fq_name', 'href', 'parent_type', 'parent_uuid', 'name'):
+                continue
+            if key.endswith('_refs'):
+                for ref in obj.get(key, []):
+                    self.back_refs[ref['uuid']].discard(uuid)
+                obj.pop(key, None)
+                for ref in value:
+                    self.add_ref(uuid, self.resolve_ref(key, ref), ref.get('attr'))
+            else:
+                obj[key] = value
+
+    def delete(self, uuid):
+        obj = self.get(uuid)
+        type = self.types.pop(uuid)
+        for key, value in list(obj.items()):
+            if key.endswith('_refs'):
+                for ref in value:
+                    self.back_refs[ref['uuid']].discard(uuid)
+        if 'parent_uuid' in obj:
+            self.children[obj['parent_uuid']].discard(uuid)
+        del self.objects[uuid]
+        del self.fq_names[(type, tuple(obj['fq_name']))]
+        del self.by_type[type][uuid]
+        self.back_refs.pop(uuid, None)
+        self.children.pop(uuid, None)
+
+    def resolve_ref(self, key, ref):
+        if ref.get('uuid') in self.objects:
+            return ref['uuid']
+        ref_type = key[:-len('_refs')].replace('_', '-')
+        try:
+            return self.fq_names[(ref_type, tuple(ref['to']))]
+        except KeyError:
+            raise NotFound('%s %s not found' % (ref_type, ref.get('to')))
+
+    def add_ref(self, uuid, ref_uuid, attr=None):
+        obj = self.get(uuid)
+        key = '%s_refs' % _attr(self.types[ref_uuid])
+        refs = obj.setdefault(key, [])
+        refs[:] = [r for r in refs if r['uuid'] != ref_uuid]
+        refs.append({'to': self.objects[ref_uuid]['fq_name'],
+                     'uuid': ref_uuid,
+                     'attr': attr})
+        self.back_refs[ref_uuid].add(uuid)
+
+    def del_ref(self, uuid, ref_uuid):
+        obj = self.get(uuid)
+        key = '%s_refs' % _attr(self.types.get(ref_uuid, ''))
+        refs = [r for r in obj.get(key, []) if r['uuid'] != ref_uuid]
+        if refs:
+            obj[key] = refs
+        else:
+            obj.pop(key, None)
+        self.back_refs[ref_uuid].discard(uuid)
+
+
+def text_uuid():
+    return '%s' % uuidlib.uuid4()
+
+
+class StubAPI(object):
+    """WSGI application serving a :py:class:`Store`.
+    """
+
+    def __init__(self, store, latency=0):
+        self.store = store
+        self.latency = latency
+        self.stats = defaultdict(int)
+
+    def href(self, type, uuid):
+        return '%s/%s/%s' % (self.base_url, type, uuid)
+
+    def _link(self, type, uuid):
+        obj = self.store.objects[uuid]
+        return {'to': obj['fq_name'], 'uuid': uuid, 'href': self.href(type, uuid)}
+
+    def render(self, uuid, fields=None, back_refs=True, children=True):
+        type = self.store.types[uuid]
+        obj = self.store.objects[uuid]
+        data = {'uuid': uuid,
+                'fq_name': obj['fq_name'],
+                'href': self.href(type, uuid)}
+        for key, value in obj.items():
+            if fields is not None and key not in fields and key != 'parent_uuid':
+                continue
+            if key.endswith('_refs'):
+                value = [dict(ref, href=self.href(key[:-5].replace('_', '-'), ref['uuid']))
+                         for ref in value]
+            data[key] = value
+        if back_refs:
+            for src_uuid in self.store.back_refs.get(uuid, ()):
+                key = '%s_back_refs' % _attr(self.store.types[src_uuid])
+                if fields is not None and key not in fields:
+                    continue
+                link = self._link(self.store.types[src_uuid], src_uuid)
+                for ref in self.store.objects[src_uuid].get('%s_refs' % _attr(type), []):
+                    if ref['uuid'] == uuid:
+                        link['attr'] = ref['attr']
+                data.setdefault(key, []).append(link)
+        if children:
+            for child_uuid in self.store.children.get(uuid, ()):
+                key = '%ss' % _attr(self.store.types[child_uuid])
+                if fields is not None and key not in fields:
+                    continue
+                data.setdefault(key, []).append(self._link(self.store.types[child_uuid],
+                                                           child_uuid))
+        return data
+
+    def list(self, type, params):
+        uuids = list(self.store.by_type.get(type, {}))
+        if 'parent_id' in params:
+            parents = params['parent_id'].split(',')
+            uuids = [u for u in uuids
+                     if self.store.objects[u].get('parent_uuid') in parents]
+        if 'back_ref_id' in params:
+            back_refs = set(params['back_ref_id'].split(','))
+            uuids = [u for u in uuids if self.store.back_refs.get(u, set()) & back_refs]
+        if 'filters' in params:
+            for f in params['filters'].split(','):
+                name, value = f.split('==', 1)
+                value = json.loads(value)
+                uuids = [u for u in uuids if self.store.objects[u].get(name) == value]
+        if params.get('count'):
+            return {'%ss' % type: {'count': len(uuids)}}
+        fields = params.get('fields')
+        fields = fields.split(',') if fields else None
+        if params.get('detail') in ('True', 'true'):
+            # like the API server back_refs and children are only
+            # returned if explicitely asked with fields
+            return {'%ss' % type: [{type: self.render(u, fields=None, back_refs=fields is not None,
+                                                      children=fields is not None)}
+                                   for u in uuids]}
+        if fields:
+            return {'%ss' % type: [self.render(u, fields=fields) for u in uuids]}
+        return {'%ss' % type: [{'uuid': u,
+                                'fq_name': self.store.objects[u]['fq_name'],
+                                'href': self.href(type, u)}
+                               for u in uuids]}
+
+    def create(self, type, data):
+        data = dict(data[type])
+        fq_name = data.pop('fq_name')
+        parent_uuid = data.pop('parent_uuid', None)
+        if parent_uuid is None and len(fq_name) > 1 and data.get('parent_type'):
+            parent_uuid = self.store.fq_names.get((data['parent_type'], tuple(fq_name[:-1])))
+        data.pop('parent_type', None)
+        data.pop('uuid', None)
+        refs = [(key, ref) for key in list(data) if key.endswith('_refs')
+                for ref in data.pop(key)]
+        uuid = self.store.add(type, fq_name, parent_uuid=parent_uuid, **data)
+        for key, ref in refs:
+            self.store.add_ref(uuid, self.store.resolve_ref(key, ref), ref.get('attr'))
+        return {type: {'uuid': uuid, 'fq_name': fq_name, 'href': self.href(type, uuid)}}
+
+    def ref_update(self, data):
+        uuid = data['uuid']
+        ref_uuid = data.get('ref-uuid')
+        if not ref_uuid:
+            ref_uuid = self.store.fq_names[(data['ref-type'], tuple(data['ref-fq-name']))]
+        if data['operation'] == 'ADD':
+            self.store.add_ref(uuid, ref_uuid, data.get('attr'))
+        else:
+            self.store.del_ref(uuid, ref_uuid)
+        return {'uuid': uuid}
+
+    def kv(self, data):
+        if data['operation'] == 'RETRIEVE':
+            if data['key'] is None:
+                return {'value': [{'key': k, 'value': v} for k, v in self.store.kv.items()]}
+            if data['key'] not in self.store.kv:
+                raise NotFound('%s not found' % data['key'])
+            return {'value': self.store.kv[data['key']]}
+        if data['operation'] == 'STORE':
+            self.store.kv[data['key']] = data['value']
+        else:
+            self.store.kv.pop(data['key'], None)
+        return {}
+
+    def dispatch(self, method, path, params, body):
+        parts = [p for p in path.split('/') if p]
+        if method == 'GET' and parts == ['_stats']:
+            return dict(self.stats, objects=len(self.store))
+        if method == 'POST' and parts == ['_stats']:
+            self.stats.clear()
+            return {}
+        self.stats['requests'] += 1
+        self.stats[method] += 1
+        if self.latency:
+            gevent.sleep(self.latency)
+        if not parts:
+            return {'links': [{'link': {'rel': 'collection', 'name': t,
+                                        'href': '%s/%ss' % (self.base_url, t)}}
+                              for t in self.store.by_type]}
+        if len(parts) == 1:
+            name = parts[0]
+            if method == 'POST' and name == 'fqname-to-id':
+                try:
+                    return {'uuid': self.store.fq_names[(body['type'], tuple(body['fq_name']))]}
+                except KeyError:
+                    raise NotFound('Name %s not found' % body['fq_name'])
+            if method == 'POST' and name == 'id-to-fqname':
+                obj = self.store.get(body['uuid'])
+                return {'fq_name': obj['fq_name'],
+                        'type': _attr(self.store.types[body['uuid']])}
+            if method == 'POST' and name == 'ref-update':
+                self.stats['write'] += 1
+                return self.ref_update(body)
+            if method == 'POST' and name == 'useragent-kv':
+                return self.kv(body)
+            if name.endswith('s'):
+                if method == 'GET':
+                    self.stats['list'] += 1
+                    return self.list(name[:-1], params)
+                if method == 'POST':
+                    self.stats['write'] += 1
+                    return self.create(name[:-1], body)
+        if len(parts) == 2:
+            type, uuid = parts
+            if method == 'GET':
+                self.store.get(uuid, type)
+                return {type: self.render(uuid,
+                                          back_refs='exclude_back_refs' not in params,
+                                          children='exclude_children' not in params)}
+            if method == 'PUT':
+                self.stats['write'] += 1
+                self.store.update(uuid, body[type])
+                return {type: {'uuid': uuid, 'href': self.href(type, uuid)}}
+            if method == 'DELETE':
+                self.stats['write'] += 1
+                self.store.delete(uuid)
+                return {}
+        raise NotFound('%s %s not found' % (method, path))
+
+    def __call__(self, environ, start_response):
+        method = environ['REQUEST_METHOD']
+        params = dict((k, v[0]) for k, v in
+                      parse_qs(environ.get('QUERY_STRING', '')).items())
+        body = None
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+        if length:
+            body = json.loads(environ['wsgi.input'].read(length).decode('utf-8'))
+        try:
+            status = '200 OK'
+            result = self.dispatch(method, environ['PATH_INFO'], params, body)
+        except (NotFound, Conflict) as e:
+            status = e.status
+            result = {'message': '%s' % e}
+        payload = json.dumps(result).encode('utf-8')
+        start_response(str(status), [(str('Content-Type'), str('application/json')),
+                                     (str('Content-Length'), str(len(payload)))])
+        return [payload]
+
+
+class Server(WSGIServer):
+
+    def handle(self, sock, address):
+        # responses are written in several chunks, don't let Nagle's
+        # algorithm delay them
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.application.stats['connections'] += 1
+        return super(Server, self).handle(sock, address)
+
+
+def serve(store, latency=0, host='127.0.0.1', port=0):
+    """Serve the store from a forked process.
+
+    The API server runs in its own process so that the time spent by the
+    stub does not count in the command being measured.
+
+    :rtype: (pid, base_url)
+    """
+    app = StubAPI(store, latency=latency)
+    server = Server((host, port), app, log=None)
+    server.init_socket()
+    app.base_url = 'http://%s:%s' % (host, server.server_port)
+    pid = os.fork()
+    if pid == 0:
+        gevent.reinit()
+        try:
+            server.serve_forever()
+        finally:
+            os._exit(0)
+    server.socket.close()
+    return pid, app.base_url
+
+
+def stop(pid):
+    os.kill(pid, signal.SIGTERM)
+    os.waitpid(pid, 0)
@@ -1,9 +1,10 @@
 # -*- coding: utf-8 -*-
 from pycassa import ConnectionPool, ColumnFamily, ConsistencyLevel
-from contrail_api_cli.utils import printo
-from ..utils import CassandraCommand, CheckCommand, ConfirmCommand
+from ..utils import CassandraCommand, CheckCommand, ConfirmCommand, ProfileCommand, \
+    ProgressCommand, ReportCommand, cassandra_objects_count
 
-class CleanObjMandatoryFields(CassandraCommand, CheckCommand, ConfirmCommand):
+class CleanObjMandatoryFields(ProfileCommand, ProgressCommand, ReportCommand, CassandraCommand,
+                              CheckCommand, ConfirmCommand):
     """Remove ressources with missing mandatory fields
     
     If an object has a missing parameter included in
@@ -20,15 +21,21 @@ class CleanObjMandatoryFields(CassandraCommand, CheckCommand, ConfirmCommand):
         self.obj_uuid_cf = ColumnFamily(pool, "obj_uuid_table",\
                 read_consistency_level=ConsistencyLevel.QUORUM)
 
-        for obj_uuid, _ in self.obj_uuid_cf.get_range(column_count=1):
+        fqname_cf = ColumnFamily(pool, 'obj_fq_name_table')
+
+        for obj_uuid, _ in self.progress_iter(self.obj_uuid_cf.get_range(column_count=1),
+                                              total=lambda: cassandra_objects_count(fqname_cf),
+                                              unit='objects'):
             cols = dict(self.obj_uuid_cf.xget(obj_uuid))
             missing_cols = set(self.OBJ_MANDATORY_COLUMNS) - set(cols.keys())
             if not missing_cols:
                 continue
-            printo("Found object %s with missing fields [%s]" % (obj_uuid,
+            self.info("Found object %s with missing fields [%s]" % (obj_uuid,
                 ", ".join(missing_cols)))
             if self.check or self.dry_run:
-                printo("Would remove object %s" % obj_uuid)
+                message = "Would remove object %s" % obj_uuid
             else:
-                printo("Removing object %s" % obj_uuid)
+                message = "Removing object %s" % obj_uuid
                 self.obj_uuid_cf.remove(obj_uuid)
+            self.report(message, uuid=obj_uuid, reason='missing_fields',
+                        action='delete', missing_fields=sorted(missing_cols))
@@ -1,12 +1,12 @@
 # -*- coding: utf-8 -*-
 from pycassa import ConnectionPool, ColumnFamily
 
-from contrail_api_cli.utils import printo
+from ..utils import CheckCommand, CassandraCommand, ProfileCommand, \
+    ProgressCommand, ReportCommand, cassandra_objects_count
 
-from ..utils import CheckCommand, CassandraCommand
 
-
-class CleanFQN(CassandraCommand, CheckCommand):
+class CleanFQN(ProfileCommand, ProgressCommand, ReportCommand, CassandraCommand,
+               CheckCommand):
     """Remove stale entries in obj_fq_name_table.
 
     Check for each FQN in obj_fq_name_table if a related UUID exists
@@ -30,7 +30,9 @@ class CleanFQN(CassandraCommand, CheckCommand):
 
         # If no entry match the query, the number of columns should be 0 
         if not self.uuid_cf.get_count(obj_uuid):
-            printo("Object %s %s will be removed from the db." % (obj_type, fqn))
+            self.report("Object %s %s will be removed from the db." % (obj_type, fqn),
+                        type=obj_type, uuid=obj_uuid, reason='stale_fq_name',
+                        action='delete', fq_name=fqn)
             if not self.check and not self.dry_run:
                 self.fqname_cf.remove(key=obj_type, columns=[fqn])
 
@@ -41,9 +43,9 @@ class CleanFQN(CassandraCommand, CheckCommand):
         self.uuid_cf = ColumnFamily(pool, 'obj_uuid_table')
         
         fqn_rows = self.fqname_cf.get_range()
+        fqns = ((fqn, fqn_row[0]) for fqn_row in fqn_rows
+                for fqn in fqn_row[1].keys())
 
-        for fqn_row in fqn_rows:
-            obj_type = fqn_row[0]
-            fqns = fqn_row[1].keys()
-            for fqn in fqns:
-                self._process_fqn(fqn, obj_type)
+        for fqn, obj_type in self.progress_iter(
+                fqns, total=lambda: cassandra_objects_count(self.fqname_cf), unit='fqns'):
+            self._process_fqn(fqn, obj_type)
@@ -5,11 +5,11 @@ import logging
 from pycassa import ConnectionPool, ColumnFamily
 from urllib import unquote_plus
 
-from contrail_api_cli.command import Command, Option
+from contrail_api_cli.command import Option
 from contrail_api_cli.resource import Resource, Collection
 from contrail_api_cli.exceptions import ResourceNotFound
 
-from ..utils import server_type
+from ..utils import server_type, ProfileCommand, ProgressCommand, ReportCommand
 
 
 logger = logging.getLogger(__name__)
@@ -29,7 +29,7 @@ def decode_string(dec_str, encoding='utf-8'):
         return dec_str
 
 
-class OrphanedACL(Command):
+class OrphanedACL(ProfileCommand, ProgressCommand, ReportCommand):
     """Removes stale ACLs.
 
     ACL is considered as stale if it has no parent::
@@ -54,7 +54,10 @@ class OrphanedACL(Command):
                                type=server_type,
                                default=['localhost:9160'])
 
-    def __call__(self, force=False, parent_type=None, cassandra_servers=None):
+    def __call__(self, force=False, parent_type=None, cassandra_servers=None, **kwargs):
+        super(OrphanedACL, self).__call__(**kwargs)
+        # orphaned ACLs are only deleted with --force
+        self.dry_run = not force
         valid_acl = []
         parents = Collection(parent_type, fetch=True, recursive=2)
         for parent in parents:
@@ -68,7 +71,10 @@ class OrphanedACL(Command):
         # So that ugly hack directly fetch all ACL UUIDs from the cassandra database :(
         pool = ConnectionPool('config_db_uuid', server_list=cassandra_servers)
         fqname_cf = ColumnFamily(pool, 'obj_fq_name_table')
-        for key, value in fqname_cf.xget('access_control_list'):
+        acls = self.progress_iter(fqname_cf.xget('access_control_list'),
+                                  total=lambda: fqname_cf.get_count('access_control_list'),
+                                  unit='acls')
+        for key, value in acls:
             acl_uuid = decode_string(key).split(':')[-1]
             if acl_uuid in valid_acl:
                 continue
@@ -86,6 +92,9 @@ class OrphanedACL(Command):
                         msg = msg + " Delete orphan ACL %s." % acl.uuid
                         acl.delete()
                     logger.debug(msg)
+                    self.report(None, type=acl.type, uuid=acl.uuid,
+                                reason='no_parent', action='delete',
+                                parent_type=parent_type, parent_uuid=acl['parent_uuid'])
                     orphaned_acls.add(acl['uuid'])
                 else:
                     logger.debug("The ACL %(acl)s have a %(parent_type)s %(parent_acl)s which exists but \
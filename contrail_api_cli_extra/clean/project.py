@@ -4,20 +4,20 @@ import logging
 
 from keystoneclient.v2_0 import client as kclient
 
-from contrail_api_cli.command import Command, Arg, expand_paths
+from contrail_api_cli.command import Arg, expand_paths
 from contrail_api_cli.resource import Collection
-from contrail_api_cli.utils import printo, parallel_map, FQName
+from contrail_api_cli.utils import FQName
 from contrail_api_cli.exceptions import ChildrenExists, BackRefsExists, ResourceNotFound
 from contrail_api_cli.client import HttpError
 from contrail_api_cli.context import Context
 
-from ..utils import ConfirmCommand
+from ..utils import ConfirmCommand, ParallelCommand, ProfileCommand, ReportCommand
 
 
 logger = logging.getLogger(__name__)
 
 
-class FindOrphanedProjects(Command):
+class FindOrphanedProjects(ProfileCommand, ReportCommand, ParallelCommand):
     """Command to find projects that are still in contrail but no more in keystone.
 
     Run::
@@ -35,17 +35,18 @@ class FindOrphanedProjects(Command):
             self.kclient.tenants.get(keystone_uuid)
         except HttpError as e:
             if e.http_status == 404:
-                printo(self.current_path(project))
+                self.report(self.current_path(project), type=project.type,
+                            uuid=project.uuid, reason='not_in_keystone')
             else:
                 raise
 
-    def __call__(self):
+    def __call__(self, **kwargs):
+        super(FindOrphanedProjects, self).__call__(**kwargs)
         self.kclient = kclient.Client(session=Context().session)
-        parallel_map(self._check, Collection('project', fetch=True),
-                     workers=50)
+        self.parallel_map(self._check, Collection('project', fetch=True))
 
 
-class PurgeProject(ConfirmCommand):
+class PurgeProject(ReportCommand, ConfirmCommand):
     """Command to purge a project. All related resources are deleted.
 
     .. warning::
@@ -91,15 +92,18 @@ class PurgeProject(ConfirmCommand):
         self._delete(iip)
 
     def _remove_back_ref(self, resource, parent):
-        printo("remove back ref from %s to %s" %
-               (self.current_path(parent), self.current_path(resource)))
+        self.report("remove back ref from %s to %s" %
+                    (self.current_path(parent), self.current_path(resource)),
+                    type=parent.type, uuid=parent.uuid, action='remove_back_ref',
+                    back_ref=str(resource.path))
         parent.remove_back_ref(resource)
 
     def _delete(self, resource, parent=None):
         try:
             logger.debug("trying to delete %s" % self.current_path(resource))
             resource.delete()
-            printo("%s deleted" % self.current_path(resource))
+            self.report("%s deleted" % self.current_path(resource),
+                        type=resource.type, uuid=resource.uuid, action='delete')
         except (ChildrenExists, BackRefsExists) as e:
             logger.debug("failed: %s" % e)
             action = self.actions[e.__class__].get(
@@ -6,12 +6,11 @@ import argparse
 from pycassa import ConnectionPool, ColumnFamily
 
 from contrail_api_cli.command import Option, Arg
-from contrail_api_cli.utils import printo
 
-from ..utils import server_type, CheckCommand
+from ..utils import server_type, CheckCommand, ProfileCommand, ReportCommand
 
 
-class CleanRefs(CheckCommand):
+class CleanRefs(ProfileCommand, ReportCommand, CheckCommand):
     """Clean references in Contrail DB.
 
     Broken refs can be found with gremlin.
@@ -76,7 +75,9 @@ class CleanRefs(CheckCommand):
                 self.uuid_cf.remove(target)
                 self.uuid_cf.remove(source, columns=['%s:%s:%s' % (self.ref_type, self.target_type, target)])
 
-        printo("[%s -> %s] deleted" % (source, target))
+        self.report("[%s -> %s] deleted" % (source, target),
+                    type=self.target_type, uuid=target, reason='broken_ref',
+                    action='delete', source=source, ref_type=self.ref_type)
         self._remove_refs(paths[2:])
 
     def _read_file(self, resources_file):
@@ -3,19 +3,21 @@ from __future__ import unicode_literals
 
 from six import text_type
 
-from contrail_api_cli.utils import printo, parallel_map
-from contrail_api_cli.exceptions import ResourceNotFound
+from contrail_api_cli.exceptions import ResourceNotFound, CommandError
 from contrail_api_cli.command import Option
+from contrail_api_cli.resource import Collection
 
-from ..utils import CheckCommand, ZKCommand, PathCommand
+from ..utils import CheckCommand, ZKCommand, PathCommand, ParallelCommand, \
+    ProfileCommand, ReportCommand, RouteTargetAllocator
 
 
-class CleanRT(CheckCommand, ZKCommand, PathCommand):
+class CleanRT(ProfileCommand, ReportCommand, CheckCommand, ZKCommand, PathCommand, ParallelCommand):
     """Removes stale route-targets.
 
     RTs that are not linked to a logical-router or a routing-instance are
     considered as staled and will be removed. If a ZK lock exists for the
-    RT it will be removed::
+    RT it will be removed. ZK locks are listed once at startup, they are
+    created and removed by batches::
 
         contrail-api-cli --ns contrail_api_cli.clean clean-route-target --zk-server <ip> [route-target/uuid]
 
@@ -25,72 +27,122 @@ class CleanRT(CheckCommand, ZKCommand, PathCommand):
     You can exclude RT from the cleaning process::
 
         contrail-api-cli --ns contrail_api_cli.clean clean-route-target --exclude <RT_FQNAME> --exclude <RT_FQNAME> [...]
+
+    With ``--zk-orphans`` the command removes instead the ZK locks of RTs
+    that don't exist anymore in the API. All RTs are listed from the API
+    after the ZK locks and compared with them, no route-target path can be
+    given::
+
+        contrail-api-cli --ns contrail_api_cli.clean clean-route-target --zk-orphans --zk-server <ip>
     """
 
     exclude = Option('-e', action="append", default=[],
                      help="Exclude RT from the clean procedure")
+    zk_orphans = Option(action="store_true", default=False,
+                        help="Remove ZK locks without RT in the API")
     description = "Clean stale route targets"
+    resource_fields = ['routing_instance_back_refs', 'logical_router_back_refs']
 
     @property
     def resource_type(self):
         return "route-target"
 
-    def log(self, message, rt):
-        printo('[%s] %s' % (rt.uuid, message))
+    def log(self, message, rt, reason=None, action=None, **fields):
+        self.report('[%s] %s' % (rt.uuid, message), type=rt.type, uuid=rt.uuid,
+                    reason=reason, action=action, **fields)
 
     def _get_rt_id(self, rt):
-        return int(rt['name'].split(':')[-1])
+        return int(rt.fq_name[-1].split(':')[-1])
 
     def _get_zk_node(self, rt_id):
-        return '/id/bgp/route-targets/%010d' % rt_id
+        return self.rt_locks.zk_node(rt_id)
 
     def _ensure_lock(self, rt):
         rt_id = self._get_rt_id(rt)
         # No locks created for rt_id < 8000000
         if rt_id < 8000000:
             return
-        zk_node = '/id/bgp/route-targets/%010d' % rt_id
-        if not self.zk_client.exists(zk_node):
+        zk_node = self._get_zk_node(rt_id)
+        if rt_id not in self.rt_locks:
             if rt.get('logical_router_back_refs'):
                 fq_name = rt['logical_router_back_refs'][0].fq_name
             else:
                 # FIXME: can't determine routing-instance for route-target
                 # don't create any lock
                 return
-            if not self.dry_run:
-                self.zk_client.create(zk_node, text_type(fq_name).encode('utf-8'))
-            self.log("Added missing ZK lock %s" % zk_node, rt)
+            self.rt_locks.create_lock(rt_id, text_type(fq_name))
+            if self.dry_run or self.check:
+                message = "Would add missing ZK lock %s" % zk_node
+            else:
+                message = "Added missing ZK lock %s" % zk_node
+            self.log(message, rt, reason='missing_lock', action='create_lock',
+                     zk_path=zk_node)
 
     def _clean_rt(self, rt):
         try:
             if not self.dry_run:
                 rt.delete()
-            self.log("Removed RT %s" % rt.path, rt)
+            self.log("Removed RT %s" % rt.path, rt, reason='stale', action='delete')
             rt_id = self._get_rt_id(rt)
             zk_node = self._get_zk_node(rt_id)
-            if self.zk_client.exists(zk_node):
-                if not self.dry_run:
-                    self.zk_client.delete(zk_node)
-                self.log("Removed ZK lock %s" % zk_node, rt)
+            if rt_id in self.rt_locks:
+                self.rt_locks.delete_lock(rt_id)
+                self.log("Removed ZK lock %s" % zk_node, rt,
+                         reason='stale', action='delete_lock', zk_path=zk_node)
         except ResourceNotFound:
             pass
 
     def _check_rt(self, rt):
         try:
-            rt.fetch()
+            self.fetch_resource(rt)
         except ResourceNotFound:
             return
         if not rt.get('routing_instance_back_refs') and not rt.get('logical_router_back_refs'):
             if text_type(rt.fq_name) in self.exclude:
-                self.log('RT %s staled [excluded]' % rt.fq_name, rt)
+                self.log('RT %s staled [excluded]' % rt.fq_name, rt,
+                         reason='stale', excluded=True)
             else:
-                self.log('RT %s staled' % rt.fq_name, rt)
+                self.log('RT %s staled' % rt.fq_name, rt, reason='stale')
                 if self.check is not True:
                     self._clean_rt(rt)
         else:
             self._ensure_lock(rt)
 
-    def __call__(self, exclude=None, **kwargs):
-        super(CleanRT, self).__call__(**kwargs)
+    def list_resources(self):
+        # with --zk-orphans RTs are listed after the ZK locks
+        if self.zk_orphans:
+            return []
+        return super(CleanRT, self).list_resources()
+
+    def _clean_zk_orphans(self):
+        # RTs are listed after the ZK locks so that the lock of an
+        # RT created between the two listings is not seen as orphaned
+        rt_ids = set(self._get_rt_id(rt)
+                     for rt in Collection('route-target', fetch=True))
+        # locks below 8000000 are not created by the API server
+        orphans = [rt_id for rt_id in self.rt_locks.ids if rt_id not in rt_ids]
+        for rt_id in orphans:
+            zk_node = self._get_zk_node(rt_id)
+            if self.check:
+                message = "ZK lock %s has no RT" % zk_node
+            else:
+                self.rt_locks.delete_lock(rt_id)
+                message = "Removed ZK lock %s without RT" % zk_node
+            self.report(message, type='route-target', reason='orphaned_lock',
+                        action='delete_lock', zk_path=zk_node)
+
+    def __call__(self, exclude=None, zk_orphans=False, paths=None, **kwargs):
+        if zk_orphans and paths:
+            raise CommandError('--zk-orphans considers all RTs, no path can be given')
+        self.zk_orphans = zk_orphans
+        super(CleanRT, self).__call__(paths=paths, **kwargs)
         self.exclude = exclude
-        parallel_map(self._check_rt, self.resources, workers=50)
+        self.rt_locks = RouteTargetAllocator(self.zk_client,
+                                             dry_run=self.dry_run or self.check)
+        try:
+            if zk_orphans:
+                self._clean_zk_orphans()
+            else:
+                self.parallel_map(self._check_rt, self.resources)
+        finally:
+            self.rt_locks.flush()
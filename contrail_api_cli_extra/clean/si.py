@@ -1,13 +1,13 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
-from contrail_api_cli.utils import printo, parallel_map
 from contrail_api_cli.exceptions import ResourceNotFound
 
-from ..utils import CheckCommand, PathCommand
+from ..utils import CheckCommand, PathCommand, ParallelCommand, ProfileCommand, \
+    ReportCommand
 
 
-class CleanSIScheduling(CheckCommand, PathCommand):
+class CleanSIScheduling(ProfileCommand, ReportCommand, CheckCommand, PathCommand, ParallelCommand):
     """On some occasion a SI VM can be scheduled on multiple virtual-routers.
 
     In such case the command will remove extraenous VR links on the SI VM::
@@ -17,6 +17,7 @@ class CleanSIScheduling(CheckCommand, PathCommand):
     ``--check`` and ``--dry-run`` options are available.
     """
     description = "Clean bad vrouter scheduling"
+    resource_fields = ['virtual_machine_back_refs']
 
     @property
     def resource_type(self):
@@ -26,30 +27,34 @@ class CleanSIScheduling(CheckCommand, PathCommand):
         for vr in vm.get('virtual_router_back_refs')[1:]:
             if not self.dry_run:
                 vm.remove_back_ref(vr)
-            printo("Removed %s from %s" % (vr.fq_name, vm.uuid))
+            self.report("Removed %s from %s" % (vr.fq_name, vm.uuid),
+                        type=vm.type, uuid=vm.uuid, reason='multiple_vrouters',
+                        action='remove_back_ref', virtual_router=vr.fq_name)
 
     def _check_si(self, si):
         try:
-            si.fetch()
+            self.fetch_resource(si)
         except ResourceNotFound:
             return
         for vm in si.get('virtual_machine_back_refs', []):
             vm.fetch()
             if len(vm.get('virtual_router_back_refs', [])) > 1:
-                printo('SI %s VM %s is scheduled on %s' %
-                       (si.path, vm.uuid, ", ".join([
-                           str(vr.fq_name)
-                           for vr in vm['virtual_router_back_refs']
-                       ])))
+                self.report('SI %s VM %s is scheduled on %s' %
+                            (si.path, vm.uuid, ", ".join([
+                                str(vr.fq_name)
+                                for vr in vm['virtual_router_back_refs']
+                            ])),
+                            type=si.type, uuid=si.uuid, reason='multiple_vrouters',
+                            virtual_machine=vm.uuid)
                 if self.check is not True:
                     self._clean_vm(vm)
 
     def __call__(self, paths=None, **kwargs):
         super(CleanSIScheduling, self).__call__(**kwargs)
-        parallel_map(self._check_si, self.resources, workers=50)
+        self.parallel_map(self._check_si, self.resources)
 
 
-class CleanStaleSI(CheckCommand, PathCommand):
+class CleanStaleSI(ProfileCommand, ReportCommand, CheckCommand, PathCommand, ParallelCommand):
     """Clean stale service instances.
 
     SIs are considered stale when:
@@ -66,6 +71,11 @@ class CleanStaleSI(CheckCommand, PathCommand):
     ``--check`` and ``--dry-run`` options are available.
     """
     description = "Clean stale SIs"
+    resource_fields = ['service_template_refs',
+                       'logical_router_back_refs',
+                       'loadbalancer_pool_back_refs',
+                       'loadbalancer_back_refs',
+                       'virtual_machine_back_refs']
 
     @property
     def resource_type(self):
@@ -75,7 +85,8 @@ class CleanStaleSI(CheckCommand, PathCommand):
         """Return True if the snat SI is stale.
         """
         if 'logical_router_back_refs' not in si:
-            printo('[%s] No logical router attached to SI' % si.uuid)
+            self.report('[%s] No logical router attached to SI' % si.uuid,
+                        type=si.type, uuid=si.uuid, reason='no_logical_router')
             return True
 
         return False
@@ -88,7 +99,8 @@ class CleanStaleSI(CheckCommand, PathCommand):
                 len(si['loadbalancer_pool_back_refs']) == 0) and
                 ('loadbalancer_back_refs' not in si or
                  len(si['loadbalancer_back_refs']) == 0)):
-            printo('[%s] No pool or loadbalancer attached to SI' % si.uuid)
+            self.report('[%s] No pool or loadbalancer attached to SI' % si.uuid,
+                        type=si.type, uuid=si.uuid, reason='no_pool')
             return True
 
         # lbaas v1
@@ -97,38 +109,46 @@ class CleanStaleSI(CheckCommand, PathCommand):
             pool.fetch()
 
             if 'virtual_ip_back_refs' not in pool:
-                printo('[%s] No VIP attached to pool' % si.uuid)
+                self.report('[%s] No VIP attached to pool' % si.uuid,
+                            type=si.type, uuid=si.uuid, reason='no_vip')
                 return True
 
             vip = pool['virtual_ip_back_refs'][0]
             vip.fetch()
 
             if 'virtual_machine_interface_refs' not in vip:
-                printo('[%s] No VMI for VIP' % si.uuid)
+                self.report('[%s] No VMI for VIP' % si.uuid,
+                            type=si.type, uuid=si.uuid, reason='no_vip_vmi')
                 return True
 
             vip_vmi = vip['virtual_machine_interface_refs'][0]
             vip_vmi.fetch()
 
             if 'instance_ip_back_refs' not in vip_vmi:
-                printo('[%s] No IIP found for VIP VMI' % si.uuid)
+                self.report('[%s] No IIP found for VIP VMI' % si.uuid,
+                            type=si.type, uuid=si.uuid, reason='no_vip_iip')
                 return True
 
         return False
 
     def _remove_back_ref(self, si, r1, r2):
-        printo('[%s] Remove back_ref from %s to %s' % (si.uuid, str(r1.path),
-                                                       str(r2.path)))
+        self.report('[%s] Remove back_ref from %s to %s' % (si.uuid, str(r1.path),
+                                                            str(r2.path)),
+                    type=r1.type, uuid=r1.uuid, reason='stale_si',
+                    action='remove_back_ref', service_instance=si.uuid,
+                    back_ref=str(r2.path))
         if not self.dry_run:
             r1.remove_back_ref(r2)
 
     def _delete_res(self, si, r):
-        printo('[%s] Delete %s' % (si.uuid, str(r.path)))
+        self.report('[%s] Delete %s' % (si.uuid, str(r.path)),
+                    type=r.type, uuid=r.uuid, reason='stale_si', action='delete',
+                    service_instance=si.uuid)
         if not self.dry_run:
             r.delete()
 
     def _clean_lbaas_si(self, si):
-        printo('[%s] Cleaning stale lbaas' % si.uuid)
+        self.info('[%s] Cleaning stale lbaas' % si.uuid)
         for pool in si.get('loadbalancer_pool_back_refs', []):
             pool.fetch()
             for vip in pool.get('virtual_ip_back_refs', []):
@@ -163,26 +183,29 @@ class CleanStaleSI(CheckCommand, PathCommand):
         self._delete_res(si, si)
 
     def _check_si(self, si):
-        si.fetch()
+        self.fetch_resource(si)
         try:
             si_t = si['service_template_refs'][0]
         except (KeyError, IndexError):
-            printo('[%s] SI %s has no template, skipping.' % (si.uuid,
-                                                              str(si.path)))
+            self.report('[%s] SI %s has no template, skipping.' % (si.uuid,
+                                                                   str(si.path)),
+                        type=si.type, uuid=si.uuid, reason='no_template')
             return
 
         if ('haproxy-loadbalancer-template' in si_t.fq_name and
                 self._is_stale_lbaas(si)):
-            printo('[%s] Found stale lbaas %s' % (si.uuid, str(si.fq_name)))
+            self.report('[%s] Found stale lbaas %s' % (si.uuid, str(si.fq_name)),
+                        type=si.type, uuid=si.uuid, reason='stale_lbaas')
             if self.check is not True:
                 self._clean_lbaas_si(si)
                 self._clean_si(si)
 
         if 'netns-snat-template' in si_t.fq_name and self._is_stale_snat(si):
-            printo('[%s] Found stale SNAT %s' % (si.uuid, str(si.fq_name)))
+            self.report('[%s] Found stale SNAT %s' % (si.uuid, str(si.fq_name)),
+                        type=si.type, uuid=si.uuid, reason='stale_snat')
             if self.check is not True:
                 self._clean_si(si)
 
     def __call__(self, paths=None, **kwargs):
         super(CleanStaleSI, self).__call__(**kwargs)
-        parallel_map(self._check_si, self.resources, workers=50)
+        self.parallel_map(self._check_si, self.resources)
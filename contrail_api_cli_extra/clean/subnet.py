@@ -3,12 +3,12 @@ from __future__ import unicode_literals
 
 from contrail_api_cli.context import Context
 from contrail_api_cli.resource import Resource
-from contrail_api_cli.utils import printo, continue_prompt
+from contrail_api_cli.utils import continue_prompt
 
-from ..utils import CheckCommand
+from ..utils import CheckCommand, ProfileCommand, ReportCommand
 
 
-class CleanSubnet(CheckCommand):
+class CleanSubnet(ProfileCommand, ReportCommand, CheckCommand):
     """Command to fix subnets KV store.
 
     This command works by first retrieving all the KV store, then it
@@ -55,7 +55,7 @@ class CleanSubnet(CheckCommand):
 
                 kv.update({subnet_uuid: vn_uuid})
                 kv.update({vn_uuid: subnet_uuid})
-        printo("Clean KV store should have %d entries." % len(kv))
+        self.info("Clean KV store should have %d entries." % len(kv))
         return kv
 
     def _get_stale_subnets(self, kv, healthy_kv):
@@ -65,8 +65,9 @@ class CleanSubnet(CheckCommand):
             value = _dict['value']
             if not (key in healthy_kv and str(value) == healthy_kv[key]):
                 stale_subnets.append(key)
-        printo("Current KV store contains %d stale entries." %
-               len(stale_subnets))
+                self.report(None, type='kv', uuid=key, reason='stale_kv', value=value)
+        self.info("Current KV store contains %d stale entries." %
+                  len(stale_subnets))
         return stale_subnets
 
     def _clean_kv(self, session, stale_subnets, dry_run=False):
@@ -74,9 +75,9 @@ class CleanSubnet(CheckCommand):
             for key in stale_subnets:
                 if not dry_run:
                     session.remove_kv_store(key)
-                printo(
+                self.report(
                     "Entry with key \"%s\" has been removed from the KV store" %
-                    key)
+                    key, type='kv', uuid=key, reason='stale_kv', action='delete')
 
     def __call__(self, **kwargs):
         super(CleanSubnet, self).__call__(**kwargs)
@@ -2,17 +2,19 @@
 from __future__ import unicode_literals
 
 from netaddr import IPNetwork, IPAddress
+from kazoo.exceptions import NoNodeError
 
 from contrail_api_cli.command import Option
 from contrail_api_cli.resource import Resource
-from contrail_api_cli.utils import printo, parallel_map
 from contrail_api_cli.exceptions import ResourceNotFound
 
-from ..utils import ZKCommand, CheckCommand, PathCommand
+from ..utils import ZKCommand, CheckCommand, PathCommand, ParallelCommand, \
+    ProfileCommand, ReportCommand, SubnetIndex
 
 
-class FixFIPLocks(ZKCommand, CheckCommand, PathCommand):
+class FixFIPLocks(ProfileCommand, ReportCommand, ZKCommand, CheckCommand, PathCommand, ParallelCommand):
     description = "Add missing locks for FIPs"
+    resource_fields = ['floating_ip_address']
     public_fqname = Option(help="Public network fqname",
                            required=True,
                            complete="resources:virtual-network:fq_name")
@@ -21,32 +23,37 @@ class FixFIPLocks(ZKCommand, CheckCommand, PathCommand):
     def resource_type(self):
         return "floating-ip"
 
-    def log(self, message, fip):
-        printo('[%s] %s' % (fip.uuid, message))
+    def log(self, message, fip, reason=None, action=None):
+        self.report('[%s] %s' % (fip.uuid, message),
+                    type=fip.type, uuid=fip.uuid, reason=reason, action=action)
 
-    def _get_subnet_for_ip(self, ip, subnets):
-        for subnet in subnets:
-            if ip in subnet:
-                return subnet
+    def _zk_node_for_subnet(self, subnet):
+        return '/api-server/subnets/%s:%s' % (self.public_fqname, subnet)
 
     def _zk_node_for_ip(self, ip, subnet):
-        return '/api-server/subnets/%s:%s/%i' % (self.public_fqname, subnet, ip)
+        return '%s/%i' % (self._zk_node_for_subnet(subnet), ip)
+
+    def _get_locks(self, subnet):
+        try:
+            return set(self.zk_client.get_children(self._zk_node_for_subnet(subnet)))
+        except NoNodeError:
+            return set()
 
     def _check_fip(self, fip, subnets):
         try:
-            fip.fetch()
+            self.fetch_resource(fip)
         except ResourceNotFound:
             return
         ip = IPAddress(fip.get('floating_ip_address'))
-        subnet = self._get_subnet_for_ip(ip, subnets)
+        subnet = subnets.get(ip)
         if subnet is None:
-            self.log('No subnet found for FIP %s' % ip, fip)
+            self.log('No subnet found for FIP %s' % ip, fip, reason='no_subnet')
             return
-        zk_node = self._zk_node_for_ip(ip, subnet)
-        if not self.zk_client.exists(zk_node):
-            self.log('Lock not found', fip)
-            if self.check is not True or self.dry_run is not True:
-                self.zk_client.create(zk_node)
+        if '%i' % ip not in self.locks[subnet]:
+            self.log('Lock not found', fip, reason='missing_lock', action='create_lock')
+            if not self.check and not self.dry_run:
+                self.zk_client.create(self._zk_node_for_ip(ip, subnet))
+                self.locks[subnet].add('%i' % ip)
 
     def __call__(self, public_fqname=None, **kwargs):
         super(FixFIPLocks, self).__call__(**kwargs)
@@ -56,5 +63,8 @@ class FixFIPLocks(ZKCommand, CheckCommand, PathCommand):
         subnets = []
         for s in public_vn['network_ipam_refs'][0]['attr']['ipam_subnets']:
             subnets.append(IPNetwork('%s/%s' % (s['subnet']['ip_prefix'], s['subnet']['ip_prefix_len'])))
+        subnets = SubnetIndex(subnets)
+        # IPs locked in each subnet
+        self.locks = dict((subnet, self._get_locks(subnet)) for subnet in subnets)
 
-        parallel_map(self._check_fip, self.resources, args=(subnets,), workers=50)
+        self.parallel_map(self._check_fip, self.resources, args=(subnets,))
@@ -2,12 +2,13 @@
 from __future__ import unicode_literals
 
 from contrail_api_cli.exceptions import CommandError
-from contrail_api_cli.utils import FQName, printo
+from contrail_api_cli.utils import FQName
 
-from ..utils import CheckCommand, PathCommand, ConfirmCommand
+from ..utils import CheckCommand, PathCommand, ConfirmCommand, ProfileCommand, \
+    ReportCommand
 
 
-class FixSg(CheckCommand, PathCommand, ConfirmCommand):
+class FixSg(ProfileCommand, ReportCommand, CheckCommand, PathCommand, ConfirmCommand):
     """Fix multiple default security groups on projects.
 
     It appears sometimes several default security groups have been
@@ -43,19 +44,27 @@ class FixSg(CheckCommand, PathCommand, ConfirmCommand):
         return "Some SGs can be deleted. Are you sure to continue?"
 
     def _handle_sg(self, status, sg, delete=True):
-        printo("    %s  SG: %s %s" % (status, sg.uuid, sg.fq_name))
+        msg = "    %s  SG: %s %s" % (status, sg.uuid, sg.fq_name)
+        if delete:
+            self.report(msg, type=sg.type, uuid=sg.uuid, reason='bad_default_sg')
+        else:
+            self.info(msg)
         if not self.check:
             used = False
             sg.fetch()
             for vmi in sg.back_refs.virtual_machine_interface:
                 used = True
-                printo("        Used by VMI %s" % vmi.uuid)
+                self.info("        Used by VMI %s" % vmi.uuid)
             if not used and delete:
                 if not self.dry_run:
-                    printo("            Deleting SG %s ..." % sg.uuid)
+                    self.report("            Deleting SG %s ..." % sg.uuid,
+                                type=sg.type, uuid=sg.uuid, reason='bad_default_sg',
+                                action='delete')
                     sg.delete()
                 else:
-                    printo("            [dry-run] Deleting SG %s ..." % sg.uuid)
+                    self.report("            [dry-run] Deleting SG %s ..." % sg.uuid,
+                                type=sg.type, uuid=sg.uuid, reason='bad_default_sg',
+                                action='delete')
 
     def __call__(self, paths=None, **kwargs):
         super(FixSg, self).__call__(**kwargs)
@@ -74,7 +83,7 @@ class FixSg(CheckCommand, PathCommand, ConfirmCommand):
                             good_sg.append(sg)
                 if bad_sg != []:
                     bad_sg_exists = True
-                    printo("Tenant       %s %s" % (r.uuid, r.fq_name))
+                    self.info("Tenant       %s %s" % (r.uuid, r.fq_name))
                     for sg in bad_sg:
                         self._handle_sg("Bad ", sg)
                     for sg in good_sg:
@@ -4,14 +4,13 @@ from __future__ import unicode_literals
 from contrail_api_cli.client import HttpError
 from contrail_api_cli.resource import Resource
 from contrail_api_cli.schema import require_schema
-from contrail_api_cli.utils import printo, parallel_map
 from contrail_api_cli.command import Arg
 from contrail_api_cli.context import Context
 
-from ..utils import CheckCommand
+from ..utils import CheckCommand, ParallelCommand, ProfileCommand, ReportCommand
 
 
-class FixSubnets(CheckCommand):
+class FixSubnets(ProfileCommand, ReportCommand, CheckCommand, ParallelCommand):
     """Fix subnet/vn association in kv store.
 
     When the API server is not properly started the hooks that populates
@@ -59,19 +58,25 @@ class FixSubnets(CheckCommand):
         try:
             self.session.search_kv_store(subnet_uuid)
         except HttpError:
-            printo('Missing key %s for subnet %s' % (subnet_uuid, subnet_uuid))
+            self.report('Missing key %s for subnet %s' % (subnet_uuid, subnet_uuid),
+                        type='subnet', uuid=subnet_uuid, reason='missing_kv',
+                        key=subnet_uuid)
             to_add.append((subnet_uuid, subnet_key))
         if self.schema_version < "3.2" :
             try:
                 self.session.search_kv_store(subnet_key)
             except HttpError:
-                printo('Missing key %s for subnet %s' % (subnet_key, subnet_uuid))
+                self.report('Missing key %s for subnet %s' % (subnet_key, subnet_uuid),
+                            type='subnet', uuid=subnet_uuid, reason='missing_kv',
+                            key=subnet_key)
                 to_add.append((subnet_key, subnet_uuid))
         return to_add
 
     def fix(self, to_add):
         for (key, value) in to_add:
-            printo('Adding kv %s:%s' % (key, value))
+            self.report('Adding kv %s:%s' % (key, value),
+                        type='subnet', reason='missing_kv', action='add_kv',
+                        key=key, value=value)
             if not self.dry_run:
                 self.session.add_kv_store(key, value)
 
@@ -90,6 +95,6 @@ class FixSubnets(CheckCommand):
         to_check = [(vn.uuid, subnet.get('subnet_uuid'), subnet)
                     for vn in ipam.back_refs.virtual_network
                     for subnet in vn.get('attr', {}).get('ipam_subnets', [])]
-        to_fix = parallel_map(self.chk, to_check, workers=50)
+        to_fix = self.parallel_map(self.chk, to_check)
         if not self.dry_run and not self.check:
-            parallel_map(self.fix, to_fix, workers=50)
+            self.parallel_map(self.fix, to_fix)
@@ -4,10 +4,8 @@ from six import text_type
 
 import kazoo.exceptions
 
-from contrail_api_cli.exceptions import CommandError
-from contrail_api_cli.utils import printo
-
-from ..utils import ZKCommand, CheckCommand, ConfirmCommand, PathCommand
+from ..utils import ZKCommand, CheckCommand, ConfirmCommand, PathCommand, \
+    ParallelCommand, ProfileCommand, ReportCommand, IdAllocator
 
 ZK_BASEPATH = "/id/virtual-networks"
 
@@ -16,6 +14,10 @@ def to_zk_index(nid):
     return "%(#)010d" % {'#': nid - 1}
 
 
+def from_zk_index(zk_index):
+    return int(zk_index) + 1
+
+
 class Indexes(object):
     # Index managed by the user are always API index. They are internally
     # translated into Zookeeper indexes by this class.
@@ -24,33 +26,33 @@ class Indexes(object):
 
     def __init__(self, zk_client):
         self._zk_client = zk_client
-        self._zk_indexes = self._zk_client.get_children(ZK_BASEPATH)
+        self._allocator = IdAllocator(self.start, self.end)
+        for zk_index in self._zk_client.get_children(ZK_BASEPATH):
+            self._allocator.reserve(from_zk_index(zk_index))
+
+    def reserve(self, index):
+        """Mark index as used without creating its lock.
+        """
+        self._allocator.reserve(index)
+
+    def get_available_indexes(self, count):
+        """Allocate `count` indexes that had no lock in Zookeeper.
+        """
+        return self._allocator.allocate(count)
 
     def get_available_index(self):
-        if len(self._zk_indexes) == self.end:
-            raise CommandError("No available index")
-        for i in range(self.start, self.end):
-            zk_i = to_zk_index(i)
-            if zk_i not in self._zk_indexes:
-                try:
-                    self._zk_client.get(ZK_BASEPATH + "/" + zk_i)
-                    self._zk_indexes.append(zk_i)
-                    return self.get_available_index()
-                except kazoo.exceptions.NoNodeError:
-                    return i
+        return self.get_available_indexes(1)[0]
 
     def create(self, index, resource, dry_run):
         value = text_type(resource.fq_name).encode("utf-8")
         zk_index = to_zk_index(index)
-        if dry_run:
-            print "[dry_run] ",
-        printo("%s Create Zookeeper %s with value %s" % (resource.path, ZK_BASEPATH + "/" + zk_index, value))
         if not dry_run:
             self._zk_client.create(ZK_BASEPATH + "/" + zk_index, value=value)
-        self._zk_indexes.append(zk_index)
+        self._allocator.reserve(index)
 
 
-class FixVnId(PathCommand, ZKCommand, CheckCommand, ConfirmCommand):
+class FixVnId(ProfileCommand, ReportCommand, PathCommand, ZKCommand, CheckCommand,
+              ConfirmCommand, ParallelCommand):
     """Compare and fix virtual network IDs in Zookeeper and the API server.
 
     Checks that the ZK lock for a VN has the correct index. Checks also that the VN
@@ -66,6 +68,7 @@ class FixVnId(PathCommand, ZKCommand, CheckCommand, ConfirmCommand):
 
     """
     description = "Fix the virtual network Zookeeper locks"
+    resource_fields = ['virtual_network_network_id', 'virtual_network_properties']
 
     @property
     def resource_type(self):
@@ -75,45 +78,68 @@ class FixVnId(PathCommand, ZKCommand, CheckCommand, ConfirmCommand):
     def confirm_message(self):
         return 'Do you really want to repair virtual networks?'
 
-    def fix(self, vn):
+    def fix(self, vn, lock=None):
         if vn['reason'] == "nolock":
             lock = vn['resource']["virtual_network_network_id"]
-        if vn['reason'] == "badlock":
+        if vn['reason'] == "badlock" and lock is None:
             lock = self.indexes.get_available_index()
 
-        self.indexes.create(lock, vn['resource'], self.dry_run)
+        resource = vn["resource"]
+        while True:
+            try:
+                self.indexes.create(lock, resource, self.dry_run)
+                break
+            except kazoo.exceptions.NodeExistsError:
+                if vn['reason'] != "badlock":
+                    raise
+                # the lock was created since the indexes were listed
+                lock = self.indexes.get_available_index()
+
+        prefix = "[dry_run]  " if self.dry_run else ""
+        self.report("%s%s Create Zookeeper %s with value %s" %
+                    (prefix, resource.path, ZK_BASEPATH + "/" + to_zk_index(lock), resource.fq_name),
+                    type=resource.type, uuid=resource.uuid, reason=vn['reason'],
+                    action='create_lock', nid=lock)
 
         if vn['reason'] == "badlock":
-            resource = vn["resource"]
             resource["virtual_network_network_id"] = lock
             try:
                 resource["virtual_network_properties"]["network_id"] = lock
             except KeyError:
                 pass
-            if self.dry_run:
-                print "[dry_run] ",
-            printo("%s Set VN ID to %s" % (resource.path, lock))
+            self.report("%s%s Set VN ID to %s" % (prefix, resource.path, lock),
+                        type=resource.type, uuid=resource.uuid, reason=vn['reason'],
+                        action='update', nid=lock)
             if not self.dry_run:
                 resource.save()
 
     def generate(self):
+        if self.resources_fetched:
+            resources = list(self.resources)
+        else:
+            resources = self.parallel_map(self.fetch_resource, self.resources)
+        # get all the locks at once and join them with the VNs
+        locks = dict(self.zk_get_many(
+            set(ZK_BASEPATH + "/" + to_zk_index(r["virtual_network_network_id"])
+                for r in resources
+                if r.get("virtual_network_network_id") is not None)))
         result = []
-        for r in self.resources:
-            r.fetch()
+        for r in resources:
             nid = r.get("virtual_network_network_id", None)
             if nid is not None:
-                try:
-                    zk_data, _ = self.zk_client.get(ZK_BASEPATH + "/" + to_zk_index(nid))
-                    if "%s" % zk_data.decode('utf-8') != "%s" % r.fq_name:
-                        result.append({"reason": "badlock", "nid": nid, "path": r.path,
-                                       "api-fqname": text_type(r.fq_name), "zk-fqname": zk_data,
-                                       "resource": r})
-                except kazoo.exceptions.NoNodeError:
+                zk_data = locks[ZK_BASEPATH + "/" + to_zk_index(nid)]
+                if zk_data is None:
                     result.append({"reason": "nolock", "nid": nid, "path": r.path,
                                    "api-fqname": text_type(r.fq_name), "resource": r})
+                elif "%s" % zk_data.decode('utf-8') != "%s" % r.fq_name:
+                    result.append({"reason": "badlock", "nid": nid, "path": r.path,
+                                   "api-fqname": text_type(r.fq_name),
+                                   "zk-fqname": zk_data.decode('utf-8'),
+                                   "resource": r})
             else:
                 result.append({"reason": "badlock", "nid": nid, "path": r.path,
-                               "api-fqname": text_type(r.fq_name), "resource": r})
+                               "api-fqname": text_type(r.fq_name), "zk-fqname": None,
+                               "resource": r})
         return result
 
     def __call__(self, vn_paths=None, **kwargs):
@@ -121,10 +147,23 @@ class FixVnId(PathCommand, ZKCommand, CheckCommand, ConfirmCommand):
         self.indexes = None
         result = self.generate()
         self.indexes = Indexes(self.zk_client)
+        # VN ids without lock are kept so they must not be
+        # given to the VNs with bad locks
+        for r in result:
+            if r['reason'] == "nolock":
+                self.indexes.reserve(r['nid'])
+        locks = iter([])
+        if not self.check:
+            locks = iter(self.indexes.get_available_indexes(
+                len([r for r in result if r['reason'] == "badlock"])))
         for r in result:
             if r['reason'] == "nolock":
-                printo("No  lock for %(path)s with VN Id %(nid)6s" % r)
+                self.report("No  lock for %(path)s with VN Id %(nid)6s" % r,
+                            type=r['resource'].type, uuid=r['resource'].uuid,
+                            reason=r['reason'], nid=r['nid'])
             if r['reason'] == "badlock":
-                printo("Bad lock for %(path)s with VN Id %(nid)6s zk-fqname: %(zk-fqname)s ; api-fqname: %(api-fqname)s" % r)
+                self.report("Bad lock for %(path)s with VN Id %(nid)6s zk-fqname: %(zk-fqname)s ; api-fqname: %(api-fqname)s" % r,
+                            type=r['resource'].type, uuid=r['resource'].uuid,
+                            reason=r['reason'], nid=r['nid'], zk_fqname=r['zk-fqname'])
             if not self.check:
-                self.fix(r)
+                self.fix(r, next(locks) if r['reason'] == "badlock" else None)
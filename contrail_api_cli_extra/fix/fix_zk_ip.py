@@ -8,9 +8,9 @@ import kazoo
 from netaddr import IPNetwork, IPAddress, AddrFormatError
 
 from contrail_api_cli.exceptions import CommandError, ResourceNotFound
-from contrail_api_cli.utils import printo
 
-from ..utils import ZKCommand, CheckCommand, PathCommand, ConfirmCommand
+from ..utils import ZKCommand, CheckCommand, PathCommand, ConfirmCommand, \
+    ProfileCommand, ProgressCommand, ReportCommand
 
 
 logger = logging.getLogger(__name__)
@@ -32,7 +32,7 @@ class UnhandledResourceType(Exception):
     pass
 
 
-class FixZkIP(ZKCommand, CheckCommand, PathCommand, ConfirmCommand):
+class FixZkIP(ProfileCommand, ProgressCommand, ReportCommand, ZKCommand, CheckCommand, PathCommand, ConfirmCommand):
     """Remove or add ZK locks based on the IPAM configuration.
 
     Sometimes, when an instance-ip or a floating-ip is created or deleted, its
@@ -127,7 +127,8 @@ class FixZkIP(ZKCommand, CheckCommand, PathCommand, ConfirmCommand):
                     msg = ('{0} INVALID IP : zk_path={1}/{2}'
                            .format(text_type(ip), zk_subnet_req, text_type(ip)))
                     logger.warning(msg)
-                    printo(msg)
+                    self.report(msg, type=vn.type, uuid=vn.uuid, reason='invalid_ip',
+                                zk_path='%s/%s' % (zk_subnet_req, ip))
                     continue
                 try:
                     self._get_ip_subnet([s], zk_ip)
@@ -138,7 +139,8 @@ class FixZkIP(ZKCommand, CheckCommand, PathCommand, ConfirmCommand):
                                    zk_subnet_req,
                                    int(zk_ip)))
                     logger.warning(msg)
-                    printo(msg)
+                    self.report(msg, type=vn.type, uuid=vn.uuid, reason='out_of_range',
+                                ip=zk_ip, zk_path='%s/%s' % (zk_subnet_req, ip))
                     continue
                 zk_ips[zk_ip] = zk_subnet_req + '/' + text_type(int(zk_ip)).zfill(10)
         if zk_subnets_err:
@@ -171,13 +173,13 @@ class FixZkIP(ZKCommand, CheckCommand, PathCommand, ConfirmCommand):
                        'valid IP address. unable to check it.'
                        .format(iip_ip, vn.fq_name))
                 logger.info(msg)
-                printo(msg)
+                self.report(msg, type=iip.type, uuid=iip.uuid, reason='invalid_ip')
             except KeyError:
                 msg = ('instance ip {0} for virtual network {1} '
                        'has no ip address. unable to check it.'
                        .format(iip.uuid, vn.fq_name))
                 logger.info(msg)
-                printo(msg)
+                self.report(msg, type=iip.type, uuid=iip.uuid, reason='no_ip')
 
         for pool in vn.children.floating_ip_pool:
             try:
@@ -198,7 +200,7 @@ class FixZkIP(ZKCommand, CheckCommand, PathCommand, ConfirmCommand):
                            'valid IP address. unable to check it.'
                            .format(fip_ip, vn.fq_name))
                     logger.info(msg)
-                    printo(msg)
+                    self.report(msg, type=fip.type, uuid=fip.uuid, reason='invalid_ip')
                     continue
 
         return api_ips
@@ -207,7 +209,7 @@ class FixZkIP(ZKCommand, CheckCommand, PathCommand, ConfirmCommand):
         if self.zk_client.exists(text_type(zk_req)):
             msg = ('{0} already exists'.format(zk_req))
             logger.info(msg)
-            printo(msg)
+            self.info(msg)
             self.stats['miss_lock_fixed'] += 1
             return
         if not self.dry_run:
@@ -224,17 +226,23 @@ class FixZkIP(ZKCommand, CheckCommand, PathCommand, ConfirmCommand):
                 logger.exception(msg)
                 raise CommandError(msg)
 
-    def del_znode_ip(self, ip, zk_path):
+    def del_znode_ip(self, ip, zk_path, vn=None):
         msg = ("Deleting zookeeper node %d for IP %s" % (int(ip), ip))
-        printo(msg)
+        fields = {'type': 'virtual-network',
+                  'uuid': vn.uuid if vn is not None else None,
+                  'reason': 'abusive_lock',
+                  'ip': ip,
+                  'zk_path': zk_path}
+        self.report(msg, action='delete_lock', **fields)
         if not self.dry_run:
             try:
                 self.zk_client.delete(zk_path)
                 self.stats['abusive_lock_fixed'] += 1
             except:
                 self.stats['abusive_lock_fix_failed'] += 1
-                printo('Unable to delete zookeeper znode for ip '
-                      '%s with path %s' % (ip, zk_path))
+                self.report('Unable to delete zookeeper znode for ip '
+                            '%s with path %s' % (ip, zk_path),
+                            action='delete_lock_failed', **fields)
 
     def add_ip_lock(self, vn, ip, data_lock):
         try:
@@ -243,7 +251,8 @@ class FixZkIP(ZKCommand, CheckCommand, PathCommand, ConfirmCommand):
             self.stats['miss_lock_fix_failed'] += 1
             return
         msg = ('Creating zookeeper node %s for IP %s' % (zk_req, ip))
-        printo(msg)
+        self.report(msg, type=vn.type, uuid=vn.uuid, reason='missing_lock',
+                    action='create_lock', ip=ip, zk_path=zk_req)
         if not self.dry_run:
             self.create_znode(zk_req, data_lock)
 
@@ -268,7 +277,7 @@ class FixZkIP(ZKCommand, CheckCommand, PathCommand, ConfirmCommand):
         data_lock = vn.uuid
         self.add_ip_lock(vn, ip, data_lock)
 
-    def check_tuple(self, api_ips, zk_ips):
+    def check_tuple(self, api_ips, zk_ips, vn=None):
         ips = {}
         ips_index = set(api_ips.keys()) | set(zk_ips.keys())
 
@@ -285,13 +294,18 @@ class FixZkIP(ZKCommand, CheckCommand, PathCommand, ConfirmCommand):
             else:
                 logger.info(text_type(ip) + ' : NOT FOUND IN ZOOKEEPER')
                 self.stats['miss_lock'] += 1
-                if not self.check:
+                if self.check:
+                    self.report(None, type=api_ips[ip].type, uuid=api_ips[ip].uuid,
+                                reason='missing_lock', ip=ip)
+                else:
                     try:
                         self.add_znode_ip(ip, api_ips[ip])
                     except (ResourceNotFound, UnhandledResourceType) as e:
                         msg = e.msg
                         logger.warning(e)
-                        printo(msg)
+                        self.report(msg, type=api_ips[ip].type, uuid=api_ips[ip].uuid,
+                                    reason='missing_lock', action='create_lock_failed',
+                                    ip=ip)
 
             if ip in api_ips:
                 ips[ip].update({'resource': api_ips[ip]})
@@ -300,8 +314,12 @@ class FixZkIP(ZKCommand, CheckCommand, PathCommand, ConfirmCommand):
             else:
                 logger.info(text_type(ip) + ' : NOT FOUND IN API')
                 self.stats['abusive_lock'] += 1
-                if not self.check:
-                    self.del_znode_ip(ip, zk_ips[ip])
+                if self.check:
+                    self.report(None, type='virtual-network',
+                                uuid=vn.uuid if vn is not None else None,
+                                reason='abusive_lock', ip=ip, zk_path=zk_ips[ip])
+                else:
+                    self.del_znode_ip(ip, zk_ips[ip], vn=vn)
 
             if zk_ok and api_ok:
                 self.stats['healthy_lock'] += 1
@@ -313,26 +331,29 @@ class FixZkIP(ZKCommand, CheckCommand, PathCommand, ConfirmCommand):
             status = 'OK'
         else:
             status = 'KO'
-        printo('Status : %s' % status)
+        self.report(None, type=resource.type, uuid=resource.uuid, reason='status',
+                    status=status, **self.stats)
+        self.info('Status : %s' % status)
         if status == 'KO':
-            printo('Healthy locks : %d ' % self.stats['healthy_lock'])
-            printo('Missing locks : %d ' % self.stats['miss_lock'])
+            self.info('Healthy locks : %d ' % self.stats['healthy_lock'])
+            self.info('Missing locks : %d ' % self.stats['miss_lock'])
             if not self. dry_run:
-                printo('Fixed missing locks : %d' %
-                       self.stats['miss_lock_fixed'])
-                printo('Failed missing locks fix: %d' %
-                       self.stats['miss_lock_fix_failed'])
-            printo('Abusive locks : %d' % self.stats['abusive_lock'])
+                self.info('Fixed missing locks : %d' %
+                          self.stats['miss_lock_fixed'])
+                self.info('Failed missing locks fix: %d' %
+                          self.stats['miss_lock_fix_failed'])
+            self.info('Abusive locks : %d' % self.stats['abusive_lock'])
             if not self.dry_run:
-                printo('Fixed abusive locks : %d' %
-                       self.stats['abusive_lock_fixed'])
-                printo('Failed abusive locks fix: %d' %
-                       self.stats['abusive_lock_fix_failed'])
-        printo("")
+                self.info('Fixed abusive locks : %d' %
+                          self.stats['abusive_lock_fixed'])
+                self.info('Failed abusive locks fix: %d' %
+                          self.stats['abusive_lock_fix_failed'])
+        self.info("")
 
     def __call__(self, **kwargs):
         super(FixZkIP, self).__call__(**kwargs)
-        for r in self.resources:
+        for r in self.progress_iter(self.resources, total=len(self.resources),
+                                    unit='networks'):
             self.stats = {'miss_lock': 0,
                           'miss_lock_fixed': 0,
                           'miss_lock_fix_failed': 0,
@@ -344,15 +365,17 @@ class FixZkIP(ZKCommand, CheckCommand, PathCommand, ConfirmCommand):
                 r.fetch()
             except ResourceNotFound:
                 continue
-            printo("Checking VN %s" % r.fq_name)
+            self.info("Checking VN %s" % r.fq_name)
             try:
                 api_ips = self.get_api_ip(r)
                 zk_ips = self.get_zk_ip(r)
-                self.check_tuple(api_ips, zk_ips)
+                self.check_tuple(api_ips, zk_ips, vn=r)
                 self.print_stats(r)
             except SubnetNotFound:
-                printo("No subnets found")
-                printo("")
+                self.report("No subnets found", type=r.type, uuid=r.uuid,
+                            reason='no_subnet')
+                self.info("")
             except ZkNodeNotFound as exc:
                 msg = str(exc)
-                printo(msg)
+                self.report(msg, type=r.type, uuid=r.uuid, reason='missing_subnet_node',
+                            zk_paths=exc.zk_subnets)
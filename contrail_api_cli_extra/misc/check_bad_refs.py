@@ -6,11 +6,11 @@ from pycassa import ConnectionPool, ColumnFamily
 
 from contrail_api_cli.command import Option, Arg
 from contrail_api_cli.resource import Resource
-from contrail_api_cli.exceptions import ResourceNotFound
-from contrail_api_cli.utils import printo, highlight_json, \
-    parallel_map, continue_prompt
+from contrail_api_cli.exceptions import ResourceNotFound, CommandError
+from contrail_api_cli.utils import highlight_json, continue_prompt
 
-from ..utils import server_type, CheckCommand
+from ..utils import server_type, positive_int_type, cassandra_objects_count, \
+    CheckCommand, ParallelCommand, ProfileCommand, ProgressCommand, ReportCommand
 
 
 class PropertiesEncoder(json.JSONEncoder):
@@ -21,7 +21,8 @@ class PropertiesEncoder(json.JSONEncoder):
         return json.JSONEncoder.encode(self, o)
 
 
-class CheckBadRefs(CheckCommand):
+class CheckBadRefs(ProfileCommand, ProgressCommand, ReportCommand, CheckCommand,
+                   ParallelCommand):
     """Check for broken references.
 
     The command will read all objects from the cassandra DB then
@@ -32,6 +33,10 @@ class CheckBadRefs(CheckCommand):
     To run the command:
 
         contrail-api-cli check-bad-refs --cassandra-servers db:9160 [uuids...]
+
+    Incomplete resources are deleted after confirmation unless ``--force``
+    is given. With ``--output jsonl``, ``--check`` or ``--force`` is
+    required so that no prompt is mixed with the JSON lines.
     """
     description = "Check for broken references"
     uuids = Arg(help="check specific uuids",
@@ -42,6 +47,10 @@ class CheckBadRefs(CheckCommand):
                                default=['localhost:9160'])
     force = Option('-f', help="force deletion of incomplete resources",
                    action="store_true", default=False)
+    workers = Option(help="number of concurrent workers checking the "
+                          "refs of a resource (default: %(default)s)",
+                     type=positive_int_type,
+                     default=20)
 
     def _props_to_json(self, values):
         if self.is_piped:
@@ -53,7 +62,8 @@ class CheckBadRefs(CheckCommand):
             r_type = json.loads(values['type']).replace('_', '-')
             return Resource(r_type, uuid=uuid)
         except KeyError:
-            printo("[%s] incomplete, no type" % uuid)
+            self.report("[%s] incomplete, no type" % uuid, uuid=uuid,
+                        reason='no_type')
             return False
 
     def _check_ref(self, ref, uuid):
@@ -62,7 +72,8 @@ class CheckBadRefs(CheckCommand):
             Resource(ref_type.replace('_', '-'), uuid=ref_uuid, check=True)
             return False
         except ResourceNotFound:
-            printo("[%s] broken ref to missing %s" % (uuid, ref))
+            self.report("[%s] broken ref to missing %s" % (uuid, ref), uuid=uuid,
+                        reason='broken_ref', ref=ref)
             return True
 
     def _check_resource_refs(self, uuid, values):
@@ -71,16 +82,19 @@ class CheckBadRefs(CheckCommand):
         for key, _ in values.items():
             if key.startswith(ref_attrs):
                 to_check.append(key)
-        results = parallel_map(self._check_ref, to_check, args=(uuid,), workers=20)
+        results = self.parallel_map(self._check_ref, to_check, args=(uuid,))
         return any(results)
 
     def _delete(self, uuid_cf, uuid):
         if not self.dry_run:
             uuid_cf.remove(uuid)
-        printo("[%s] deleted" % uuid)
+        self.report("[%s] deleted" % uuid, uuid=uuid, reason='no_type',
+                    action='delete')
 
     def __call__(self, uuids=None, cassandra_servers=None, force=False, **kwargs):
         super(CheckBadRefs, self).__call__(**kwargs)
+        if self.output == 'jsonl' and not self.check and not force:
+            raise CommandError('--output jsonl requires --check or --force')
         self.force = force
         pool = ConnectionPool('config_db_uuid', server_list=cassandra_servers)
         uuid_cf = ColumnFamily(pool, 'obj_uuid_table')
@@ -88,17 +102,21 @@ class CheckBadRefs(CheckCommand):
             def uuids_g():
                 for uuid in uuids:
                     yield uuid
+            total = len(uuids)
         else:
             def uuids_g():
                 for k, v in uuid_cf.get_range(column_count=1, filter_empty=True):
                     yield k
 
-        for uuid in uuids_g():
+            def total():
+                return cassandra_objects_count(ColumnFamily(pool, 'obj_fq_name_table'))
+
+        for uuid in self.progress_iter(uuids_g(), total=total, unit='objects'):
             values = dict(uuid_cf.xget(uuid))
             res = self._get_current_resource(uuid, values)
             bad_refs = self._check_resource_refs(uuid, values)
             if not res or bad_refs:
-                printo(self._props_to_json(values))
+                self.info(self._props_to_json(values))
             if not res and not self.check:
                 if self.force or continue_prompt(message="Delete ?"):
                     self._delete(uuid_cf, uuid)
@@ -17,6 +17,7 @@ class RPF(PathCommand):
     To enable of disable RPF add ``--on`` or ``--off`` options.
     """
     description = 'enable/disable RPF on network'
+    resource_detail = True
     on = Option(action='store_true',
                 help='Enable RPF')
     off = Option(action='store_true',
@@ -29,7 +30,7 @@ class RPF(PathCommand):
     def __call__(self, on=False, off=False, **kwargs):
         super(RPF, self).__call__(**kwargs)
         for vn in self.resources:
-            vn.fetch()
+            self.fetch_resource(vn)
             if 'virtual_network_properties' not in vn:
                 vn['virtual_network_properties'] = {
                     "allow_transit": None,
@@ -1,13 +1,15 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 import json
+from six import text_type
 
+from contrail_api_cli.client import HttpError
 from contrail_api_cli.command import Command, Arg, Option
-from contrail_api_cli.exceptions import CommandError
+from contrail_api_cli.exceptions import CommandError, NotFound, Exists
 from contrail_api_cli.resource import Resource, Collection
 from contrail_api_cli.utils import FQName
 
-from ..utils import ip_type, port_type, md5_type, RouteTargetAction
+from ..utils import ip_type, port_type, md5_type, parallel_map, RouteTargetAction
 
 ADDRESS_FAMILIES = ['route-target', 'inet-vpn', 'e-vpn', 'erm-vpn',
                     'inet6-vpn']
@@ -37,20 +39,10 @@ class AddBGPRouter(BGPRouter):
     router_md5 = Option(default=None, type=md5_type,
                         help="MD5 authentication (default: %(default)s)")
 
-    def __call__(self, router_name=None, router_ip=None, router_port=None,
-                 router_asn=None, router_address_families=[],
-                 router_type=None, router_md5=None):
-
-        default_ri = Resource('routing-instance', fq_name=DEFAULT_RI_FQ_NAME,
-                              check=True)
-        router_fq_name = DEFAULT_RI_FQ_NAME + [router_name]
-
-        bgp_router = Resource('bgp-router',
-                              fq_name=router_fq_name)
-        if bgp_router.exists:
-            raise CommandError("The BGP router %s already exists" %
-                               FQName(router_fq_name))
-
+    def _router_parameters(self, router_ip=None, router_port=None,
+                           router_asn=None, router_address_families=None,
+                           router_type=None, router_md5=None, **kwargs):
+        router_address_families = list(router_address_families or [])
         if router_type != 'contrail' and 'erm-vpn' in router_address_families:
             router_address_families.remove('erm-vpn')
 
@@ -63,7 +55,7 @@ class AddBGPRouter(BGPRouter):
                 }],
                 'key_type': 'md5',
             }
-        router_parameters = {
+        return {
             'address': router_ip,
             'address_families': {
                 'family': router_address_families,
@@ -75,31 +67,99 @@ class AddBGPRouter(BGPRouter):
             'auth_data': auth_data,
         }
 
-        # full-mesh with existing BGP routers
-        bgp_router_refs = []
-        for bgp_router_neighbor in Collection('bgp-router',
-                                              parent_uuid=default_ri.uuid,
-                                              fetch=True):
-            bgp_router_refs.append({
-                'to': bgp_router_neighbor.fq_name,
-                'attr': {
-                    'session': [{
-                        'attributes': [{
-                            'address_families': {
-                                'family': router_address_families,
-                            },
-                            'auth_data': auth_data,
-                        }],
+    def _mesh_refs(self, router_parameters, neighbors_fq_names):
+        return [{
+            'to': fq_name,
+            'attr': {
+                'session': [{
+                    'attributes': [{
+                        'address_families': router_parameters['address_families'],
+                        'auth_data': router_parameters['auth_data'],
                     }],
-                },
-            })
+                }],
+            },
+        } for fq_name in neighbors_fq_names]
 
-        bgp_router = Resource('bgp-router',
-                              fq_name=router_fq_name,
-                              parent=default_ri,
-                              bgp_router_parameters=router_parameters,
-                              bgp_router_refs=bgp_router_refs)
-        bgp_router.save()
+    def __call__(self, router_name=None, router_ip=None, router_port=None,
+                 router_asn=None, router_address_families=None,
+                 router_type=None, router_md5=None):
+        self.bulk_call([{
+            'router_name': router_name,
+            'router_ip': router_ip,
+            'router_port': router_port,
+            'router_asn': router_asn,
+            'router_address_families': router_address_families,
+            'router_type': router_type,
+            'router_md5': router_md5,
+        }])
+
+    def bulk_call(self, calls, workers=None):
+        """Add several BGP routers.
+
+        Existing routers are listed once. Each router is meshed
+        with the existing routers and the routers added before
+        it, like successive calls of the command would do.
+        Routers are first created concurrently with refs to the
+        existing routers, then the routers meshed with other new
+        routers are updated concurrently. Routers that failed to
+        be created are left out of the mesh and the errors of all
+        routers are reported at the end.
+
+        :param calls: arguments of the command for each router
+        :type calls: [dict]
+        :param workers: number of routers saved concurrently
+        :type workers: int
+        """
+        default_ri = Resource('routing-instance', fq_name=DEFAULT_RI_FQ_NAME,
+                              check=True)
+        neighbors = [n.fq_name for n in Collection('bgp-router',
+                                                   parent_uuid=default_ri.uuid,
+                                                   fetch=True)]
+        existing = set(text_type(FQName(fq_name)) for fq_name in neighbors)
+        added = set()
+        routers = []
+        parameters = []
+        for kwargs in calls:
+            router_fq_name = DEFAULT_RI_FQ_NAME + [kwargs['router_name']]
+            fq_name = text_type(FQName(router_fq_name))
+            if fq_name in existing:
+                raise CommandError("The BGP router %s already exists" % fq_name)
+            if fq_name in added:
+                raise CommandError("The BGP router %s is added twice" % fq_name)
+            added.add(fq_name)
+            router_parameters = self._router_parameters(**kwargs)
+            parameters.append(router_parameters)
+            routers.append(Resource('bgp-router',
+                                    fq_name=router_fq_name,
+                                    parent_type='routing-instance',
+                                    parent_uuid=default_ri.uuid,
+                                    bgp_router_parameters=router_parameters,
+                                    bgp_router_refs=self._mesh_refs(router_parameters,
+                                                                    neighbors)))
+
+        def save(router):
+            try:
+                router.save()
+            # NotFound and Exists errors inherit from GreenletExit
+            # and would be ignored by the greenlets pool
+            except (NotFound, Exists, HttpError) as e:
+                return '%s: %s' % (router.fq_name[-1], e)
+
+        errors = parallel_map(save, routers, workers=workers)
+        created = [idx for idx, error in enumerate(errors) if error is None]
+
+        def mesh(position):
+            idx = created[position]
+            router = routers[idx]
+            router['bgp_router_refs'] = self._mesh_refs(
+                parameters[idx],
+                neighbors + [routers[i].fq_name for i in created[:position]])
+            return save(router)
+        errors += parallel_map(mesh, range(1, len(created)), workers=workers)
+
+        errors = [error for error in errors if error is not None]
+        if errors:
+            raise CommandError('Failed to add BGP routers:\n%s' % '\n'.join(errors))
 
 
 class DelBGPRouter(BGPRouter):
@@ -118,7 +178,8 @@ class ListBGPRouter(Command):
 
     def __call__(self):
         routers = Collection('bgp-router',
-                             fetch=True, recursive=2)
+                             fetch=True,
+                             fields=['bgp_router_parameters'])
         router_info_list = []
         for router in routers:
             router_info = {'router_name': router.fq_name[-1],
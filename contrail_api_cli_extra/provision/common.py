@@ -1,5 +1,10 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
+from six import text_type
+
+from gevent.event import AsyncResult
+
+from contrail_api_cli.resource import Resource
 
 
 def get_network_ipam_subnets(vn):
@@ -13,3 +18,50 @@ def get_network_ipam_subnets(vn):
         vn['network_ipam_refs'] = []
         vn['network_ipam_refs'].append(ipam_ref)
     return vn['network_ipam_refs'][0]['attr']['ipam_subnets']
+
+
+class ResourceCache(object):
+    """Share the resources read by the commands that collect the
+    current environment.
+
+    The provision command runs the list/get commands concurrently, the
+    resources they need (projects, VNs, global configs...) are only
+    fetched once. The cache is used between :py:meth:`enable` and
+    :py:meth:`disable`, otherwise resources are always fetched.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._results = {}
+
+    def enable(self):
+        self.enabled = True
+        self._results = {}
+
+    def disable(self):
+        self.enabled = False
+        self._results = {}
+
+    def resource(self, type, fq_name, check=False):
+        """Return the resource fetched, or only checked when
+        `check` is True.
+
+        Concurrent requests of the same resource wait for the first one.
+        ResourceNotFound is raised for each request.
+
+        :rtype: Resource
+        """
+        if not self.enabled:
+            return Resource(type, fq_name=fq_name, check=check, fetch=not check)
+        key = (type, text_type(fq_name), check)
+        if key not in self._results:
+            result = self._results[key] = AsyncResult()
+            try:
+                result.set(Resource(type, fq_name=fq_name, check=check, fetch=not check))
+            # contrail_api_cli exceptions inherit from GreenletExit
+            except BaseException as e:
+                result.set_exception(e)
+        return self._results[key].get()
+
+
+resource_cache = ResourceCache()
@@ -7,16 +7,18 @@ from contrail_api_cli.resource import Resource
 from contrail_api_cli.exceptions import CommandError
 
 from ..utils import ip_type
+from .common import resource_cache
 
 
 class DNSNameserver(Command):
+    # calls update the same network-ipam
+    parallel = False
     network_ipam_fqname = Option(metavar='fqname',
                                  help='Network IPAM fqname (default: %(default)s)',
                                  default='default-domain:default-project:default-network-ipam')
 
     def __call__(self, network_ipam_fqname=None):
-        self.ipam = Resource('network-ipam', fq_name=network_ipam_fqname,
-                             fetch=True)
+        self.ipam = resource_cache.resource('network-ipam', network_ipam_fqname)
 
         if 'network_ipam_mgmt' not in self.ipam:
             self.ipam['network_ipam_mgmt'] = {
@@ -6,6 +6,8 @@ from contrail_api_cli.command import Command, Arg
 from contrail_api_cli.resource import Resource
 from contrail_api_cli.exceptions import CommandError, ResourceNotFound
 
+from .common import resource_cache
+
 
 class SetEncapsulation(Command):
     description = 'Set vrouters encapsulation modes'
@@ -38,9 +40,9 @@ class GetEncapsulation(Command):
 
     def __call__(self):
         try:
-            vrouter_config = Resource('global-vrouter-config',
-                                      fq_name='default-global-system-config:default-global-vrouter-config',
-                                      fetch=True)
+            vrouter_config = resource_cache.resource(
+                'global-vrouter-config',
+                'default-global-system-config:default-global-vrouter-config')
             if 'encapsulation_priorities' in vrouter_config:
                 return json.dumps({
                     "modes": vrouter_config['encapsulation_priorities'].get('encapsulation', [])
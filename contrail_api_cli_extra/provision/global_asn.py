@@ -7,6 +7,7 @@ from contrail_api_cli.resource import Resource
 from contrail_api_cli.exceptions import ResourceNotFound
 
 from ..utils import RouteTargetAction
+from .common import resource_cache
 
 
 class SetGlobalASN(Command):
@@ -29,9 +30,8 @@ class GetGlobalASN(Command):
 
     def __call__(self):
         try:
-            global_config = Resource('global-system-config',
-                                     fq_name='default-global-system-config',
-                                     fetch=True)
+            global_config = resource_cache.resource('global-system-config',
+                                                    'default-global-system-config')
             if global_config.get('autonomous_system'):
                 return json.dumps({
                     "asn": global_config.get('autonomous_system')
@@ -7,9 +7,12 @@ from contrail_api_cli.resource import Resource
 from contrail_api_cli.exceptions import CommandError, ResourceNotFound
 
 from ..utils import ip_type
+from .common import resource_cache
 
 
 class Linklocal(Command):
+    # calls update the same global-vrouter-config
+    parallel = False
     service_name = Option(help='Linklocal service name',
                           required=True)
     service_ip = Option(help='Linklocal service IP',
@@ -99,9 +102,9 @@ class ListLinklocal(Command):
 
     def __call__(self):
         try:
-            vrouter_config = Resource('global-vrouter-config',
-                                      fq_name='default-global-system-config:default-global-vrouter-config',
-                                      fetch=True)
+            vrouter_config = resource_cache.resource(
+                'global-vrouter-config',
+                'default-global-system-config:default-global-vrouter-config')
             if 'linklocal_services' in vrouter_config:
                 linklocal_list = []
                 for service in vrouter_config['linklocal_services'].get('linklocal_service_entry', []):
@@ -8,10 +8,11 @@ from contrail_api_cli.resource import Resource, Collection
 from contrail_api_cli.utils import FQName, printo
 from contrail_api_cli.exceptions import ResourceNotFound
 
-from common import get_network_ipam_subnets
+from .common import get_network_ipam_subnets, resource_cache
 
 
 class LR(Command):
+    depends = ('vn', 'subnets')
     project_fqname = Option(default="default-domain:default-project",
                             help='Project fqname (default: %(default)s)')
 
@@ -109,15 +110,46 @@ class ListLRs(LR):
     description = 'List logical-routers'
 
     def __call__(self, project_fqname=None):
-        project = Resource('project', fq_name=project_fqname, check=True)
+        project = resource_cache.resource('project', project_fqname, check=True)
         lrs = Collection('logical-router',
                          parent_uuid=project.uuid,
-                         fetch=True, recursive=2)
+                         fetch=True,
+                         fields=['virtual_machine_interface_refs',
+                                 'virtual_network_refs'])
+        vmi_vns = self._get_vmi_vns(project, [ref['uuid'] for lr in lrs
+                                              for ref in lr.get('virtual_machine_interface_refs', [])])
 
         return json.dumps([{
             "project_fqname": str(FQName(lr.fq_name[0:-1])),
             "logical_router_name": str(lr.fq_name[-1]),
-            "vn_fqnames": [str(vn.fq_name) for vmi in lr.refs.virtual_machine_interface
-                           for vn in vmi.fetch().refs.virtual_network],
-            "external_vn_fqname": "".join([str(vn.fq_name) for vn in lr.refs.virtual_network]),
+            "vn_fqnames": [vn_fqname for ref in lr.get('virtual_machine_interface_refs', [])
+                           for vn_fqname in vmi_vns[ref['uuid']]],
+            "external_vn_fqname": "".join([str(FQName(ref['to']))
+                                           for ref in lr.get('virtual_network_refs', [])]),
         } for lr in lrs], indent=2)
+
+    def _get_vmi_vns(self, project, vmi_uuids):
+        """Return the VN fqnames of each LR interface.
+
+        Interfaces are created in the LR project so they are
+        listed with the project interfaces. Interfaces from
+        other projects are fetched one by one.
+
+        :rtype: dict
+        """
+        vmi_vns = {}
+        if not vmi_uuids:
+            return vmi_vns
+        vmi_uuids = set(vmi_uuids)
+        vmis = Collection('virtual-machine-interface',
+                          parent_uuid=project.uuid,
+                          fetch=True,
+                          fields=['virtual_network_refs'])
+        for vmi in vmis:
+            if vmi.uuid in vmi_uuids:
+                vmi_vns[vmi.uuid] = [str(FQName(ref['to']))
+                                     for ref in vmi.get('virtual_network_refs', [])]
+        for vmi_uuid in vmi_uuids - set(vmi_vns):
+            vmi = Resource('virtual-machine-interface', uuid=vmi_uuid, fetch=True)
+            vmi_vns[vmi_uuid] = [str(vn.fq_name) for vn in vmi.refs.virtual_network]
+        return vmi_vns
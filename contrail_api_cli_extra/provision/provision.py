@@ -219,8 +219,8 @@ subnets::
 
 .. note::
 
-    Order matters. When you bootstrap the environment the virtual-network must be
-    provisioned before the subnets.
+    When you bootstrap the environment the virtual-network is provisioned
+    before the subnets. See `Dependencies between resources`_.
 
 route-targets::
 
@@ -238,6 +238,29 @@ route-targets::
         }
     }
 
+Dependencies between resources
+==============================
+
+A provision command can declare the resources it depends on with its
+``depends`` attribute (eg: ``subnets``, ``route-targets`` and ``lr``
+depend on ``vn``). Resources are deleted first, dependent resources
+before the resources they depend on. Then resources are added or set
+in a single phase, a resource after the resources it depends on.
+Additions and modifications are no longer made in two separate phases
+and ``depends`` is the only ordering between keys, the ``order``
+attribute of commands is not used anymore.
+
+If some calls fail, the other calls that were started are finished
+and all the errors are reported. The resources that depend on the
+failed ones are not provisioned.
+
+Independent resources are provisioned concurrently, the number of
+concurrent calls is limited by ``--workers``. Commands that modify a
+shared object (eg: ``dns-nameserver``, ``linklocal``) set ``parallel``
+to False so that their calls are made one after the other. Commands
+that define a ``bulk_call`` method (eg: ``vrouter``) receive all the
+calls of the key at once.
+
 Running the provisioning
 ========================
 
@@ -251,21 +274,69 @@ Then you can run the provision command::
 
 The command will show the actions it will make and waits the input of
 the user to actually make the actions.
+
+The actions can be reviewed and run separately. ``--plan`` saves them
+in a file instead of running them::
+
+    contrail-api-cli provision spec.json --plan plan.json
+
+``--apply-plan`` runs the saved actions without reading the environment
+file. The plan is refused if the resources it modifies changed since it
+was made::
+
+    contrail-api-cli provision --apply-plan plan.json
+
+To make routine runs cheap, ``--state`` saves in a file a hash of each
+key of the environment file and a fingerprint of its current values
+once the environment is provisioned. On the next runs keys whose hash
+and fingerprint didn't change are not diffed::
+
+    contrail-api-cli provision spec.json --state spec.state
+
+The current values of every key are still collected so that changes
+made on the running environment since the last run (eg: a deleted
+vrouter) are corrected. With ``--spec-only`` keys whose hash didn't
+change are skipped without collecting their current values, a run
+without changes in the environment file makes no API calls but changes
+made on the running environment are not seen::
+
+    contrail-api-cli provision spec.json --state spec.state --spec-only
+
+``--only`` limits the provisioning to some keys of the environment file::
+
+    contrail-api-cli provision spec.json --only vrouter,bgp-router
+
+For large environment files install `ijson <https://pypi.org/project/ijson/>`_
+(``pip install contrail-api-cli-extra[ijson]``). The ``provision`` section
+is then parsed one key at a time instead of loading the whole file in
+memory. The ``namespace`` and ``defaults`` sections must come before the
+``provision`` section for that.
 """
 from __future__ import unicode_literals
-import copy
 import argparse
+import hashlib
 import json
 import inspect
 import sys
 from six import text_type
 import logging
 from collections import OrderedDict
+from decimal import Decimal
 
 from contrail_api_cli.command import Command, Arg, Option
 from contrail_api_cli.manager import CommandManager
-from contrail_api_cli.exceptions import CommandNotFound, CommandError
+from contrail_api_cli.exceptions import CommandNotFound, CommandError, NotFound, Exists
 from contrail_api_cli.utils import printo, continue_prompt
+from contrail_api_cli.context import Context
+from contrail_api_cli.client import HttpError
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+from ..utils import parallel_map, positive_int_type, resize_connection_pool
+from .common import resource_cache
 
 
 logger = logging.getLogger(__name__)
@@ -280,14 +351,52 @@ class Actions:
     APPLY = ('del', 'add', 'set')
 
 
+class CommandDescriptor(object):
+    """Command resolved for a provision key.
+
+    Holds what is needed to validate and call the command so that
+    it is computed once per key instead of once per call.
+    """
+
+    def __init__(self, cmd, is_property=False):
+        self.cmd = cmd
+        self.is_property = is_property
+        argspec = inspect.getargspec(cmd.__call__)
+        self.args = argspec.args[1:]
+        self.options = OrderedDict()
+        for option in cmd.options.values():
+            self.options.setdefault(option.dest, option)
+        self.arguments = OrderedDict()
+        for arg in cmd.args.values():
+            self.arguments.setdefault(arg.dest, arg)
+
+
 class Provision(Command):
     description = 'Provision contrail environment'
     env_file = Arg(help='JSON file of environment to provision',
-                   type=argparse.FileType('r'))
+                   type=argparse.FileType('rb'),
+                   nargs='?')
     force = Option('-f',
                    help="Don't ask for confirmation",
                    default=False,
                    action="store_true")
+    workers = Option(help="number of commands run concurrently to read "
+                          "and provision the environment (default: %(default)s)",
+                     type=positive_int_type,
+                     default=10)
+    plan = Option(metavar='FILE',
+                  help="save the actions to make in FILE instead of running them")
+    apply_plan = Option(metavar='FILE',
+                        type=argparse.FileType('r'),
+                        help="run the actions saved in FILE by --plan")
+    state = Option(metavar='FILE',
+                   help="skip keys unchanged since the last run saved in FILE")
+    spec_only = Option(action='store_true',
+                       default=False,
+                       help="with --state, skip keys whose spec didn't change "
+                            "without checking their current values")
+    only = Option(metavar='KEYS',
+                  help="comma separated list of keys to provision")
 
     @property
     def __doc__(self):
@@ -296,50 +405,113 @@ class Provision(Command):
         # with the man command.
         return sys.modules[__name__].__doc__
 
-    def _get_current_env(self, keys):
-        """Build the current environment of the given resources (keys).
+    def _get_current_values(self, key):
+        if self._is_property(key):
+            cmd = self._get_command(key, Actions.GET)
+        else:
+            cmd = self._get_command(key, Actions.LIST)
+        try:
+            return json.loads(self._call_command(cmd,
+                                                 defaults=self._provision_defaults.get(key, {})))
+        except CommandError as e:
+            raise CommandError('Failed to get current values for %s: %s' % (key, e))
+
+    def _load_env(self, env_file):
+        """Load the environment file.
 
-        For each resource we run "get-resource" or "list-resource" and
-        populate the env.
+        When ijson is available the file is parsed in one pass. When
+        the namespace and defaults sections come before the provision
+        section, the provision section is parsed one key at a time
+        while the returned iterator is consumed. Otherwise, or without
+        ijson, the whole file is loaded in memory.
+
+        :rtype: (OrderedDict, iterator of (key, calls))
         """
+        if ijson is None:
+            env = json.load(env_file, object_pairs_hook=OrderedDict)
+            return env, iter(env.get('provision', {}).items())
+        events = ijson.parse(env_file)
         env = OrderedDict()
-        for key in keys:
-            if self._is_property(key):
-                cmd = self._get_command(key, Actions.GET)
-            else:
-                cmd = self._get_command(key, Actions.LIST)
-            try:
-                env[key] = json.loads(self._call_command(cmd,
-                                                         defaults=self._provision_defaults.get(key, {})))
-            except CommandError as e:
-                raise CommandError('Failed to get current values for %s: %s' % (key, e))
-        return env
+        provision = []
+        for prefix, event, value in events:
+            if prefix == '' and event == 'map_key':
+                if value != 'provision':
+                    env[value] = self._parse_value(events)
+                elif 'namespace' in env and 'defaults' in env:
+                    return env, self._parse_provision(events)
+                else:
+                    provision = list(self._parse_provision(events))
+        return env, iter(provision)
+
+    def _parse_provision(self, events):
+        _, event, _ = next(events)
+        if event != 'start_map':
+            raise CommandError('The provision section must be an object')
+        for _, event, key in events:
+            if event == 'end_map':
+                return
+            yield key, self._parse_value(events)
+
+    def _parse_value(self, events, event=None, value=None):
+        """Build the next JSON value from ijson events.
+        """
+        if event is None:
+            _, event, value = next(events)
+        if event == 'start_map':
+            result = OrderedDict()
+            for _, event, key in events:
+                if event == 'end_map':
+                    return result
+                result[key] = self._parse_value(events)
+        elif event == 'start_array':
+            result = []
+            for _, event, value in events:
+                if event == 'end_array':
+                    return result
+                result.append(self._parse_value(events, event, value))
+        # ijson returns non integer numbers as Decimal
+        elif isinstance(value, Decimal):
+            return float(value)
+        return value
 
     def _is_property(self, string):
-        try:
-            self.mgr.get('set-%s' % string)
-            return True
-        except CommandNotFound:
-            return False
+        if string not in self._properties:
+            try:
+                self.mgr.get('set-%s' % string)
+                self._properties[string] = True
+            except CommandNotFound:
+                self._properties[string] = False
+        return self._properties[string]
 
-    def _get_add_command(self, key):
+    def _get_add_descriptor(self, key):
         if self._is_property(key):
             action = Actions.SET
         else:
             action = Actions.ADD
-        return self._get_command(key, action)
+        return self._get_descriptor(key, action)
 
     def _get_command(self, key, action):
-        try:
-            return self.mgr.get('%s-%s' % (action, key))
-        except CommandNotFound:
-            raise CommandError("No command to %s %s" % (action, key))
+        return self._get_descriptor(key, action).cmd
+
+    def _get_descriptor(self, key, action):
+        """Return the descriptor of the command to run
+        `action` on `key`.
+
+        :rtype: CommandDescriptor
+        """
+        name = '%s-%s' % (action, key)
+        if name not in self._descriptors:
+            try:
+                cmd = self.mgr.get(name)
+            except CommandNotFound:
+                raise CommandError("No command to %s %s" % (action, key))
+            self._descriptors[name] = CommandDescriptor(cmd, self._is_property(key))
+        return self._descriptors[name]
 
     def _get_command_args(self, cmd):
-        argspec = inspect.getargspec(cmd.__call__)
-        if len(argspec.args) > 1:
-            return [arg for arg in argspec.args[1:]]
-        return []
+        if cmd not in self._command_args:
+            self._command_args[cmd] = inspect.getargspec(cmd.__call__).args[1:]
+        return self._command_args[cmd]
 
     def _call_command(self, cmd, defaults={}):
         """Call a command.
@@ -347,36 +519,36 @@ class Provision(Command):
         If the command needs arguments they have to be passed
         as a dict in the defaults kwarg.
         """
-        kwargs = {}
-        for arg in self._get_command_args(cmd):
-            kwargs[arg] = defaults.get(arg)
+        kwargs = self._command_kwargs(cmd, defaults)
         logger.debug('Calling %s with %s' % (cmd, kwargs))
         return cmd(**kwargs)
 
-    def _normalize_env(self, env):
-        """Normalize an input environement.
+    def _command_kwargs(self, cmd, defaults):
+        return dict((arg, defaults.get(arg)) for arg in self._get_command_args(cmd))
+
+    def _normalize_calls(self, key, calls):
+        """Normalize the calls of a provision key.
 
         Replace '-' by '_' in provisionning arg names.
         Make sure calls definitions are in lists.
         """
-        for key, value in env.items():
-            if type(value) == OrderedDict:
-                value = dict(value.items())
-            if type(value) == dict:
-                env[key] = [value]
-            elif type(value) != list:
-                raise CommandError('Unsupported provisioning data type in %s: %s' % (key, value))
-            for idx, call in enumerate(env[key]):
-                env[key][idx] = self._normalize_keys(call)
-        return env
-
-    def _setup_defaults_values(self, env):
-        for key, values in env.items():
-            for idx, kwargs in enumerate(values):
-                defaults = copy.deepcopy(self._provision_defaults.get(key, {}))
-                defaults.update(kwargs)
-                env[key][idx] = defaults
-        return env
+        if isinstance(calls, dict):
+            calls = [calls]
+        elif type(calls) != list:
+            raise CommandError('Unsupported provisioning data type in %s: %s' % (key, calls))
+        for call in calls:
+            yield self._normalize_keys(call)
+
+    def _setup_defaults_values(self, key, call):
+        """Add the defaults of the provision key to the call.
+
+        Default values are shared between calls, this is safe
+        because the call is then validated by the command parser
+        which builds new values.
+        """
+        values = dict(self._provision_defaults.get(key, {}))
+        values.update(call)
+        return values
 
     def _normalize_keys(self, values):
         new_values = {}
@@ -384,14 +556,20 @@ class Provision(Command):
             new_values[key.replace('-', '_')] = value
         return new_values
 
-    def _validate_env(self, env):
-        """Given an env, validate that all arguments
-        are consistent.
+    def _prepare_calls(self, key, calls):
+        """Normalize, add defaults and validate the calls
+        of a provision key, one call at a time.
+
+        Returns each call with defaults along with its
+        validated arguments.
+
+        :rtype: [(dict, dict)]
         """
-        for key, values in env.items():
-            for idx, call in enumerate(values):
-                env[key][idx] = self._validate_call(key, call)
-        return env
+        prepared = []
+        for call in self._normalize_calls(key, calls):
+            call = self._setup_defaults_values(key, call)
+            prepared.append((call, self._validate_call(key, call)))
+        return prepared
 
     def _validate_call(self, key, values):
         """Validate call parameters. The wanted env is globally structured
@@ -414,91 +592,242 @@ class Provision(Command):
         validate them using the command parser and set default values
         where needed.
         """
-        cmd = self._get_add_command(key)
+        descriptor = self._get_add_descriptor(key)
+        cmd = descriptor.cmd
 
         for arg, value in values.items():
-            if arg not in self._get_command_args(cmd):
+            if arg not in descriptor.args:
                 logger.debug('Unknown arg %s for %s. Ignored' % (arg, cmd.__call__))
 
         # build cmd line to pass it to argparse for validation
         cmd_line = []
         for k, v in values.items():
-            for option_name, option in cmd.options.items():
-                if k == option.dest:
-                    if option.need_value:
-                        if isinstance(v, list):
-                            if len(v) == 0:
-                                break
-                            if option.kwargs.get('action') == 'append':
-                                for i in v:
-                                    cmd_line.append(option.long_name)
-                                    cmd_line.append(text_type(i))
-                            else:
-                                cmd_line.append(option.long_name)
-                                for i in v:
-                                    cmd_line.append(text_type(i))
-                        else:
+            option = descriptor.options.get(k)
+            if option is None:
+                continue
+            if option.need_value:
+                if isinstance(v, list):
+                    if len(v) == 0:
+                        continue
+                    if option.kwargs.get('action') == 'append':
+                        for i in v:
                             cmd_line.append(option.long_name)
-                            cmd_line.append(text_type(v))
+                            cmd_line.append(text_type(i))
                     else:
-                        if option.kwargs['action'] == 'store_true' and v is True:
-                            cmd_line.append(option.long_name)
-                        if option.kwargs['action'] == 'store_false' and v is False:
-                            cmd_line.append(option.long_name)
-                    break
+                        cmd_line.append(option.long_name)
+                        for i in v:
+                            cmd_line.append(text_type(i))
+                else:
+                    cmd_line.append(option.long_name)
+                    cmd_line.append(text_type(v))
+            else:
+                if option.kwargs['action'] == 'store_true' and v is True:
+                    cmd_line.append(option.long_name)
+                if option.kwargs['action'] == 'store_false' and v is False:
+                    cmd_line.append(option.long_name)
         for k, v in values.items():
-            for arg_name, arg in cmd.args.items():
-                if k == arg.dest:
-                    if isinstance(v, list):
-                        cmd_line += v
-                    else:
-                        cmd_line.append(text_type(v))
-                    break
+            if k in descriptor.arguments:
+                if isinstance(v, list):
+                    cmd_line += v
+                else:
+                    cmd_line.append(text_type(v))
 
         try:
             args = cmd.parser.parse_args(args=cmd_line)
-        except Exception:
-            import pdb
-            pdb.set_trace()
+        except CommandError as e:
+            raise CommandError('Invalid %s call %s: %s' % (key, values, e))
         return vars(args)
 
-    def _diff_envs(self, current, wanted):
+    def _call_key(self, call):
+        """Canonical and hashable representation of a call.
+        """
+        return json.dumps(call, sort_keys=True, default=text_type)
+
+    def _diff_calls(self, key, current, wanted):
+        """Make a diff of the current calls and the wanted calls
+        of a provision key.
+
+        Calls are compared by their canonical JSON representation
+        (see :py:meth:`_call_key`) so the diff is linear. Properties
+        are only set, they are never deleted.
+
+        :rtype: (list, list)
+        """
+        current_keys = [self._call_key(v) for _, v in current]
+        wanted_keys = [self._call_key(v) for _, v in wanted]
+        keys = set(current_keys)
+        add_values = [v for v, k in zip(wanted, wanted_keys) if k not in keys]
+        if self._is_property(key):
+            return add_values, []
+        keys = set(wanted_keys)
+        del_values = [v for v, k in zip(current, current_keys) if k not in keys]
+        return add_values, del_values
+
+    def _fingerprint(self, key, values):
+        """Fingerprint of the current values of a key,
+        whatever the order of the values.
+        """
+        keys = sorted(self._call_key(v) for v in self._normalize_calls(key, values))
+        return hashlib.sha1(json.dumps(keys).encode('utf-8')).hexdigest()
+
+    def _current_fingerprints(self, keys):
+        """Fingerprints of the current values of the given keys.
+
+        :rtype: list
+        """
+        resource_cache.enable()
+        try:
+            return parallel_map(lambda key: self._fingerprint(key, self._get_current_values(key)),
+                                keys, workers=self.workers)
+        finally:
+            resource_cache.disable()
+
+    def _spec_hash(self, key, calls):
+        """Hash of the calls of a key in the environment file,
+        including the defaults of the key.
+        """
+        spec = self._call_key([self._provision_defaults.get(key, {}), calls])
+        return hashlib.sha1(spec.encode('utf-8')).hexdigest()
+
+    def _diff_key(self, key, calls):
+        spec = self._spec_hash(key, calls)
+        state = self._state.get(key, {})
+        if state.get('spec') == spec and self._spec_only:
+            logger.info('%s spec unchanged since the last run, skipped' % key)
+            return key, [], [], spec, state['live']
+        current = self._get_current_values(key)
+        fingerprint = self._fingerprint(key, current)
+        if state == {'spec': spec, 'live': fingerprint}:
+            logger.info('%s unchanged since the last run, skipped' % key)
+            return key, [], [], spec, fingerprint
+        wanted = self._prepare_calls(key, calls)
+        current = self._prepare_calls(key, current)
+        add_values, del_values = self._diff_calls(key, current, wanted)
+        return key, add_values, del_values, spec, fingerprint
+
+    def _diff_envs(self, provision):
         """Make a diff of the current env and the wanted env.
 
-        Compare only common resources between the envs. This
+        Compare only resources of the wanted env. This
         allows to partially provision the env.
 
         If the wanted env has a bgp-router list we try
         to converge the current env bgp-router list. Removing
         bgp-routers not in the wanted list, adding bgp-routers
         not in the current list.
-        """
 
+        Keys of the wanted env are read from `provision` as
+        they are diffed. For each key we run "get-resource"
+        or "list-resource" to get the current values. Keys are
+        diffed concurrently and share the resources they read
+        through the provision resource cache. Only the diff is
+        kept in memory.
+
+        Keys whose spec and current values didn't change since
+        the state was saved (see :py:meth:`_save_state`) are not
+        diffed. With `--spec-only` keys whose spec didn't change
+        are not listed either.
+
+        The hash of the spec and the fingerprint of the current
+        values of each key are returned along with the diff.
+
+        :param provision: calls to provision for each key
+        :type provision: iterator of (key, calls)
+
+        :rtype: (dict, OrderedDict)
+        """
         diff_env = {
             Actions.SET: OrderedDict(),
             Actions.ADD: OrderedDict(),
             Actions.DEL: OrderedDict(),
         }
-        for key, values in wanted.items():
-            add_values = [v for v in values if v not in current.get(key, [])]
+        state = OrderedDict()
+        resource_cache.enable()
+        try:
+            diffs = parallel_map(lambda item: self._diff_key(*item), provision,
+                                 workers=self.workers)
+        finally:
+            resource_cache.disable()
+        for key, add_values, del_values, spec, fingerprint in diffs:
             if add_values:
                 if self._is_property(key):
                     diff_env[Actions.SET][key] = add_values
                 else:
                     diff_env[Actions.ADD][key] = add_values
-        for key, values in reversed(current.items()):
-            if key not in wanted:
-                continue
-            if self._is_property(key):
-                continue
-            del_values = [v for v in values if v not in wanted[key]]
             if del_values:
                 diff_env[Actions.DEL][key] = del_values
+            state[key] = {'spec': spec, 'live': fingerprint}
+        return diff_env, state
+
+    def _load_state(self, state_file):
+        try:
+            with open(state_file) as f:
+                return json.load(f)
+        except IOError:
+            return {}
+        except ValueError as e:
+            raise CommandError('Failed to load state %s: %s' % (state_file, e))
+
+    def _save_state(self, state_file, state, diff):
+        """Save the spec hash and the fingerprint of the current
+        values of each key once the diff has been applied.
+
+        Keys modified by the diff are collected again, keys
+        not provisioned in this run are kept as is.
+        """
+        keys = [key for key in state
+                if any(key in diff[action] for action in Actions.APPLY)]
+        for key, fingerprint in zip(keys, self._current_fingerprints(keys)):
+            state[key]['live'] = fingerprint
+        new_state = dict(self._state)
+        new_state.update(state)
+        with open(state_file, 'w') as f:
+            json.dump(new_state, f, indent=2, sort_keys=True)
+
+    def _save_plan(self, plan_file, namespace, diff, state):
+        """Save the diff in a plan file with the fingerprints
+        of the current values it was computed with.
+        """
+        fingerprints = OrderedDict((key, values['live']) for key, values in state.items()
+                                   if any(key in diff[action] for action in Actions.APPLY))
+        plan = OrderedDict([
+            ('namespace', namespace),
+            ('defaults', self._provision_defaults),
+            ('fingerprints', fingerprints),
+            ('diff', OrderedDict(
+                (action, OrderedDict((key, [call for call, _ in calls])
+                                     for key, calls in diff[action].items()))
+                for action in Actions.APPLY)),
+        ])
+        with open(plan_file, 'w') as f:
+            json.dump(plan, f, indent=2)
+
+    def _load_plan(self, plan):
+        """Check that the plan is not stale and return its diff.
+
+        Only the current values of the keys modified by the plan
+        are collected and compared to the plan fingerprints.
+
+        :rtype: dict
+        """
+        keys = list(plan['fingerprints'])
+        fingerprints = self._current_fingerprints(keys)
+        stale = [key for key, fingerprint in zip(keys, fingerprints)
+                 if fingerprint != plan['fingerprints'][key]]
+        if stale:
+            raise CommandError('The plan is stale, %s changed since it was made' %
+                               ', '.join(stale))
+        diff_env = {}
+        for action in Actions.APPLY:
+            diff_env[action] = OrderedDict(
+                (key, self._prepare_calls(key, calls))
+                for key, calls in plan['diff'].get(action, {}).items())
         return diff_env
 
-    def _confirm_diff(self, diff, force=False):
-        """Show actions to be made and ask for confirmation
-        unless force is True.
+    def _show_diff(self, diff):
+        """Show actions to be made.
+
+        Returns False when there is nothing to do.
         """
         if not any([True if diff[action] else False for action in Actions.APPLY]):
             printo('Nothing to do')
@@ -508,59 +837,156 @@ class Provision(Command):
             if not diff[action]:
                 continue
             printo("\n%s the resources :\n" % action.capitalize())
-            for key, values in diff[action].items():
-                printo('%s : %s\n' % (key, json.dumps(values, indent=2)))
+            for key, calls in diff[action].items():
+                values = [v for _, v in calls]
+                printo('%s (%d) : %s\n' % (key, len(values),
+                                               json.dumps(values, indent=2, default=text_type)))
+        return True
+
+    def _confirm_diff(self, diff, force=False):
+        """Show actions to be made and ask for confirmation
+        unless force is True.
+        """
+        if not self._show_diff(diff):
+            return False
         if force or continue_prompt():
             return True
         else:
             return False
 
+    def _schedule(self, actions, reverse=False):
+        """Group the keys of `actions` in levels. A key comes after the
+        keys it depends on, or before them when `reverse` is True.
+
+        Only dependencies between the given keys are considered.
+
+        :param actions: action to run for each key
+        :type actions: OrderedDict
+        :param reverse: reverse dependencies
+        :type reverse: bool
+
+        :rtype: [[str]]
+        """
+        depends = OrderedDict((key, set()) for key in actions)
+        for key, action in actions.items():
+            cmd = self._get_command(key, action)
+            for dep in getattr(cmd, 'depends', ()):
+                if dep not in depends or dep == key:
+                    continue
+                if reverse:
+                    depends[dep].add(key)
+                else:
+                    depends[key].add(dep)
+        levels = []
+        done = set()
+        while len(done) < len(depends):
+            level = [key for key, deps in depends.items()
+                     if key not in done and deps <= done]
+            if not level:
+                raise CommandError('Circular dependencies between %s' %
+                                   ', '.join(key for key in depends if key not in done))
+            levels.append(level)
+            done.update(level)
+        return levels
+
+    def _run_calls(self, key, action, calls):
+        cmd = self._get_command(key, action)
+        try:
+            if hasattr(cmd, 'bulk_call'):
+                calls = [self._command_kwargs(cmd, kwargs) for kwargs in calls]
+                logger.debug('Calling %s with %d calls' % (cmd, len(calls)))
+                cmd.bulk_call(calls, workers=self.workers)
+            else:
+                for kwargs in calls:
+                    self._call_command(cmd, defaults=kwargs)
+        # NotFound and Exists errors inherit from GreenletExit
+        # and would be ignored by the greenlets pool
+        except (CommandError, NotFound, Exists, HttpError) as e:
+            return 'Call to %s %s failed: %s' % (action, key, e)
+
     def _apply_diff(self, diff):
         """Takes the generated diff and call methods to
         converge to the wanted env.
 
-        First delete unwanted resources, then set wanted
-        properties, finally add wanted resources.
+        First delete unwanted resources, then add wanted
+        resources and set wanted properties. In each step
+        keys are scheduled by their dependencies (see
+        :py:meth:`_schedule`) and the calls of independent
+        keys are made concurrently.
+
+        When calls fail the other calls of the level are
+        finished, the errors are raised together and the
+        next levels are not run.
         """
-        for action in Actions.APPLY:
-            run_list = []
-            for key, values in diff.get(action, {}).items():
-                cmd = self._get_command(key, action)
-                run_list.append((cmd, values))
-            # sort run_list based on cmd order
-            run_list = sorted(run_list, key=lambda action: action[0].order if hasattr(action[0], "order") else 1000)
-            if action == Actions.DEL:
-                run_list.reverse()
-            for (cmd, values) in run_list:
-                for kwargs in values:
-                    try:
-                        self._call_command(cmd, defaults=kwargs)
-                    except CommandError as e:
-                        raise CommandError('Call to %s %s failed: %s' % (action, key, e))
-
-    def __call__(self, env_file=None, force=False):
-        env = json.load(env_file, object_pairs_hook=OrderedDict)
+        deletions = OrderedDict((key, Actions.DEL)
+                                for key in diff.get(Actions.DEL, {}))
+        additions = OrderedDict()
+        for action in (Actions.ADD, Actions.SET):
+            for key in diff.get(action, {}):
+                additions[key] = action
+        for actions, reverse in ((deletions, True), (additions, False)):
+            for level in self._schedule(actions, reverse=reverse):
+                units = []
+                for key in level:
+                    action = actions[key]
+                    values = [v for _, v in diff[action][key]]
+                    cmd = self._get_command(key, action)
+                    if getattr(cmd, 'parallel', True) and not hasattr(cmd, 'bulk_call'):
+                        units += [(key, action, [kwargs]) for kwargs in values]
+                    else:
+                        units.append((key, action, values))
+                errors = [error for error in parallel_map(lambda unit: self._run_calls(*unit),
+                                                          units, workers=self.workers)
+                          if error is not None]
+                if errors:
+                    raise CommandError('Failed to apply the diff:\n%s' % '\n'.join(errors))
+
+    def __call__(self, env_file=None, force=False, workers=None, plan=None, apply_plan=None,
+                 state=None, spec_only=False, only=None):
+        if (env_file is None) == (apply_plan is None):
+            raise CommandError('An environment file or --apply-plan is required')
+        if plan is not None and apply_plan is not None:
+            raise CommandError('--plan and --apply-plan are exclusive')
+        if state is not None and apply_plan is not None:
+            raise CommandError('--state and --apply-plan are exclusive')
+        if spec_only and state is None:
+            raise CommandError('--spec-only requires --state')
+        self.workers = workers
+        resize_connection_pool(Context().session, workers)
+        if apply_plan is not None:
+            env = json.load(apply_plan, object_pairs_hook=OrderedDict)
+        else:
+            env, provision = self._load_env(env_file)
+            if only is not None:
+                only = only.split(',')
+                provision = ((key, calls) for key, calls in provision if key in only)
 
         self._provision_defaults = {}
         for key, defaults in env.get('defaults', {}).items():
             self._provision_defaults[key] = self._normalize_keys(defaults)
 
         self.mgr = CommandManager()
+        self._properties = {}
+        self._descriptors = {}
+        self._command_args = {}
+        self._state = self._load_state(state) if state is not None else {}
+        self._spec_only = spec_only
         if env.get('namespace'):
             self.mgr.load_namespace(env.get('namespace'))
             logger.debug('Namespace %s loaded' % env['namespace'])
 
-        wanted_env = env['provision']
-        wanted_env = self._normalize_env(wanted_env)
-        wanted_env = self._setup_defaults_values(wanted_env)
-        wanted_env = self._validate_env(wanted_env)
-
-        current_env = self._get_current_env(wanted_env.keys())
-        current_env = self._normalize_env(current_env)
-        current_env = self._setup_defaults_values(current_env)
-        current_env = self._validate_env(current_env)
-
-        diff_env = self._diff_envs(current_env, wanted_env)
+        if apply_plan is not None:
+            diff_env = self._load_plan(env)
+        else:
+            diff_env, new_state = self._diff_envs(provision)
+            if plan is not None:
+                self._save_plan(plan, env.get('namespace'), diff_env, new_state)
+                self._show_diff(diff_env)
+                return
 
         if self._confirm_diff(diff_env, force=force):
             self._apply_diff(diff_env)
+        elif any(diff_env[action] for action in Actions.APPLY):
+            return
+        if state is not None:
+            self._save_state(state, new_state, diff_env)
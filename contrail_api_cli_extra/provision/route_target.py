@@ -7,15 +7,16 @@ from contrail_api_cli.exceptions import ResourceNotFound
 from contrail_api_cli.resource import Resource
 
 from ..utils import RouteTargetAction
+from .common import resource_cache
 
 
 class RouteTarget(Command):
+    depends = ('vn',)
     virtual_network_fqname = Option(required=True,
                                     help="Virtual network FQName")
 
     def __call__(self, virtual_network_fqname=None):
-        self.vn = Resource('virtual-network', fq_name=virtual_network_fqname,
-                           fetch=True)
+        self.vn = resource_cache.resource('virtual-network', virtual_network_fqname)
 
 
 class RouteTargetAction(RouteTarget):
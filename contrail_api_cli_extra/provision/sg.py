@@ -10,6 +10,8 @@ from contrail_api_cli.command import Command, Option, Arg
 from contrail_api_cli.resource import Resource, Collection
 from contrail_api_cli.utils import FQName
 
+from .common import resource_cache
+
 
 def _port_or_default(port):
     if port in [0, 65535]:
@@ -173,7 +175,7 @@ class ListSGs(SG):
         return ":".join(rule)
 
     def __call__(self, project_fqname=None):
-        project = Resource('project', fq_name=project_fqname, check=True)
+        project = resource_cache.resource('project', project_fqname, check=True)
         sgs = Collection('security-group',
                          parent_uuid=project.uuid,
                          fetch=True, detail=True)
@@ -9,11 +9,12 @@ from contrail_api_cli.resource import Resource
 from contrail_api_cli.exceptions import ResourceNotFound
 
 from ..utils import network_type
-from common import get_network_ipam_subnets
+from .common import get_network_ipam_subnets, resource_cache
 
 
 class SetSubnets(Command):
     description = 'Set subnets to virtual-network'
+    depends = ('vn',)
     virtual_network_fqname = Option(required=True,
                                     help='VN fqname (eg: default-domain:admin:net)')
     cidrs = Arg(nargs="+", metavar='CIDR',
@@ -64,9 +65,8 @@ class GetSubnets(Command):
         res = []
         for virtual_network_fqname in virtual_network_fqnames:
             try:
-                vn = Resource('virtual-network',
-                              fq_name=virtual_network_fqname,
-                              fetch=True)
+                vn = resource_cache.resource('virtual-network',
+                                             virtual_network_fqname)
                 ipam_subnets = get_network_ipam_subnets(vn)
                 if ipam_subnets:
                     res.append({'virtual_network_fqname': virtual_network_fqname,
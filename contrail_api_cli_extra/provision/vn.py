@@ -10,11 +10,10 @@ from contrail_api_cli.resource import Resource, Collection
 from contrail_api_cli.exceptions import ResourceNotFound
 from contrail_api_cli.utils import FQName
 
-from common import get_network_ipam_subnets
+from .common import get_network_ipam_subnets, resource_cache
 
 
 class VN(Command):
-    order = 100
     project_fqname = Option(default="default-domain:default-project",
                             help='Project fqname (default: %(default)s)')
 
@@ -105,10 +104,12 @@ class ListVNs(VN):
     description = 'List virtual-networks'
 
     def __call__(self, project_fqname=None):
-        project = Resource('project', fq_name=project_fqname, check=True)
+        project = resource_cache.resource('project', project_fqname, check=True)
         vns = Collection('virtual-network',
                          parent_uuid=project.uuid,
-                         fetch=True, recursive=2)
+                         fetch=True,
+                         fields=['is_shared', 'router_external',
+                                 'network_ipam_refs'])
 
         return json.dumps([{
             "virtual_network_name": vn.fq_name[-1],
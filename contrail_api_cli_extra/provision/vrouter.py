@@ -2,10 +2,29 @@
 from __future__ import unicode_literals
 import json
 
+from contrail_api_cli.client import HttpError
 from contrail_api_cli.command import Command, Arg, Option
+from contrail_api_cli.exceptions import CommandError, NotFound, Exists
 from contrail_api_cli.resource import Resource, Collection
 
-from ..utils import ip_type
+from ..utils import ip_type, parallel_map
+
+GLOBAL_CONFIG_FQ_NAME = 'default-global-system-config'
+
+
+def _bulk_map(func, calls, workers=None):
+    """Map func on calls and return the errors of the calls
+    as a list of ``vrouter_name: error`` strings.
+    """
+    def call(kwargs):
+        try:
+            func(kwargs)
+        # NotFound and Exists errors inherit from GreenletExit
+        # and would be ignored by the greenlets pool
+        except (NotFound, Exists, HttpError) as e:
+            return '%s: %s' % (kwargs['vrouter_name'], e)
+    return [error for error in parallel_map(call, calls, workers=workers)
+            if error is not None]
 
 
 class VRouter(Command):
@@ -21,35 +40,85 @@ class AddVRouter(VRouter):
                           choices=['tor-service-mode', 'embedded'],
                           default=None)
 
-    def __call__(self, vrouter_ip=None, vrouter_name=None, vrouter_type=None):
-
-        global_config = Resource('global-system-config',
-                                 fq_name='default-global-system-config')
+    def _add_vrouter(self, global_config, vrouter_ip=None, vrouter_name=None, vrouter_type=None):
         vrouter = Resource('virtual-router',
-                           fq_name='default-global-system-config:%s' % vrouter_name,
-                           parent=global_config,
+                           fq_name='%s:%s' % (GLOBAL_CONFIG_FQ_NAME, vrouter_name),
+                           parent_type='global-system-config',
+                           parent_uuid=global_config.uuid,
                            virtual_router_ip_address=vrouter_ip)
         if vrouter_type:
             vrouter['virtual_router_type'] = [vrouter_type]
         vrouter.save()
 
+    def __call__(self, vrouter_ip=None, vrouter_name=None, vrouter_type=None):
+        global_config = Resource('global-system-config',
+                                 fq_name=GLOBAL_CONFIG_FQ_NAME,
+                                 check=True)
+        self._add_vrouter(global_config, vrouter_ip, vrouter_name, vrouter_type)
+
+    def bulk_call(self, calls, workers=None):
+        """Add several vrouters.
+
+        The global-system-config is resolved once and the
+        vrouters are created concurrently. The errors of all
+        calls are reported at the end.
+
+        :param calls: arguments of the command for each vrouter
+        :type calls: [dict]
+        :param workers: number of vrouters created concurrently
+        :type workers: int
+        """
+        global_config = Resource('global-system-config',
+                                 fq_name=GLOBAL_CONFIG_FQ_NAME,
+                                 check=True)
+        errors = _bulk_map(lambda kwargs: self._add_vrouter(global_config, **kwargs),
+                           calls, workers=workers)
+        if errors:
+            raise CommandError('Failed to add vrouters:\n%s' % '\n'.join(errors))
+
 
 class DelVRouter(VRouter):
     description = 'Remove vrouter'
 
     def __call__(self, vrouter_name=None):
         vrouter = Resource('virtual-router',
-                           fq_name='default-global-system-config:%s' % vrouter_name,
+                           fq_name='%s:%s' % (GLOBAL_CONFIG_FQ_NAME, vrouter_name),
                            check=True)
         vrouter.delete()
 
+    def bulk_call(self, calls, workers=None):
+        """Delete several vrouters.
+
+        The vrouters uuids are resolved with one listing and
+        the vrouters are deleted concurrently. The errors of
+        all calls are reported at the end.
+
+        :param calls: arguments of the command for each vrouter
+        :type calls: [dict]
+        :param workers: number of vrouters deleted concurrently
+        :type workers: int
+        """
+        uuids = dict((vrouter.fq_name[-1], vrouter.uuid)
+                     for vrouter in Collection('virtual-router', fetch=True))
+        missing = [kwargs['vrouter_name'] for kwargs in calls
+                   if kwargs['vrouter_name'] not in uuids]
+        if missing:
+            raise CommandError('vrouters not found: %s' % ', '.join(missing))
+        errors = _bulk_map(lambda kwargs: Resource('virtual-router',
+                                                   uuid=uuids[kwargs['vrouter_name']]).delete(),
+                           calls, workers=workers)
+        if errors:
+            raise CommandError('Failed to delete vrouters:\n%s' % '\n'.join(errors))
+
 
 class ListVRouter(Command):
     description = 'List vrouters'
 
     def __call__(self):
         vrouters = Collection('virtual-router',
-                              fetch=True, recursive=2)
+                              fetch=True,
+                              fields=['virtual_router_ip_address',
+                                      'virtual_router_type'])
 
         vrouter_info_list = []
         for vrouter in vrouters:
@@ -10,18 +10,41 @@ import argparse
 import netaddr
 import re
 import abc
+import os
+import sys
+import json
+import time
+import atexit
+import bisect
+import cProfile
+import logging
+from functools import wraps
+from itertools import islice
 from six import add_metaclass
 import textwrap
+from six.moves.urllib.parse import urlparse
 
-from kazoo.client import KazooClient
+import gevent
+import gevent.local
+import gevent.lock
+from gevent.event import Event
+from gevent.pool import Pool
+from kazoo.client import KazooClient, TransactionRequest
+from kazoo.exceptions import NoNodeError, NodeExistsError, RolledBackError, \
+    RuntimeInconsistency
 from kazoo.handlers.gevent import SequentialGeventHandler
 
 from prettytable import PrettyTable
 
+from contrail_api_cli.client import HttpError
 from contrail_api_cli.command import Command, Arg, Option, expand_paths
+from contrail_api_cli.context import Context
 from contrail_api_cli.exceptions import CommandError
 from contrail_api_cli.resource import Collection
-from contrail_api_cli.utils import continue_prompt
+from contrail_api_cli.utils import continue_prompt, printo
+
+
+logger = logging.getLogger(__name__)
 
 
 def ip_type(string):
@@ -54,6 +77,30 @@ def port_type(value):
         raise argparse.ArgumentTypeError(str(e))
 
 
+def positive_int_type(value):
+    """argparse type to validate a strictly positive integer.
+    """
+    try:
+        value = int(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    if value < 1:
+        raise argparse.ArgumentTypeError("Value must be greater than 0")
+    return value
+
+
+def positive_float_type(value):
+    """argparse type to validate a strictly positive number.
+    """
+    try:
+        value = float(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    if value <= 0:
+        raise argparse.ArgumentTypeError("Value must be greater than 0")
+    return value
+
+
 def server_type(value):
     """argparse type to validate a server:port option.
     """
@@ -74,6 +121,91 @@ def md5_type(value):
     return value
 
 
+def parallel_map(func, iterable, args=None, kwargs=None, workers=None):
+    """Map func on iterable using gevent greenlets.
+
+    Unlike :py:func:`contrail_api_cli.utils.parallel_map` the iterable is
+    consumed lazily and greenlets are released as soon as their result is
+    collected. Memory usage depends on `workers` instead of the size of
+    the iterable.
+
+    :param func: function applied on iterable elements
+    :type func: function
+    :param iterable: elements to map the function over
+    :type iterable: iterable
+    :param args: arguments of func
+    :type args: tuple
+    :param kwargs: keyword arguments of func
+    :type kwargs: dict
+    :param workers: limit the number of greenlets
+                    running in parrallel
+    :type workers: int
+
+    contrail_api_cli errors inheriting from GreenletExit (ResourceNotFound,
+    Exists...) are returned by the greenlets instead of being raised, they
+    are raised here like any other error.
+
+    :rtype: list
+    """
+    args = args or ()
+    kwargs = kwargs or {}
+    pool = Pool(workers)
+    results = []
+    for result in pool.imap(lambda item: func(item, *args, **kwargs), iterable):
+        if isinstance(result, BaseException):
+            raise result
+        results.append(result)
+    return results
+
+
+def resize_connection_pool(session, size):
+    """Make sure the API session can keep `size` connections alive.
+
+    The HTTP adapters of the session are replaced when their pool
+    is smaller, otherwise connections above the pool size are closed
+    after each request. The new adapters have the same class as the
+    old ones so that keystoneauth's keepalive settings are kept.
+
+    :param session: API session
+    :type session: ContrailAPISession
+    :param size: number of concurrent connections
+    :type size: int
+    """
+    http = session.session
+    for prefix, adapter in list(http.adapters.items()):
+        if getattr(adapter, '_pool_maxsize', size) >= size:
+            continue
+        logger.debug('Resizing %s connection pool to %d' % (prefix, size))
+        http.mount(prefix, type(adapter)(pool_connections=size,
+                                         pool_maxsize=size))
+        adapter.close()
+
+
+def cassandra_objects_count(fqname_cf, types=None):
+    """Estimate the number of objects stored in the config DB.
+
+    obj_fq_name_table has one row per type with a column per object,
+    counting columns is much cheaper than scanning obj_uuid_table.
+
+    :param fqname_cf: obj_fq_name_table column family
+    :type fqname_cf: pycassa.ColumnFamily
+    :param types: types to count (default: all types)
+    :type types: [str]
+    :rtype: int
+    """
+    if types is None:
+        types = [key for key, _ in fqname_cf.get_range(column_count=1)]
+    return sum(fqname_cf.get_count(type) for type in types)
+
+
+def format_duration(seconds):
+    """Format a duration in seconds as H:MM:SS.
+    """
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return '%d:%02d:%02d' % (hours, minutes, seconds)
+
+
 def format_column(column, width, depth=0):
     result = ""
     i = 0
@@ -195,6 +327,1032 @@ class RouteTargetAction(argparse.Action):
         return value
 
 
+class SubnetIndex(object):
+    """Find the subnet of an IP address with a binary search over
+    the sorted subnets.
+
+    Subnets are not expected to overlap.
+
+    :param subnets: subnets to index
+    :type subnets: [netaddr.IPNetwork]
+    """
+
+    def __init__(self, subnets):
+        self._subnets = sorted(subnets, key=lambda s: (s.version, s.first))
+        self._keys = [(s.version, s.first) for s in self._subnets]
+
+    def __len__(self):
+        return len(self._subnets)
+
+    def __iter__(self):
+        return iter(self._subnets)
+
+    def get(self, ip):
+        """Return the subnet containing ip or None.
+
+        :param ip: IP address
+        :type ip: netaddr.IPAddress
+        :rtype: netaddr.IPNetwork
+        """
+        i = bisect.bisect_right(self._keys, (ip.version, int(ip))) - 1
+        if i >= 0 and ip in self._subnets[i]:
+            return self._subnets[i]
+
+
+class IdAllocator(object):
+    """Track used ids of the range [`start`, `end`) in a bitmap.
+
+    Each id takes one bit so the 16M VN ids fit in 2MB. Free ids are
+    searched from a cursor that only goes back when an id below it is
+    released, so allocating all ids of the range is linear.
+
+    :param start: first id of the range
+    :type start: int
+    :param end: end of the range (excluded)
+    :type end: int
+    """
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self._bits = bytearray((end - start + 7) // 8)
+        self._cursor = 0
+        self.used = 0
+
+    def __contains__(self, id):
+        if not self.start <= id < self.end:
+            return False
+        i = id - self.start
+        return bool(self._bits[i >> 3] & (1 << (i & 7)))
+
+    def __iter__(self):
+        """Iterate over the used ids.
+        """
+        for byte, value in enumerate(self._bits):
+            if not value:
+                continue
+            for bit in range(8):
+                if value & (1 << bit):
+                    yield self.start + (byte << 3) + bit
+
+    def reserve(self, id):
+        """Mark `id` as used. Ids outside of the range are ignored.
+
+        :rtype: bool (False if the id was already used)
+        """
+        if not self.start <= id < self.end:
+            return False
+        i = id - self.start
+        mask = 1 << (i & 7)
+        if self._bits[i >> 3] & mask:
+            return False
+        self._bits[i >> 3] |= mask
+        self.used += 1
+        return True
+
+    def release(self, id):
+        """Mark `id` as free.
+        """
+        if id not in self:
+            return
+        i = id - self.start
+        self._bits[i >> 3] &= ~(1 << (i & 7)) & 0xff
+        self.used -= 1
+        self._cursor = min(self._cursor, i >> 3)
+
+    def next_free(self):
+        """Return the lowest free id without reserving it.
+
+        :rtype: int
+        :raises CommandError: all ids are used
+        """
+        bits = self._bits
+        size = len(bits)
+        byte = self._cursor
+        # skip full bytes
+        while byte < size and bits[byte] == 0xff:
+            byte += 1
+        self._cursor = byte
+        if byte < size:
+            value = bits[byte]
+            for bit in range(8):
+                if not value & (1 << bit):
+                    id = self.start + (byte << 3) + bit
+                    if id < self.end:
+                        return id
+                    break
+        raise CommandError("No available id in [%d, %d)" % (self.start, self.end))
+
+    def allocate(self, count=1):
+        """Reserve `count` free ids.
+
+        :rtype: [int]
+        :raises CommandError: not enough free ids
+        """
+        if self.used + count > self.end - self.start:
+            raise CommandError("No available id in [%d, %d)" % (self.start, self.end))
+        ids = []
+        for _ in range(count):
+            id = self.next_free()
+            self.reserve(id)
+            ids.append(id)
+        return ids
+
+
+class RouteTargetAllocator(object):
+    """Allocate route target ids and manage their ZK locks.
+
+    The locks under `/id/bgp/route-targets` are listed once and kept in
+    an :py:class:`IdAllocator`, so checking if a lock exists doesn't
+    need any ZK request.
+
+    Ids are reserved by blocks of `block_size`: the locks of a block are
+    created in one ZK transaction and ids are then handed out from the
+    block without any ZK request. Unused ids of the last block must be
+    given back with :py:meth:`release`.
+
+    Locks can also be created or deleted with :py:meth:`create_lock`
+    and :py:meth:`delete_lock`. The operations are queued and sent in
+    transactions of `block_size` operations. Pending operations must be
+    sent with :py:meth:`flush`.
+
+    The allocator can be used by concurrent greenlets.
+
+    :param zk_client: ZK client
+    :type zk_client: kazoo.client.KazooClient
+    :param asn: autonomous system number used in the RTs fq_names
+    :type asn: int
+    :param block_size: number of ids reserved or operations sent at once
+    :type block_size: int
+    :param dry_run: don't create or delete any lock
+    :type dry_run: bool
+    """
+    zk_path = '/id/bgp/route-targets'
+    # the API server allocates RT ids in [8000000, 1 << 24)
+    start = 8000000
+    end = 1 << 24
+
+    def __init__(self, zk_client, asn=None, block_size=100, dry_run=False):
+        self.zk_client = zk_client
+        self.asn = asn
+        self.block_size = block_size
+        self.dry_run = dry_run
+        self.ids = IdAllocator(self.start, self.end)
+        # locks outside of the allocation range
+        self._others = set()
+        for child in self.zk_client.get_children(self.zk_path):
+            self._add(int(child))
+        self._block = []
+        self._pending = []
+        self._lock = gevent.lock.Semaphore()
+
+    def zk_node(self, rt_id):
+        return '%s/%010d' % (self.zk_path, rt_id)
+
+    def fq_name(self, rt_id):
+        return 'target:%d:%d' % (self.asn, rt_id)
+
+    def _add(self, rt_id):
+        if not self.ids.reserve(rt_id) and rt_id not in self.ids:
+            self._others.add(rt_id)
+
+    def _remove(self, rt_id):
+        self.ids.release(rt_id)
+        self._others.discard(rt_id)
+
+    def __contains__(self, rt_id):
+        """Check if rt_id is locked.
+        """
+        return rt_id in self.ids or rt_id in self._others
+
+    def __iter__(self):
+        """Iterate over the locked ids.
+        """
+        for rt_id in sorted(self._others):
+            yield rt_id
+        for rt_id in self.ids:
+            yield rt_id
+
+    def _commit(self, operations):
+        """Run the operations in one transaction.
+
+        Operations that fail because the lock already exists or is
+        already deleted are dropped and the transaction is retried.
+        Other failures raise an exception.
+
+        :rtype: [(str, int, bytes)] operations dropped
+        """
+        dropped = []
+        while operations and not self.dry_run:
+            transaction = self.zk_client.transaction()
+            for op, rt_id, value in operations:
+                if op == 'create':
+                    transaction.create(self.zk_node(rt_id), value)
+                else:
+                    transaction.delete(self.zk_node(rt_id))
+            results = transaction.commit()
+            failed = [operation for operation, result in zip(operations, results)
+                      if isinstance(result, (NodeExistsError, NoNodeError))]
+            if not failed:
+                # other operations of a failed transaction
+                # are rolled back
+                errors = [r for r in results if isinstance(r, Exception) and
+                          not isinstance(r, (RolledBackError, RuntimeInconsistency))]
+                if errors:
+                    raise errors[0]
+                break
+            dropped += failed
+            operations = [o for o in operations if o not in failed]
+        return dropped
+
+    def _reserve_block(self):
+        block = []
+        ids = self.ids.allocate(self.block_size)
+        while ids:
+            # locks created since the listing are replaced
+            taken = set(rt_id for _, rt_id, _ in self._commit([
+                ('create', rt_id, text_type(self.fq_name(rt_id)).encode('utf-8'))
+                for rt_id in ids]))
+            block += [rt_id for rt_id in ids if rt_id not in taken]
+            ids = self.ids.allocate(len(taken)) if taken else []
+        self._block = block[::-1]
+
+    def allocate(self):
+        """Return a route target id with its lock created.
+
+        :rtype: int
+        """
+        with self._lock:
+            if not self._block:
+                self._reserve_block()
+            return self._block.pop()
+
+    def release(self):
+        """Delete the locks of the reserved ids that were
+        not allocated.
+        """
+        with self._lock:
+            self._commit([('delete', rt_id, None) for rt_id in self._block])
+            for rt_id in self._block:
+                self._remove(rt_id)
+            self._block = []
+
+    def _queue(self, operation):
+        with self._lock:
+            self._pending.append(operation)
+            if len(self._pending) < self.block_size:
+                return
+            operations, self._pending = self._pending, []
+            self._commit(operations)
+
+    def create_lock(self, rt_id, value):
+        """Queue the creation of the lock of rt_id.
+
+        :param rt_id: route target id
+        :type rt_id: int
+        :param value: lock value
+        :type value: str
+        """
+        self._add(rt_id)
+        self._queue(('create', rt_id, text_type(value).encode('utf-8')))
+
+    def delete_lock(self, rt_id):
+        """Queue the deletion of the lock of rt_id.
+
+        :param rt_id: route target id
+        :type rt_id: int
+        """
+        self._remove(rt_id)
+        self._queue(('delete', rt_id, None))
+
+    def flush(self):
+        """Send the pending lock operations.
+        """
+        with self._lock:
+            operations, self._pending = self._pending, []
+            self._commit(operations)
+
+
+class ConcurrencyController(object):
+    """Adapt the number of concurrent tasks to the API server behaviour.
+
+    Tasks latencies are collected by windows of `window` tasks. At the end
+    of each window the concurrency is:
+
+    * halved if some tasks failed with a 429 or 5xx HTTP error
+    * reduced by a quarter if the p95 latency is above `latency_tolerance`
+      times the best p95 seen so far
+    * increased by one otherwise
+
+    Tasks that failed with a 429 or 5xx HTTP error are retried up to
+    `retries` times, after waiting `backoff` seconds doubled at each
+    retry.
+
+    :param workers: initial number of concurrent tasks
+    :type workers: int
+    :param max_workers: maximum number of concurrent tasks
+    :type max_workers: int
+    """
+    window = 50
+    latency_tolerance = 1.5
+    retries = 3
+    backoff = 0.5
+
+    def __init__(self, workers, max_workers, min_workers=1):
+        self.limit = min(workers, max_workers)
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.inflight = 0
+        self._latencies = []
+        self._errors = 0
+        self._best_p95 = None
+        self._released = Event()
+
+    def acquire(self):
+        while self.inflight >= self.limit:
+            self._released.clear()
+            self._released.wait()
+        self.inflight += 1
+
+    def release(self, latency, error=False):
+        self.inflight -= 1
+        self._latencies.append(latency)
+        if error:
+            self._errors += 1
+        if len(self._latencies) >= self.window:
+            self._adapt()
+        self._released.set()
+
+    def _adapt(self):
+        latencies = sorted(self._latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        if self._errors:
+            self.limit = max(self.min_workers, self.limit // 2)
+        elif self._best_p95 is not None and \
+                p95 > self._best_p95 * self.latency_tolerance:
+            self.limit = max(self.min_workers, self.limit * 3 // 4)
+        else:
+            self.limit = min(self.max_workers, self.limit + 1)
+        if self._best_p95 is None or p95 < self._best_p95:
+            self._best_p95 = p95
+        logger.debug('p95 latency %.3fs, %d errors, concurrency set to %d' %
+                     (p95, self._errors, self.limit))
+        self._latencies = []
+        self._errors = 0
+
+    def run(self, item, func, *args, **kwargs):
+        """Run func on item when the concurrency limit allows it.
+
+        :raises HttpError: when the error is not a 429 or 5xx
+                           error or when all retries failed
+        """
+        for retry in range(self.retries + 1):
+            self.acquire()
+            start = time.time()
+            error = False
+            try:
+                return func(item, *args, **kwargs)
+            except HttpError as e:
+                error = e.http_status is not None and \
+                    (e.http_status == 429 or e.http_status >= 500)
+                if not error or retry == self.retries:
+                    raise
+                delay = self.backoff * 2 ** retry
+                logger.debug('%s, retrying in %.1fs' % (e, delay))
+            finally:
+                self.release(time.time() - start, error=error)
+            gevent.sleep(delay)
+
+
+class TokenBucket(object):
+    """Allow `rate` operations per second with bursts
+    of `burst` operations.
+
+    :param rate: operations per second
+    :type rate: float
+    :param burst: bucket size (default: one second of operations)
+    :type burst: float
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1, rate))
+        self._tokens = self.burst
+        self._last = time.time()
+
+    def consume(self):
+        """Wait until an operation is allowed.
+        """
+        while True:
+            now = time.time()
+            self._tokens = min(self.burst,
+                               self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            gevent.sleep((1 - self._tokens) / self.rate)
+
+
+class APIRateLimiter(object):
+    """Limit the rate of requests made to the API server.
+
+    All requests are limited by `max_rps`. Write requests (POST, PUT,
+    DELETE) are also limited by `max_write_rps`.
+
+    The limiter is installed on the API session so that every request
+    made by the commands is accounted. When a limit is set the achieved
+    rate is displayed on stderr every `display_interval` seconds.
+    """
+    READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+    READ_URIS = ('/fqname-to-id', '/id-to-fqname')
+    display_interval = 5
+
+    def __init__(self):
+        self.configure()
+
+    def configure(self, max_rps=None, max_write_rps=None):
+        self.bucket = TokenBucket(max_rps) if max_rps else None
+        self.write_bucket = TokenBucket(max_write_rps) if max_write_rps else None
+        self._requests = 0
+        self._writes = 0
+        self._last_display = time.time()
+
+    @property
+    def enabled(self):
+        return self.bucket is not None or self.write_bucket is not None
+
+    def is_write(self, url, method):
+        return method.upper() not in self.READ_METHODS and \
+            not url.endswith(self.READ_URIS)
+
+    def wait(self, url, method):
+        """Wait until the request is allowed by the configured limits.
+        """
+        if not self.enabled:
+            return
+        if self.is_write(url, method):
+            if self.write_bucket is not None:
+                self.write_bucket.consume()
+            self._writes += 1
+        if self.bucket is not None:
+            self.bucket.consume()
+        self._requests += 1
+        self._display()
+
+    def _display(self):
+        now = time.time()
+        elapsed = now - self._last_display
+        if elapsed < self.display_interval:
+            return
+        printo('API rate: %.1f req/s (%.1f writes/s)' %
+               (self._requests / elapsed, self._writes / elapsed),
+               std_type='stderr')
+        self._requests = 0
+        self._writes = 0
+        self._last_display = now
+
+    def install(self, session):
+        """Make all requests of session go through the limiter.
+        """
+        if getattr(session, 'rate_limiter', None) is self:
+            return
+        request = session.request
+
+        def limited_request(url, method, *args, **kwargs):
+            self.wait(url, method)
+            return request(url, method, *args, **kwargs)
+
+        session.request = limited_request
+        session.rate_limiter = self
+
+
+rate_limiter = APIRateLimiter()
+"""API rate limiter shared by all commands"""
+
+
+class OperationStats(object):
+    """Calls count and latency histogram of an operation.
+
+    Latencies are stored in buckets whose upper bounds are `buckets`
+    (in seconds), percentiles are therefore approximated by the upper
+    bound of the bucket.
+    """
+    buckets = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05,
+               0.1, 0.2, 0.5, 1, 2, 5, 10)
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * (len(self.buckets) + 1)
+
+    def add(self, latency, error=False):
+        self.calls += 1
+        if error:
+            self.errors += 1
+        self.total += latency
+        self.max = max(self.max, latency)
+        self.histogram[bisect.bisect_left(self.buckets, latency)] += 1
+
+    def percentile(self, percent):
+        rank = self.calls * percent / 100.0
+        seen = 0
+        for bound, count in zip(self.buckets, self.histogram):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total': self.total,
+            'max': self.max,
+            'buckets': list(self.buckets),
+            'histogram': self.histogram,
+        }
+
+
+class Instrumentation(object):
+    """Count calls and latencies of the API, zookeeper and cassandra
+    operations made by the commands.
+
+    API requests are instrumented on the session and classified by
+    operation (list, fetch, save, delete, ref_update...). Zookeeper and
+    cassandra operations are instrumented on the kazoo and pycassa
+    client classes so that clients created by the commands are covered.
+    Nested calls (eg: kazoo `create` calling `ensure_path`) are only
+    accounted once.
+
+    Nothing is recorded until :py:meth:`start` is called.
+    """
+    ZK_OPERATIONS = ('exists', 'get', 'get_async', 'get_children', 'create',
+                     'delete', 'set', 'ensure_path')
+    CASSANDRA_OPERATIONS = ('get', 'multiget', 'get_count', 'insert',
+                            'remove', 'batch_insert')
+    CASSANDRA_GENERATORS = ('get_range', 'xget', 'get_indexed_slices')
+
+    def __init__(self):
+        self.enabled = False
+        self.output = None
+        self.profiler = None
+        self._installed = set()
+        self._local = gevent.local.local()
+        self.reset()
+
+    def reset(self):
+        self.stats = {}
+        self._start_time = time.time()
+        self._start_cpu = sum(os.times()[:2])
+
+    def record(self, backend, operation, latency, error=False):
+        key = (backend, operation)
+        if key not in self.stats:
+            self.stats[key] = OperationStats()
+        self.stats[key].add(latency, error=error)
+
+    @staticmethod
+    def api_operation(url, method):
+        """Name the API operation of a request.
+        """
+        parts = [p for p in urlparse(url).path.split('/') if p]
+        method = method.upper()
+        if len(parts) == 1:
+            name = parts[0]
+            if name in ('fqname-to-id', 'id-to-fqname', 'ref-update'):
+                return name.replace('-', '_')
+            if name == 'useragent-kv':
+                return 'kv'
+            if method == 'GET':
+                return 'list'
+            if method == 'POST':
+                return 'save'
+        elif len(parts) == 2:
+            if method == 'GET':
+                return 'fetch'
+            if method == 'PUT':
+                return 'save'
+            if method == 'DELETE':
+                return 'delete'
+        return method.lower()
+
+    def timed(self, backend, operation, func):
+        """Wrap func to record its calls under backend/operation.
+        """
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.enabled or getattr(self._local, backend, False):
+                return func(*args, **kwargs)
+            setattr(self._local, backend, True)
+            start = time.time()
+            error = False
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                error = True
+                raise
+            finally:
+                setattr(self._local, backend, False)
+                self.record(backend, operation, time.time() - start, error=error)
+        return wrapper
+
+    def timed_generator(self, backend, operation, func):
+        """Wrap a generator function to record the time spent producing
+        its items, the consumer time is not accounted.
+        """
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                for item in func(*args, **kwargs):
+                    yield item
+                return
+            elapsed = 0.0
+            error = False
+            iterator = iter(func(*args, **kwargs))
+            try:
+                while True:
+                    start = time.time()
+                    try:
+                        item = next(iterator)
+                    finally:
+                        elapsed += time.time() - start
+                    yield item
+            except StopIteration:
+                return
+            except Exception:
+                error = True
+                raise
+            finally:
+                self.record(backend, operation, elapsed, error=error)
+        return wrapper
+
+    def install_session(self, session):
+        if getattr(session, 'instrumentation', None) is self:
+            return
+        request = session.request
+
+        def timed_request(url, method, *args, **kwargs):
+            return self.timed('api', self.api_operation(url, method),
+                              request)(url, method, *args, **kwargs)
+
+        session.request = timed_request
+        session.instrumentation = self
+
+    def _install_methods(self, backend, cls, methods, wrapper):
+        for name in methods:
+            if (cls, name) in self._installed or not hasattr(cls, name):
+                continue
+            setattr(cls, name, wrapper(backend, name, getattr(cls, name)))
+            self._installed.add((cls, name))
+
+    def install_zookeeper(self):
+        self._install_methods('zookeeper', KazooClient,
+                              self.ZK_OPERATIONS, self.timed)
+        self._install_methods('zookeeper', TransactionRequest,
+                              ('commit',), self.timed)
+
+    def install_cassandra(self):
+        from pycassa.columnfamily import ColumnFamily
+        self._install_methods('cassandra', ColumnFamily,
+                              self.CASSANDRA_OPERATIONS, self.timed)
+        self._install_methods('cassandra', ColumnFamily,
+                              self.CASSANDRA_GENERATORS, self.timed_generator)
+
+    def start(self, session, output=None):
+        """Start recording operations.
+
+        The report is printed on stderr at exit. If `output` is given,
+        statistics are dumped in JSON if it ends with .json, otherwise
+        the process is profiled with cProfile and the stats are dumped
+        in `output`.
+        """
+        self.install_session(session)
+        self.install_zookeeper()
+        self.install_cassandra()
+        if not self.enabled:
+            atexit.register(self.report)
+        self.enabled = True
+        self.output = output
+        self.reset()
+        if output and not output.endswith('.json'):
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def report(self):
+        """Print the statistics and write the output file.
+        """
+        if self.profiler is not None:
+            self.profiler.disable()
+        printo(self.summary(), std_type='stderr')
+        if self.output and self.profiler is not None:
+            self.profiler.dump_stats(self.output)
+        elif self.output:
+            with open(self.output, 'w') as f:
+                json.dump(self.to_dict(), f, indent=2)
+
+    def summary(self):
+        wall = time.time() - self._start_time
+        cpu = sum(os.times()[:2]) - self._start_cpu
+        table = PrettyTable()
+        table.field_names = ['backend', 'operation', 'calls', 'errors', 'total (s)',
+                             'mean (ms)', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)', 'max (ms)']
+        table.align = 'r'
+        table.align['backend'] = table.align['operation'] = 'l'
+        waited = 0.0
+        for (backend, operation), stats in sorted(self.stats.items()):
+            waited += stats.total
+            table.add_row([backend, operation, stats.calls, stats.errors,
+                           '%.2f' % stats.total,
+                           '%.1f' % (stats.total * 1000 / stats.calls),
+                           '%.1f' % (stats.percentile(50) * 1000),
+                           '%.1f' % (stats.percentile(95) * 1000),
+                           '%.1f' % (stats.percentile(99) * 1000),
+                           '%.1f' % (stats.max * 1000)])
+        return '%s\nwall time: %.2fs, cpu time: %.2fs, time in backends calls: %.2fs' % \
+            (table, wall, cpu, waited)
+
+    def to_dict(self):
+        return {
+            'wall_time': time.time() - self._start_time,
+            'cpu_time': sum(os.times()[:2]) - self._start_cpu,
+            'operations': [dict(stats.to_dict(), backend=backend, operation=operation)
+                           for (backend, operation), stats in sorted(self.stats.items())],
+        }
+
+
+instrumentation = Instrumentation()
+"""Operations instrumentation shared by all commands"""
+
+
+class Progress(object):
+    """Report the progress of a long running loop on stderr.
+
+    Items processed, throughput and ETA (when the total is known) are
+    displayed at most every `interval` seconds so that reporting doesn't
+    slow down the loop. With `json=True` each report is a JSON document
+    on its own line.
+
+    :param name: name displayed in the reports (eg: the command name)
+    :type name: str
+    :param total: total number of items or None if unknown
+    :type total: int
+    :param unit: name of the items
+    :type unit: str
+    """
+
+    def __init__(self, name, total=None, unit='items', interval=5, json=False):
+        self.name = name
+        self.total = total
+        self.unit = unit
+        self.interval = interval
+        self.json = json
+        self.done = 0
+        self._start = self._last = time.time()
+
+    def update(self, count=1):
+        self.done += count
+        now = time.time()
+        if now - self._last >= self.interval:
+            self.display(now)
+
+    def finish(self):
+        self.display(final=True)
+
+    def iterate(self, iterable):
+        """Yield iterable items, updating the progress.
+        """
+        for item in iterable:
+            yield item
+            self.update()
+        self.finish()
+
+    def report(self, now=None, final=False):
+        now = now or time.time()
+        elapsed = now - self._start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.total is not None and rate > 0 and not final:
+            eta = max(self.total - self.done, 0) / rate
+        return {'command': self.name,
+                'unit': self.unit,
+                'done': self.done,
+                'total': self.total,
+                'elapsed': round(elapsed, 3),
+                'rate': round(rate, 3),
+                'eta': round(eta, 3) if eta is not None else None,
+                'final': final}
+
+    def display(self, now=None, final=False):
+        report = self.report(now=now, final=final)
+        self._last = now or time.time()
+        if self.json:
+            printo(json.dumps(report, sort_keys=True), std_type='stderr')
+            return
+        msg = '%s: %d' % (self.name, self.done)
+        if self.total is not None:
+            msg += '/%d' % self.total
+        msg += ' %s' % self.unit
+        if self.total:
+            msg += ' (%.1f%%)' % (100.0 * self.done / self.total)
+        msg += ', %.1f %s/s' % (report['rate'], self.unit)
+        if final:
+            msg += ', done in %s' % format_duration(report['elapsed'])
+        elif report['eta'] is not None:
+            msg += ', ETA %s' % format_duration(report['eta'])
+        printo(msg, std_type='stderr')
+
+
+class ParallelCommand(Command):
+    """Inherit from this class for a command that runs tasks concurrently.
+
+    This will add `--workers`, `--max-inflight`, `--max-rps` and
+    `--max-write-rps` options to the command.
+
+    `--workers` is the number of concurrent tasks. When `--max-inflight`
+    is provided the concurrency starts at `--workers` and is adapted up to
+    `--max-inflight` depending on the API server latency and errors.
+
+    `--max-rps` and `--max-write-rps` bound the load put on the API server,
+    see :py:class:`APIRateLimiter`.
+
+    The API session connection pool is sized so that each worker keeps
+    its connection alive.
+
+    Tasks must be run with `self.parallel_map`.
+    """
+    workers = Option(help="number of concurrent workers (default: %(default)s)",
+                     type=positive_int_type,
+                     default=50)
+    max_inflight = Option(help="adapt the number of concurrent workers "
+                               "up to this value",
+                          type=positive_int_type,
+                          default=None)
+    max_rps = Option(help="maximum number of API requests per second",
+                     type=positive_float_type,
+                     default=None)
+    max_write_rps = Option(help="maximum number of API write requests "
+                                "per second",
+                           type=positive_float_type,
+                           default=None)
+
+    def parallel_map(self, func, iterable, args=None, kwargs=None):
+        """Map func on iterable with the configured concurrency.
+
+        See :py:func:`parallel_map`.
+        """
+        if self.controller is None:
+            return parallel_map(func, iterable, args=args, kwargs=kwargs,
+                                workers=self.workers)
+        return parallel_map(self.controller.run, iterable,
+                            args=(func,) + tuple(args or ()), kwargs=kwargs,
+                            workers=self.controller.max_workers)
+
+    def __call__(self, workers=None, max_inflight=None, max_rps=None,
+                 max_write_rps=None, **kwargs):
+        self.workers = workers
+        rate_limiter.configure(max_rps=max_rps, max_write_rps=max_write_rps)
+        if rate_limiter.enabled:
+            rate_limiter.install(Context().session)
+        if max_inflight is not None:
+            self.controller = ConcurrencyController(workers, max_inflight)
+        else:
+            self.controller = None
+        resize_connection_pool(Context().session, max(workers, max_inflight or 0))
+        super(ParallelCommand, self).__call__(**kwargs)
+
+
+class ProfileCommand(Command):
+    """Inherit from this class to add `--profile` and `--profile-output`
+    options to the command.
+
+    When enabled, the API, zookeeper and cassandra operations made by the
+    command are counted and timed (see :py:class:`Instrumentation`) and a
+    summary is printed on stderr at exit.
+
+    `--profile-output` dumps the statistics in a JSON file when the file
+    name ends with `.json`, otherwise the command is run under cProfile and
+    the profiler stats are dumped in the file.
+
+    Put this class first in the command bases so that the work done by
+    the other mixins is accounted.
+    """
+    profile = Option(action='store_true',
+                     default=False,
+                     help='print API, zookeeper and cassandra calls statistics at exit')
+    profile_output = Option(help='dump the statistics in a JSON file (.json) '
+                                 'or the cProfile stats in any other file',
+                            default=None)
+
+    def __call__(self, profile=False, profile_output=None, **kwargs):
+        if profile or profile_output:
+            instrumentation.start(Context().session, output=profile_output)
+        super(ProfileCommand, self).__call__(**kwargs)
+
+
+class ProgressCommand(Command):
+    """Inherit from this class to add `--progress`, `--progress-format`
+    and `--progress-interval` options to the command.
+
+    Long running loops must iterate over `self.progress_iter(iterable)`
+    to be reported, see :py:class:`Progress`.
+    """
+    progress = Option(action='store_true',
+                      default=False,
+                      help='report progress on stderr')
+    progress_format = Option(choices=['text', 'json'],
+                             default='text',
+                             help='progress reports format, json outputs '
+                                  'one JSON document per line (default: %(default)s)')
+    progress_interval = Option(type=positive_float_type,
+                               default=5,
+                               help='seconds between progress reports (default: %(default)s)')
+
+    def progress_iter(self, iterable, total=None, unit='items'):
+        """Iterate over iterable reporting the progress if enabled.
+
+        :param total: number of items, or a callable returning it so
+                      that it is only computed when progress is enabled
+        :type total: int | callable
+        :param unit: name of the items
+        :type unit: str
+        """
+        if not self.progress:
+            return iterable
+        if callable(total):
+            total = total()
+        progress = Progress(self.parser.prog, total=total, unit=unit,
+                            interval=self.progress_interval,
+                            json=self.progress_format == 'json')
+        return progress.iterate(iterable)
+
+    def __call__(self, progress=False, progress_format=None,
+                 progress_interval=None, **kwargs):
+        self.progress = progress
+        self.progress_format = progress_format
+        self.progress_interval = progress_interval
+        super(ProgressCommand, self).__call__(**kwargs)
+
+
+class ReportCommand(Command):
+    """Inherit from this class to add an `--output` option to the command.
+
+    Findings and actions of the command must be reported with
+    `self.report`. With `--output text` the message is printed as is.
+    With `--output jsonl` each report is written on stdout as a JSON
+    object on its own line with `type`, `uuid`, `reason`, `action`,
+    `dry_run` and `message` keys plus any extra field given to
+    `self.report`. `dry_run` is true when the action was not applied
+    (`--check` or `--dry-run`).
+
+    Messages that are not findings are reported with `self.info` and
+    only printed in text mode. Findings without message are only
+    reported in jsonl mode.
+
+    JSON lines go through the buffered stdout instead of being flushed
+    one by one.
+    """
+    output = Option(choices=['text', 'jsonl'],
+                    default='text',
+                    help='output format (default: %(default)s)')
+
+    def report(self, message, type=None, uuid=None, reason=None, action=None, **fields):
+        """Report a finding or an action.
+
+        :param message: text message, None to report only in jsonl mode
+        :type message: str
+        :param type: type of the resource concerned
+        :type type: str
+        :param uuid: uuid of the resource concerned
+        :type uuid: str
+        :param reason: why the resource is reported
+        :type reason: str
+        :param action: action taken on the resource if any
+        :type action: str
+        """
+        if self.output != 'jsonl':
+            if message is not None:
+                printo(message)
+            return
+        fields.update(type=type, uuid=uuid, reason=reason, action=action,
+                      message=message,
+                      dry_run=bool(getattr(self, 'dry_run', False) or
+                                   getattr(self, 'check', False)))
+        sys.stdout.write(json.dumps(fields, sort_keys=True, default=text_type) + '\n')
+
+    def info(self, message):
+        """Print message in text mode only.
+        """
+        if self.output != 'jsonl':
+            printo(message)
+
+    def __call__(self, output=None, **kwargs):
+        self.output = output
+        super(ReportCommand, self).__call__(**kwargs)
+
+
 class ZKCommand(Command):
     """Inherit from this class when a connection to the Zookeeper cluster
     is needed.
@@ -206,6 +1364,30 @@ class ZKCommand(Command):
     zk_server = Option(help="zookeeper server (default: %(default)s)",
                        type=server_type,
                        default='localhost:2181')
+    zk_batch_size = 1000
+    """Number of pipelined requests in `self.zk_get_many`"""
+
+    def zk_get_many(self, paths):
+        """Get the data of many nodes. Requests are sent by batches
+        without waiting for the responses.
+
+        The data of missing nodes is None.
+
+        :param paths: nodes paths
+        :type paths: iterable
+        :rtype: generator of (path, data)
+        """
+        paths = iter(paths)
+        while True:
+            batch = [(path, self.zk_client.get_async(path))
+                     for path in islice(paths, self.zk_batch_size)]
+            if not batch:
+                return
+            for path, result in batch:
+                try:
+                    yield path, result.get()[0]
+                except NoNodeError:
+                    yield path, None
 
     def __call__(self, zk_server=None, **kwargs):
         if not hasattr(self, 'zk_client'):
@@ -264,7 +1446,19 @@ class PathCommand(Command):
     This will add a `path` argument to the command (nargs=*).
 
     The selected resources are available in `self.resources`.
+
+    When all resources are considered the collection can be listed with
+    the resources data instead of fetching each resource separately.
+    Set `resource_fields` to the list of fields the command needs (refs
+    and back_refs included) or set `resource_detail` to get all the
+    resource properties and refs. Use `self.fetch_resource` in the command
+    to fetch a resource only when it wasn't populated by the listing.
+    Override `list_resources` to change or defer the listing.
     """
+    resource_fields = []
+    """Fields to fetch when listing the resources"""
+    resource_detail = False
+    """Fetch all resources properties when listing the resources"""
 
     @abc.abstractproperty
     def resource_type(self):
@@ -283,12 +1477,34 @@ class PathCommand(Command):
                         complete="resources:%s:path" % cmd.resource_type)
         return cmd
 
+    def list_resources(self):
+        """List the resources considered when no path is given.
+
+        :rtype: Collection
+        """
+        return Collection(self.resource_type, fetch=True,
+                          fields=self.resource_fields,
+                          detail=self.resource_detail or None)
+
+    def fetch_resource(self, resource):
+        """Fetch the resource unless its data was already
+        retrieved when listing the collection.
+
+        :rtype: Resource
+        """
+        if not self.resources_fetched:
+            resource.fetch()
+        return resource
+
     def __call__(self, paths=None, **kwargs):
         if not paths:
-            self.resources = Collection(self.resource_type, fetch=True)
+            self.resources = self.list_resources()
+            self.resources_fetched = bool(self.resource_fields or
+                                          self.resource_detail)
         else:
             self.resources = expand_paths(paths,
                                           predicate=lambda r: r.type == self.resource_type)
+            self.resources_fetched = False
         super(PathCommand, self).__call__(**kwargs)
 
 
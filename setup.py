@@ -10,6 +10,10 @@ install_requires = [
     'python-keystoneclient',
     'PrettyTable'
 ]
+extras_require = {
+    # stream the provision environment file
+    'ijson': ['ijson'],
+}
 test_requires = []
 
 if sys.version_info[0] == 2:
@@ -28,6 +32,7 @@ setup(
     packages=find_packages(),
     include_package_data=True,
     install_requires=install_requires,
+    extras_require=extras_require,
     scripts=[],
     license="MIT",
     entry_points={
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from contrail_api_cli_extra.provision.bgp_router import AddBGPRouter, DEFAULT_RI_FQ_NAME
+
+
+class FakeResource(dict):
+    """Record the refs of the BGP routers when they are saved."""
+
+    def __init__(self, type, fq_name=None, saved=None, **kwargs):
+        super(FakeResource, self).__init__(kwargs)
+        self.type = type
+        self.fq_name = fq_name
+        self.uuid = 'uuid-%s' % fq_name[-1]
+        self.saved = saved
+
+    def save(self):
+        self.saved[self.fq_name[-1]] = [ref['to'][-1] for ref in self['bgp_router_refs']]
+
+
+class TestAddBGPRouter(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = {}
+        existing = [mock.Mock(fq_name=DEFAULT_RI_FQ_NAME + [name])
+                    for name in ('old-1', 'old-2')]
+        patches = [
+            mock.patch('contrail_api_cli_extra.provision.bgp_router.Resource',
+                       lambda type, **kwargs: FakeResource(type, saved=self.saved, **kwargs)),
+            mock.patch('contrail_api_cli_extra.provision.bgp_router.Collection',
+                       lambda type, **kwargs: existing),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.cmd = AddBGPRouter('add-bgp-router')
+
+    def test_bulk_call_mesh(self):
+        calls = [{'router_name': name, 'router_ip': ip, 'router_type': 'contrail'}
+                 for name, ip in (('new-1', '10.0.0.1'),
+                                  ('new-2', '10.0.0.2'),
+                                  ('new-3', '10.0.0.3'))]
+        self.cmd.bulk_call(calls, workers=10)
+        self.assertEqual(self.saved, {
+            'new-1': ['old-1', 'old-2'],
+            'new-2': ['old-1', 'old-2', 'new-1'],
+            'new-3': ['old-1', 'old-2', 'new-1', 'new-2'],
+        })
+
+    def test_address_families(self):
+        families = ['inet-vpn', 'erm-vpn']
+        params = self.cmd._router_parameters(router_type='other',
+                                             router_address_families=families)
+        self.assertEqual(params['address_families']['family'], ['inet-vpn'])
+        self.assertEqual(families, ['inet-vpn', 'erm-vpn'])
+        params = self.cmd._router_parameters(router_type='other',
+                                             router_address_families=None)
+        self.assertEqual(params['address_families']['family'], [])
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from contrail_api_cli.client import ContrailAPISession
+from contrail_api_cli.context import Context
+
+from contrail_api_cli_extra.clean.rt import CleanRT
+from contrail_api_cli_extra.utils import RouteTargetAllocator
+
+from .test_utils import FakeZK
+
+
+class RacyZK(FakeZK):
+    """An RT and its lock are created by the API server
+    when the locks are listed.
+    """
+
+    def __init__(self, rt_ids, api_rt_ids, created):
+        super(RacyZK, self).__init__(rt_ids)
+        self.connected = True
+        self.api_rt_ids = api_rt_ids
+        self.created = created
+
+    def get_children(self, path):
+        children = super(RacyZK, self).get_children(path)
+        self.nodes['%s/%010d' % (RouteTargetAllocator.zk_path, self.created)] = b''
+        self.api_rt_ids.append(self.created)
+        return children + ['%010d' % self.created]
+
+
+class TestCleanZKOrphans(unittest.TestCase):
+
+    def setUp(self):
+        Context().session = ContrailAPISession(host='localhost', port=8082)
+
+    def test_rt_created_between_listings(self):
+        api_rt_ids = [8000001]
+        zk = RacyZK([8000001, 8000002], api_rt_ids, created=8000003)
+
+        def collection(type, **kwargs):
+            return [mock.Mock(fq_name=['target:64512:%d' % rt_id])
+                    for rt_id in api_rt_ids]
+
+        cmd = CleanRT('clean-route-target')
+        cmd.zk_client = zk
+        with mock.patch('contrail_api_cli_extra.clean.rt.Collection', collection), \
+                mock.patch('contrail_api_cli_extra.utils.Collection', collection), \
+                mock.patch('contrail_api_cli_extra.utils.printo'):
+            cmd.parse_and_call('--zk-orphans')
+        self.assertEqual(zk.rt_ids(), [8000001, 8000003])
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+from netaddr import IPNetwork
+
+from contrail_api_cli_extra.fix.fix_fip_locks import FixFIPLocks
+from contrail_api_cli_extra.utils import SubnetIndex
+
+
+class TestFixFIPLocks(unittest.TestCase):
+
+    def setUp(self):
+        self.cmd = FixFIPLocks('fix-fip-locks')
+        self.cmd.public_fqname = 'default-domain:admin:public'
+        self.cmd.output = 'text'
+        self.cmd.resources_fetched = True
+        self.cmd.zk_client = mock.Mock()
+        self.subnet = IPNetwork('10.0.0.0/24')
+        self.subnets = SubnetIndex([self.subnet])
+        self.cmd.locks = {self.subnet: set()}
+        self.fip = mock.Mock(uuid='fip-uuid', type='floating-ip')
+        self.fip.get.return_value = '10.0.0.5'
+
+    def check_fip(self, check=False, dry_run=False):
+        self.cmd.check = check
+        self.cmd.dry_run = dry_run
+        with mock.patch('contrail_api_cli_extra.utils.printo'):
+            self.cmd._check_fip(self.fip, self.subnets)
+
+    def test_lock_created(self):
+        self.check_fip()
+        self.cmd.zk_client.create.assert_called_once_with(
+            '/api-server/subnets/default-domain:admin:public:10.0.0.0/24/167772165')
+
+    def test_dry_run(self):
+        self.check_fip(dry_run=True)
+        self.assertFalse(self.cmd.zk_client.create.called)
+
+    def test_check(self):
+        self.check_fip(check=True)
+        self.assertFalse(self.cmd.zk_client.create.called)
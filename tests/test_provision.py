@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import io
+import os
+import json
+import tempfile
+import unittest
+from collections import OrderedDict
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from contrail_api_cli.exceptions import CommandError
+
+from contrail_api_cli_extra.provision import provision
+from contrail_api_cli_extra.provision.provision import Provision, Actions
+
+
+ENV = OrderedDict([
+    ('name', 'environ'),
+    ('namespace', 'contrail_api_cli.provision'),
+    ('defaults', OrderedDict([
+        ('vn', OrderedDict([('project-fqname', 'default-domain:admin')])),
+    ])),
+    ('provision', OrderedDict([
+        ('vrouter', [
+            OrderedDict([('vrouter-name', 'compute-1'), ('vrouter-ip', '10.0.0.1')]),
+        ]),
+        ('global-asn', [OrderedDict([('asn', 64512), ('ratio', 0.5),
+                                     ('flags', [True, None, 'a'])])]),
+        ('empty', []),
+    ])),
+])
+
+
+class TestLoadEnv(unittest.TestCase):
+
+    def setUp(self):
+        self.cmd = Provision('provision')
+
+    def load(self, env):
+        env_file = io.BytesIO(json.dumps(env).encode('utf-8'))
+        env, provision = self.cmd._load_env(env_file)
+        return env, list(provision)
+
+    def check_load(self):
+        env, items = self.load(ENV)
+        self.assertEqual([(k, v) for k, v in env.items() if k != 'provision'],
+                         [(k, v) for k, v in ENV.items() if k != 'provision'])
+        self.assertEqual(items, list(ENV['provision'].items()))
+        self.assertIsInstance(items[1][1][0], OrderedDict)
+        self.assertIsInstance(items[1][1][0]['ratio'], float)
+
+    def test_json(self):
+        ijson, provision.ijson = provision.ijson, None
+        try:
+            self.check_load()
+        finally:
+            provision.ijson = ijson
+
+    @unittest.skipIf(provision.ijson is None, 'ijson not installed')
+    def test_ijson(self):
+        self.check_load()
+
+    @unittest.skipIf(provision.ijson is None, 'ijson not installed')
+    def test_ijson_one_pass(self):
+        env_file = io.BytesIO(json.dumps(ENV).encode('utf-8'))
+        env_file.seek = None
+        env, items = self.cmd._load_env(env_file)
+        self.assertEqual(len(list(items)), 3)
+
+    @unittest.skipIf(provision.ijson is None, 'ijson not installed')
+    def test_ijson_defaults_after_provision(self):
+        env = OrderedDict((k, ENV[k]) for k in ('provision', 'namespace', 'defaults'))
+        env, items = self.load(env)
+        self.assertEqual(list(env.keys()), ['namespace', 'defaults'])
+        self.assertEqual(items, list(ENV['provision'].items()))
+
+
+class TestDiffKeyState(unittest.TestCase):
+
+    def setUp(self):
+        self.cmd = Provision('provision')
+        self.cmd._provision_defaults = {}
+        self.cmd._spec_only = False
+        self.calls = [{'asn': 64512}]
+        spec = self.cmd._spec_hash('global-asn', self.calls)
+        self.cmd._state = {'global-asn': {'spec': spec, 'live': 'fingerprint'}}
+
+    def test_unchanged(self):
+        self.cmd._get_current_values = mock.Mock(return_value=self.calls)
+        self.cmd._fingerprint = mock.Mock(return_value='fingerprint')
+        self.cmd._prepare_calls = mock.Mock()
+        self.assertEqual(self.cmd._diff_key('global-asn', self.calls),
+                         ('global-asn', [], [], self.cmd._state['global-asn']['spec'],
+                          'fingerprint'))
+        self.assertTrue(self.cmd._get_current_values.called)
+        self.assertFalse(self.cmd._prepare_calls.called)
+
+    def test_live_changed(self):
+        self.cmd._properties = {'global-asn': True}
+        self.cmd._get_current_values = mock.Mock(return_value=[{'asn': 64513}])
+        self.cmd._validate_call = lambda key, call: call
+        self.assertEqual(self.cmd._diff_key('global-asn', self.calls)[1],
+                         [({'asn': 64512}, {'asn': 64512})])
+
+    def test_spec_only_not_listed(self):
+        self.cmd._spec_only = True
+        self.cmd._get_current_values = mock.Mock()
+        self.assertEqual(self.cmd._diff_key('global-asn', self.calls),
+                         ('global-asn', [], [], self.cmd._state['global-asn']['spec'],
+                          'fingerprint'))
+        self.assertFalse(self.cmd._get_current_values.called)
+
+
+class TestDiffCalls(unittest.TestCase):
+
+    def setUp(self):
+        self.cmd = Provision('provision')
+        self.cmd._properties = {'vrouter': False, 'encaps': True}
+
+    def pairs(self, *values):
+        return [({}, value) for value in values]
+
+    def test_diff(self):
+        current = self.pairs({'vrouter_name': 'a', 'vrouter_ip': '10.0.0.1'},
+                             {'vrouter_name': 'b', 'vrouter_ip': '10.0.0.2'})
+        wanted = self.pairs({'vrouter_ip': '10.0.0.1', 'vrouter_name': 'a'},
+                            {'vrouter_name': 'b', 'vrouter_ip': '10.0.0.3'},
+                            {'vrouter_name': 'c', 'vrouter_ip': '10.0.0.4'})
+        add_values, del_values = self.cmd._diff_calls('vrouter', current, wanted)
+        self.assertEqual(add_values, wanted[1:])
+        self.assertEqual(del_values, current[1:])
+
+    def test_same(self):
+        current = self.pairs({'vrouter_name': 'a'}, {'vrouter_name': 'b'})
+        wanted = self.pairs({'vrouter_name': 'b'}, {'vrouter_name': 'a'})
+        self.assertEqual(self.cmd._diff_calls('vrouter', current, wanted), ([], []))
+
+    def test_property(self):
+        current = self.pairs({'modes': ['MPLSoGRE']})
+        wanted = self.pairs({'modes': ['MPLSoUDP', 'MPLSoGRE']})
+        self.assertEqual(self.cmd._diff_calls('encaps', current, wanted),
+                         (wanted, []))
+
+
+class TestSchedule(unittest.TestCase):
+
+    def setUp(self):
+        self.cmd = Provision('provision')
+        depends = {
+            'vn': (),
+            'subnets': ('vn',),
+            'route-targets': ('vn',),
+            'lr': ('vn', 'subnets'),
+            'vrouter': (),
+        }
+        self.cmd._get_command = lambda key, action: mock.Mock(depends=depends[key])
+
+    def actions(self, *keys):
+        return OrderedDict((key, 'add') for key in keys)
+
+    def test_schedule(self):
+        actions = self.actions('lr', 'vrouter', 'subnets', 'route-targets', 'vn')
+        self.assertEqual(self.cmd._schedule(actions),
+                         [['vrouter', 'vn'], ['subnets', 'route-targets'], ['lr']])
+
+    def test_reverse(self):
+        actions = self.actions('vn', 'subnets', 'lr', 'vrouter')
+        self.assertEqual(self.cmd._schedule(actions, reverse=True),
+                         [['lr', 'vrouter'], ['subnets'], ['vn']])
+
+    def test_missing_dependencies_ignored(self):
+        self.assertEqual(self.cmd._schedule(self.actions('lr', 'route-targets')),
+                         [['lr', 'route-targets']])
+
+    def test_circular(self):
+        self.cmd._get_command = lambda key, action: mock.Mock(depends={'a': ('b',),
+                                                                       'b': ('a',)}[key])
+        self.assertRaises(CommandError, self.cmd._schedule, self.actions('a', 'b'))
+
+
+class TestApplyDiff(unittest.TestCase):
+
+    def setUp(self):
+        self.cmd = Provision('provision')
+        self.cmd.workers = 10
+        depends = {'vn': (), 'subnets': ('vn',), 'vrouter': ()}
+        self.cmd._get_command = lambda key, action: mock.Mock(spec=['depends', 'parallel'],
+                                                              depends=depends[key],
+                                                              parallel=True)
+        self.called = []
+
+        def call_command(cmd, defaults={}):
+            self.called.append(defaults['name'])
+            if defaults['name'] == 'bad':
+                raise CommandError('invalid')
+        self.cmd._call_command = call_command
+
+    def test_errors_collected(self):
+        diff = {
+            Actions.ADD: OrderedDict([
+                ('vn', [({}, {'name': 'bad'}), ({}, {'name': 'good'})]),
+                ('vrouter', [({}, {'name': 'compute-1'})]),
+                ('subnets', [({}, {'name': 'subnet'})]),
+            ]),
+        }
+        with self.assertRaises(CommandError) as cm:
+            self.cmd._apply_diff(diff)
+        self.assertIn('Call to add vn failed: invalid', str(cm.exception))
+        # the other calls of the level are made, the next levels are not
+        self.assertEqual(sorted(self.called), ['bad', 'compute-1', 'good'])
+
+
+class TestPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.cmd = Provision('provision')
+        self.cmd._provision_defaults = {'vrouter': {'vrouter_type': 'embedded'}}
+        self.cmd._validate_call = lambda key, call: dict(call, validated=True)
+        self.diff = {
+            Actions.SET: OrderedDict(),
+            Actions.ADD: OrderedDict([('vrouter', self.cmd._prepare_calls('vrouter', [
+                {'vrouter-name': 'compute-1', 'vrouter-ip': '10.0.0.1'},
+                {'vrouter-name': 'compute-2', 'vrouter-ip': '10.0.0.2'},
+            ]))]),
+            Actions.DEL: OrderedDict([('vn', self.cmd._prepare_calls('vn', [
+                {'virtual-network-name': 'old'},
+            ]))]),
+        }
+        self.state = OrderedDict([
+            ('vrouter', {'spec': 'spec1', 'live': 'live1'}),
+            ('vn', {'spec': 'spec2', 'live': 'live2'}),
+            ('encaps', {'spec': 'spec3', 'live': 'live3'}),
+        ])
+        fd, self.plan_file = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        self.addCleanup(os.remove, self.plan_file)
+
+    def save_and_load(self, fingerprints):
+        self.cmd._save_plan(self.plan_file, 'contrail_api_cli.provision',
+                            self.diff, self.state)
+        with open(self.plan_file) as f:
+            plan = json.load(f, object_pairs_hook=OrderedDict)
+        self.assertEqual(plan['namespace'], 'contrail_api_cli.provision')
+        self.assertEqual(plan['defaults'], self.cmd._provision_defaults)
+        self.cmd._current_fingerprints = mock.Mock(return_value=fingerprints)
+        diff = self.cmd._load_plan(plan)
+        self.cmd._current_fingerprints.assert_called_once_with(['vrouter', 'vn'])
+        return diff
+
+    def test_round_trip(self):
+        self.assertEqual(self.save_and_load(['live1', 'live2']), self.diff)
+
+    def test_stale(self):
+        with self.assertRaises(CommandError) as cm:
+            self.save_and_load(['live1', 'changed'])
+        self.assertIn('vn changed', '%s' % cm.exception)
+
+
+class TestState(unittest.TestCase):
+
+    def setUp(self):
+        self.cmd = Provision('provision')
+        fd, self.state_file = tempfile.mkstemp(suffix='.state')
+        os.close(fd)
+        os.remove(self.state_file)
+
+    def tearDown(self):
+        if os.path.exists(self.state_file):
+            os.remove(self.state_file)
+
+    def test_missing(self):
+        self.assertEqual(self.cmd._load_state(self.state_file), {})
+
+    def test_invalid(self):
+        with open(self.state_file, 'w') as f:
+            f.write('{')
+        self.assertRaises(CommandError, self.cmd._load_state, self.state_file)
+
+    def test_round_trip(self):
+        # keys of previous runs not provisioned in this run are kept
+        self.cmd._state = {'vn': {'spec': 'spec0', 'live': 'live0'},
+                           'vrouter': {'spec': 'old', 'live': 'old'}}
+        state = OrderedDict([
+            ('vrouter', {'spec': 'spec1', 'live': 'live1'}),
+            ('encaps', {'spec': 'spec2', 'live': 'live2'}),
+        ])
+        diff = {Actions.ADD: {'vrouter': [({}, {})]},
+                Actions.SET: {}, Actions.DEL: {}}
+        # only keys modified by the diff are collected again
+        self.cmd._current_fingerprints = mock.Mock(return_value=['live1-applied'])
+        self.cmd._save_state(self.state_file, state, diff)
+        self.cmd._current_fingerprints.assert_called_once_with(['vrouter'])
+        self.assertEqual(self.cmd._load_state(self.state_file), {
+            'vn': {'spec': 'spec0', 'live': 'live0'},
+            'vrouter': {'spec': 'spec1', 'live': 'live1-applied'},
+            'encaps': {'spec': 'spec2', 'live': 'live2'},
+        })
+
+
+class TestValidateCall(unittest.TestCase):
+
+    def setUp(self):
+        from contrail_api_cli_extra.provision.vrouter import AddVRouter
+        self.cmd = Provision('provision')
+        self.cmd._properties = {'vrouter': False}
+        self.cmd._descriptors = {}
+        self.cmd.mgr = mock.Mock()
+        self.cmd.mgr.get.return_value = AddVRouter('add-vrouter')
+
+    def test_valid(self):
+        args = self.cmd._validate_call('vrouter', {'vrouter_name': 'compute-1',
+                                                   'vrouter_ip': '10.0.0.1'})
+        self.assertEqual(args['vrouter_name'], 'compute-1')
+        self.assertEqual(args['vrouter_ip'], '10.0.0.1')
+
+    def test_invalid(self):
+        with self.assertRaises(CommandError) as cm:
+            self.cmd._validate_call('vrouter', {'vrouter_name': 'compute-1',
+                                                'vrouter_ip': 'not-an-ip'})
+        self.assertIn('Invalid vrouter call', '%s' % cm.exception)
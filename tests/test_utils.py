@@ -0,0 +1,398 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+import requests
+from netaddr import IPNetwork, IPAddress
+from kazoo.exceptions import NodeExistsError, NoNodeError, RolledBackError, \
+    RuntimeInconsistency
+
+from contrail_api_cli.client import HttpError
+from contrail_api_cli.exceptions import ResourceNotFound, CommandError
+
+from contrail_api_cli_extra.utils import (parallel_map, resize_connection_pool,
+                                         Instrumentation, ConcurrencyController,
+                                         TokenBucket, IdAllocator,
+                                         RouteTargetAllocator, SubnetIndex)
+
+
+class TestParallelMap(unittest.TestCase):
+
+    def test_results_order(self):
+        self.assertEqual(parallel_map(lambda i: i * 2, range(10), workers=3),
+                         [i * 2 for i in range(10)])
+
+    def test_args(self):
+        self.assertEqual(parallel_map(lambda i, a, b=0: i + a + b, [1, 2],
+                                      args=(10,), kwargs={'b': 100}),
+                         [111, 112])
+
+    def test_greenlet_exit_errors_raised(self):
+        def func(i):
+            if i == 3:
+                raise ResourceNotFound()
+            return i
+        with self.assertRaises(ResourceNotFound):
+            parallel_map(func, range(5), workers=2)
+
+    def test_errors_raised(self):
+        def func(i):
+            if i == 3:
+                raise ValueError(i)
+            return i
+        with self.assertRaises(ValueError):
+            parallel_map(func, range(5), workers=2)
+
+
+class TestResizeConnectionPool(unittest.TestCase):
+
+    def test_adapter_class_kept(self):
+
+        class KeepAliveAdapter(requests.adapters.HTTPAdapter):
+            pass
+
+        session = mock.Mock()
+        session.session = requests.Session()
+        session.session.mount('https://', KeepAliveAdapter())
+        resize_connection_pool(session, 50)
+        adapter = session.session.adapters['https://']
+        self.assertIsInstance(adapter, KeepAliveAdapter)
+        self.assertEqual(adapter._pool_maxsize, 50)
+        self.assertEqual(session.session.adapters['http://']._pool_maxsize, 50)
+
+    def test_larger_pool_kept(self):
+        session = mock.Mock()
+        session.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=100)
+        session.session.mount('https://', adapter)
+        resize_connection_pool(session, 50)
+        self.assertIs(session.session.adapters['https://'], adapter)
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        from pycassa.columnfamily import ColumnFamily
+        self.cls = ColumnFamily
+        self.methods = dict(ColumnFamily.__dict__)
+
+    def tearDown(self):
+        for name in (Instrumentation.CASSANDRA_OPERATIONS +
+                     Instrumentation.CASSANDRA_GENERATORS):
+            setattr(self.cls, name, self.methods[name])
+
+    def test_install_cassandra(self):
+        names = (Instrumentation.CASSANDRA_OPERATIONS +
+                 Instrumentation.CASSANDRA_GENERATORS)
+        instrumentation = Instrumentation()
+        instrumentation.install_cassandra()
+        installed = dict((name, self.cls.__dict__[name]) for name in names)
+        for name in names:
+            self.assertIsNot(installed[name], self.methods[name], name)
+        # methods are not wrapped twice
+        instrumentation.install_cassandra()
+        for name in names:
+            self.assertIs(self.cls.__dict__[name], installed[name], name)
+
+
+class TestConcurrencyController(unittest.TestCase):
+
+    def setUp(self):
+        self.controller = ConcurrencyController(2, 4)
+        self.controller.backoff = 0
+
+    def failing(self, statuses):
+        statuses = list(statuses)
+
+        def func(item):
+            if statuses:
+                raise HttpError(http_status=statuses.pop(0))
+            return item
+        return func
+
+    def test_retry(self):
+        self.assertEqual(self.controller.run(1, self.failing([503, 429])), 1)
+        self.assertEqual(self.controller._errors, 2)
+        self.assertEqual(self.controller.inflight, 0)
+
+    def test_retries_exhausted(self):
+        func = self.failing([500] * (self.controller.retries + 1))
+        with self.assertRaises(HttpError):
+            self.controller.run(1, func)
+        self.assertEqual(self.controller._errors, self.controller.retries + 1)
+        self.assertEqual(self.controller.inflight, 0)
+
+    def test_no_retry(self):
+        with self.assertRaises(HttpError):
+            self.controller.run(1, self.failing([404, 404]))
+        self.assertEqual(self.controller._errors, 0)
+        self.assertEqual(len(self.controller._latencies), 1)
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.sleeps = []
+        for target, new in (('contrail_api_cli_extra.utils.time.time', lambda: self.now),
+                            ('contrail_api_cli_extra.utils.gevent.sleep', self.sleep)):
+            patcher = mock.patch(target, new)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        # like a real clock, time goes on even for tiny sleeps
+        self.now += max(seconds, 1e-6)
+
+    def test_burst(self):
+        bucket = TokenBucket(10, burst=5)
+        for _ in range(5):
+            bucket.consume()
+        self.assertEqual(self.sleeps, [])
+        bucket.consume()
+        self.assertAlmostEqual(sum(self.sleeps), 0.1, places=5)
+
+    def test_rate(self):
+        bucket = TokenBucket(10)
+        for _ in range(110):
+            bucket.consume()
+        # the first 10 operations use the initial burst
+        self.assertAlmostEqual(self.now, 10.0, places=3)
+
+    def test_refill_capped(self):
+        bucket = TokenBucket(10, burst=2)
+        bucket.consume()
+        bucket.consume()
+        self.now += 100
+        for _ in range(3):
+            bucket.consume()
+        self.assertAlmostEqual(self.now, 100.1, places=5)
+
+
+class TestIdAllocator(unittest.TestCase):
+
+    def test_reserve(self):
+        ids = IdAllocator(10, 30)
+        self.assertTrue(ids.reserve(12))
+        self.assertFalse(ids.reserve(12))
+        # out of range
+        self.assertFalse(ids.reserve(30))
+        self.assertFalse(ids.reserve(9))
+        self.assertIn(12, ids)
+        self.assertNotIn(13, ids)
+        self.assertNotIn(30, ids)
+        self.assertEqual(ids.used, 1)
+
+    def test_iter(self):
+        ids = IdAllocator(5, 100)
+        for id in (99, 5, 17, 16):
+            ids.reserve(id)
+        self.assertEqual(list(ids), [5, 16, 17, 99])
+
+    def test_allocate_lowest(self):
+        ids = IdAllocator(0, 20)
+        for id in range(9):
+            ids.reserve(id)
+        ids.reserve(10)
+        self.assertEqual(ids.allocate(3), [9, 11, 12])
+        self.assertEqual(ids.used, 13)
+
+    def test_release(self):
+        ids = IdAllocator(0, 20)
+        self.assertEqual(ids.allocate(17), list(range(17)))
+        ids.release(3)
+        ids.release(3)
+        self.assertNotIn(3, ids)
+        self.assertEqual(ids.used, 16)
+        # the cursor goes back to the released id
+        self.assertEqual(ids.allocate(2), [3, 17])
+
+    def test_exhausted(self):
+        ids = IdAllocator(0, 10)
+        self.assertEqual(ids.allocate(10), list(range(10)))
+        self.assertRaises(CommandError, ids.next_free)
+        self.assertRaises(CommandError, ids.allocate)
+
+    def test_partial_last_byte(self):
+        ids = IdAllocator(0, 3)
+        ids.allocate(2)
+        self.assertEqual(ids.next_free(), 2)
+        ids.reserve(2)
+        self.assertRaises(CommandError, ids.next_free)
+        # nothing is reserved when not enough ids are free
+        ids.release(0)
+        self.assertRaises(CommandError, ids.allocate, 2)
+        self.assertEqual(ids.used, 2)
+
+
+class FakeTransaction(object):
+
+    def __init__(self, zk):
+        self.zk = zk
+        self.operations = []
+
+    def create(self, path, value):
+        self.operations.append(('create', path, value))
+
+    def delete(self, path):
+        self.operations.append(('delete', path, None))
+
+    def commit(self):
+        self.zk.commits.append(self.operations)
+        # like ZK, the transaction stops at the first failed operation,
+        # the previous operations are rolled back
+        for idx, (op, path, _) in enumerate(self.operations):
+            if path in self.zk.errors:
+                error = self.zk.errors[path]
+            elif op == 'create' and path in self.zk.nodes:
+                error = NodeExistsError()
+            elif op == 'delete' and path not in self.zk.nodes:
+                error = NoNodeError()
+            else:
+                continue
+            return ([RolledBackError()] * idx + [error] +
+                    [RuntimeInconsistency()] * (len(self.operations) - idx - 1))
+        results = []
+        for op, path, value in self.operations:
+            if op == 'create':
+                self.zk.nodes[path] = value
+            else:
+                del self.zk.nodes[path]
+            results.append(True)
+        return results
+
+
+class FakeZK(object):
+
+    def __init__(self, rt_ids=()):
+        self.nodes = {}
+        for rt_id in rt_ids:
+            self.nodes['%s/%010d' % (RouteTargetAllocator.zk_path, rt_id)] = b''
+        self.commits = []
+        self.errors = {}
+
+    def get_children(self, path):
+        return [node.rsplit('/', 1)[-1] for node in self.nodes]
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+    def rt_ids(self):
+        return sorted(int(node.rsplit('/', 1)[-1]) for node in self.nodes)
+
+
+class TestRouteTargetAllocator(unittest.TestCase):
+
+    def test_listed_locks(self):
+        zk = FakeZK([5, 8000001])
+        locks = RouteTargetAllocator(zk)
+        self.assertIn(5, locks)
+        self.assertIn(8000001, locks)
+        self.assertNotIn(8000000, locks)
+        self.assertEqual(list(locks), [5, 8000001])
+
+    def test_allocate_by_block(self):
+        zk = FakeZK([8000001])
+        locks = RouteTargetAllocator(zk, asn=64512, block_size=3)
+        self.assertEqual([locks.allocate() for _ in range(4)],
+                         [8000000, 8000002, 8000003, 8000004])
+        # one transaction per block
+        self.assertEqual(len(zk.commits), 2)
+        self.assertEqual(zk.nodes['%s/0008000000' % locks.zk_path], b'target:64512:8000000')
+        # unused ids of the last block are given back
+        locks.release()
+        self.assertEqual(zk.rt_ids(), [8000000, 8000001, 8000002, 8000003, 8000004])
+        self.assertNotIn(8000005, locks)
+        self.assertEqual(locks.allocate(), 8000005)
+
+    def test_allocate_taken_replaced(self):
+        zk = FakeZK()
+        locks = RouteTargetAllocator(zk, asn=64512, block_size=3)
+        # lock created by someone else after the listing
+        zk.nodes['%s/0008000001' % locks.zk_path] = b'other'
+        self.assertEqual([locks.allocate() for _ in range(3)],
+                         [8000000, 8000002, 8000003])
+        self.assertEqual(zk.nodes['%s/0008000001' % locks.zk_path], b'other')
+        self.assertIn(8000001, locks)
+
+    def test_queued_operations(self):
+        zk = FakeZK([8000001, 8000002])
+        locks = RouteTargetAllocator(zk, block_size=2)
+        locks.create_lock(8000003, 'rt')
+        self.assertIn(8000003, locks)
+        self.assertEqual(zk.commits, [])
+        locks.delete_lock(8000001)
+        self.assertNotIn(8000001, locks)
+        self.assertEqual(len(zk.commits), 1)
+        locks.delete_lock(8000002)
+        locks.flush()
+        self.assertEqual(zk.rt_ids(), [8000003])
+        self.assertEqual(len(zk.commits), 2)
+
+    def test_commit_drops_failed_operations(self):
+        zk = FakeZK([8000001])
+        locks = RouteTargetAllocator(zk, block_size=10)
+        # already created and already deleted
+        zk.nodes['%s/0008000002' % locks.zk_path] = b''
+        del zk.nodes['%s/0008000001' % locks.zk_path]
+        locks.create_lock(8000002, 'rt')
+        locks.create_lock(8000003, 'rt')
+        locks.delete_lock(8000001)
+        locks.flush()
+        self.assertEqual(zk.rt_ids(), [8000002, 8000003])
+        # the transaction is retried without the failed operations
+        self.assertEqual([len(ops) for ops in zk.commits], [3, 2, 1])
+
+    def test_commit_error(self):
+        zk = FakeZK()
+        locks = RouteTargetAllocator(zk, block_size=10)
+        zk.errors['%s/0008000003' % locks.zk_path] = RuntimeError('zk error')
+        locks.create_lock(8000002, 'rt')
+        locks.create_lock(8000003, 'rt')
+        self.assertRaises(RuntimeError, locks.flush)
+        # nothing is applied
+        self.assertEqual(zk.rt_ids(), [])
+
+    def test_dry_run(self):
+        zk = FakeZK([8000001])
+        locks = RouteTargetAllocator(zk, block_size=1, dry_run=True)
+        locks.create_lock(8000002, 'rt')
+        locks.delete_lock(8000001)
+        locks.flush()
+        self.assertEqual(zk.commits, [])
+        self.assertEqual(list(locks), [8000002])
+
+
+class TestSubnetIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.subnets = [IPNetwork(s) for s in ('10.0.2.0/24', '10.0.0.0/24',
+                                               '192.168.0.0/16', '10.0.1.0/25',
+                                               '2001:db8::/64')]
+        self.index = SubnetIndex(self.subnets)
+
+    def test_get(self):
+        for ip, subnet in (('10.0.0.0', '10.0.0.0/24'),
+                           ('10.0.0.255', '10.0.0.0/24'),
+                           ('10.0.1.127', '10.0.1.0/25'),
+                           ('10.0.2.1', '10.0.2.0/24'),
+                           ('192.168.255.255', '192.168.0.0/16'),
+                           ('2001:db8::1', '2001:db8::/64')):
+            self.assertEqual(self.index.get(IPAddress(ip)), IPNetwork(subnet), ip)
+
+    def test_get_missing(self):
+        for ip in ('9.255.255.255', '10.0.1.128', '10.0.3.0', '11.0.0.0',
+                   '2001:db8:0:1::1', '::1'):
+            self.assertIsNone(self.index.get(IPAddress(ip)), ip)
+
+    def test_iter(self):
+        self.assertEqual(len(self.index), 5)
+        self.assertEqual(sorted(self.index), sorted(self.subnets))
+
+    def test_empty(self):
+        self.assertIsNone(SubnetIndex([]).get(IPAddress('10.0.0.1')))